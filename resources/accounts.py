@@ -0,0 +1,277 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import bcrypt
+from config import get_setting
+from db_pool import get_connection
+from metrics import observe, timed_function
+
+# User accounts: password hashing, sign-up and sign-in checks. Kept free of Streamlit so that the same
+# logic can be used by the app (see auth.py), batch jobs and workers.
+#
+# bcrypt is slow on purpose, so create_user and authenticate run it on a small pool of worker threads
+# (bcrypt releases the GIL) instead of on the calling script thread: a burst of sign-ins then uses at most
+# BCRYPT_WORKERS cores, and other sessions' reruns keep running. When BCRYPT_MAX_PENDING calls are already
+# waiting for a worker, the next one fails fast with LOGIN_BUSY / BcryptBusy rather than queueing.
+# Settings:
+#   BCRYPT_ROUNDS       work factor of new hashes, default 12. A sign-in with a password hashed at another
+#                       cost rehashes it at this cost in the background.
+#   BCRYPT_WORKERS      worker threads, default the number of CPUs
+#   BCRYPT_MAX_PENDING  calls allowed to wait for a worker, default 64
+#
+# A sign-in also creates a session token, kept by the browser (see auth.py), so that a reload or a new tab
+# is signed in again with one primary-key lookup and an HMAC check instead of bcrypt. A token is
+# "<id>.<expiry>.<signature>": the id is random and names a row of the sessions table, the signature is an
+# HMAC-SHA256 of id, expiry and email keyed with SESSION_SECRET, so that a token can't be made up from the
+# rows of a leaked database. Settings:
+#   SESSION_SECRET    HMAC key, required; the app does not start without it. Use a long random string, e.g.
+#                     python -c "import secrets; print(secrets.token_urlsafe(32))"
+#   SESSION_TTL_DAYS  lifetime of a token, default 14
+
+db_file_name = get_setting("DATABASE_FILE_NAME")
+db_users_table_name = get_setting("DB_USER_TABLE_NAME")
+db_sessions_table_name = f"{db_users_table_name}_sessions"
+
+# Results of authenticate()
+LOGIN_OK = "ok"
+LOGIN_UNKNOWN_USER = "unknown_user"
+LOGIN_WRONG_PASSWORD = "wrong_password"
+LOGIN_BUSY = "busy"
+
+DEFAULT_BCRYPT_ROUNDS = 12
+DEFAULT_BCRYPT_MAX_PENDING = 64
+
+bcrypt_rounds = int(get_setting("BCRYPT_ROUNDS", DEFAULT_BCRYPT_ROUNDS))
+bcrypt_workers = int(get_setting("BCRYPT_WORKERS", os.cpu_count() or 1))
+bcrypt_max_pending = int(get_setting("BCRYPT_MAX_PENDING", DEFAULT_BCRYPT_MAX_PENDING))
+
+DEFAULT_SESSION_TTL_DAYS = 14
+# Remove expired and revoked sessions once every this many new sessions
+PURGE_SESSIONS_EVERY_N = 100
+
+session_ttl_seconds = int(float(get_setting("SESSION_TTL_DAYS", DEFAULT_SESSION_TTL_DAYS)) * 86400)
+_session_secret = get_setting("SESSION_SECRET")
+if not _session_secret.strip():
+    raise KeyError("Setting SESSION_SECRET is empty. Set it to a long random string.")
+_session_secret = _session_secret.encode("utf-8")
+_sessions_created = 0
+_sessions_lock = threading.Lock()
+
+_bcrypt_pool = None
+_bcrypt_pending = 0
+_bcrypt_lock = threading.Lock()
+
+
+class BcryptBusy(RuntimeError):
+    """Raised when BCRYPT_MAX_PENDING password checks are already waiting for a worker."""
+
+
+@timed_function("bcrypt_seconds")
+def hash_password(password: str, rounds: int = None) -> bytes:
+    """Hash a password for storing, at `rounds` or else BCRYPT_ROUNDS."""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds or bcrypt_rounds))
+
+
+@timed_function("bcrypt_seconds")
+def verify_password(stored_password: bytes, provided_password: str) -> bool:
+    """Verify a stored hashed password against one provided by user."""
+    return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password)
+
+
+def hash_rounds(stored_password: bytes) -> int:
+    """Returns the work factor a bcrypt hash was made with ($2b$<rounds>$...)."""
+    return int(stored_password.split(b"$")[2])
+
+
+def _run_in_bcrypt_pool(func, *args, wait=True):
+    """
+    Runs func(*args) on a bcrypt worker. Returns its result, or its Future when wait is False.
+    Raises BcryptBusy when bcrypt_max_pending calls are already waiting.
+    """
+    global _bcrypt_pool, _bcrypt_pending
+    with _bcrypt_lock:
+        if _bcrypt_pending >= bcrypt_workers + bcrypt_max_pending:
+            raise BcryptBusy("Too many password checks in progress")
+        _bcrypt_pending += 1
+        if _bcrypt_pool is None:
+            _bcrypt_pool = ThreadPoolExecutor(max_workers=bcrypt_workers, thread_name_prefix="bcrypt")
+    submitted = time.perf_counter()
+
+    def run():
+        global _bcrypt_pending
+        observe("bcrypt_queue_seconds", time.perf_counter() - submitted)
+        try:
+            return func(*args)
+        finally:
+            with _bcrypt_lock:
+                _bcrypt_pending -= 1
+
+    try:
+        future = _bcrypt_pool.submit(run)
+    except BaseException:
+        with _bcrypt_lock:
+            _bcrypt_pending -= 1
+        raise
+    return future.result() if wait else future
+
+
+def shutdown_bcrypt_pool():
+    """Stops the bcrypt workers after the calls in progress; the next call starts a new pool."""
+    global _bcrypt_pool
+    with _bcrypt_lock:
+        pool, _bcrypt_pool = _bcrypt_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _reset_after_fork():
+    # The worker threads don't exist in a forked child: it starts its own pool on first use
+    global _bcrypt_pool, _bcrypt_pending, _bcrypt_lock, _sessions_lock
+    _bcrypt_pool = None
+    _bcrypt_pending = 0
+    _bcrypt_lock = threading.Lock()
+    _sessions_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def create_user(user_name, user_email, password, created_by='SYSTEM'):
+    """
+    Creates a user account with a hashed password.
+
+    :return: True if the account was created, False if the email is already registered.
+    :raises BcryptBusy: when too many password hashes are already waiting for a worker.
+    """
+    hashed = _run_in_bcrypt_pool(hash_password, password)
+    try:
+        with get_connection(db_file_name) as conn:
+            conn.execute(f'''INSERT INTO {db_users_table_name} (user_name, user_email, user_encrypted_password, created_by, created_at)
+                         VALUES (?, ?, ?, ?, ?)''',
+                         (user_name, user_email, hashed, created_by, datetime.now().strftime("%Y-%m-%d")))
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+
+def authenticate(user_email, password):
+    """
+    Checks a user's password.
+
+    :return: (status, user_name) where status is LOGIN_OK, LOGIN_UNKNOWN_USER, LOGIN_WRONG_PASSWORD or
+        LOGIN_BUSY (too many sign-ins in progress, try again), and user_name is only set for LOGIN_OK.
+    """
+    with get_connection(db_file_name) as conn:
+        result = conn.execute(
+            f"SELECT user_name, user_encrypted_password FROM {db_users_table_name} WHERE user_email = ?",
+            (user_email,)).fetchone()
+
+    if not result:
+        return LOGIN_UNKNOWN_USER, None
+    user_name, stored_password = result
+    try:
+        if not _run_in_bcrypt_pool(verify_password, stored_password, password):
+            return LOGIN_WRONG_PASSWORD, None
+        if hash_rounds(stored_password) != bcrypt_rounds:
+            _run_in_bcrypt_pool(_rehash_password, user_email, stored_password, password, wait=False)
+    except BcryptBusy:
+        return LOGIN_BUSY, None
+    return LOGIN_OK, user_name
+
+
+def _rehash_password(user_email, stored_password, password):
+    """Replaces a password hash made at another work factor with one at bcrypt_rounds, unless it changed meanwhile."""
+    try:
+        hashed = hash_password(password)
+        with get_connection(db_file_name) as conn:
+            conn.execute(f"""
+                UPDATE {db_users_table_name} SET user_encrypted_password = ?
+                WHERE user_email = ? AND user_encrypted_password = ?
+            """, (hashed, user_email, stored_password))
+    except Exception as e:
+        print(f"Could not rehash the password of {user_email}: {e}")
+
+
+def _sign(token_id, expires_at, user_email):
+    message = f"{token_id}.{expires_at}.{user_email}".encode("utf-8")
+    digest = hmac.new(_session_secret, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def create_session(user_email):
+    """
+    Stores a new session for a signed-in user.
+
+    :return: The session token, valid for session_ttl_seconds unless revoked.
+    """
+    global _sessions_created
+    token_id = secrets.token_urlsafe(16)
+    now = int(time.time())
+    expires_at = now + session_ttl_seconds
+    with get_connection(db_file_name) as conn:
+        conn.execute(f"""
+            INSERT INTO {db_sessions_table_name} (token_id, user_email, created_at, expires_at)
+            VALUES (?, ?, ?, ?)
+        """, (token_id, user_email, now, expires_at))
+        with _sessions_lock:
+            _sessions_created += 1
+            purge = _sessions_created % PURGE_SESSIONS_EVERY_N == 0
+        if purge:
+            conn.execute(f"DELETE FROM {db_sessions_table_name} WHERE expires_at <= ? OR revoked_at IS NOT NULL",
+                         (now,))
+    return f"{token_id}.{expires_at}.{_sign(token_id, expires_at, user_email)}"
+
+
+def _parse_token(token):
+    """Returns (token_id, expires_at, signature) of a well-formed token, else None."""
+    try:
+        token_id, expires_at, signature = token.split(".")
+        return token_id, int(expires_at), signature
+    except (AttributeError, ValueError):
+        return None
+
+
+def validate_session(token):
+    """
+    Checks a session token: not expired, not revoked and correctly signed.
+
+    :return: (user_email, user_name) of the session's user, or None if the token is not valid.
+    """
+    parsed = _parse_token(token)
+    if parsed is None or parsed[1] <= time.time():
+        return None
+    token_id, expires_at, signature = parsed
+    with get_connection(db_file_name) as conn:
+        row = conn.execute(f"""
+            SELECT s.user_email, u.user_name
+            FROM {db_sessions_table_name} AS s
+            JOIN {db_users_table_name} AS u ON u.user_email = s.user_email
+            WHERE s.token_id = ? AND s.expires_at = ? AND s.revoked_at IS NULL
+        """, (token_id, expires_at)).fetchone()
+    if row is None or not hmac.compare_digest(signature, _sign(token_id, expires_at, row[0])):
+        return None
+    return row
+
+
+def revoke_session(token):
+    """Revokes a session token, e.g. on logout; later validate_session calls with it return None."""
+    parsed = _parse_token(token)
+    if parsed is None:
+        return
+    with get_connection(db_file_name) as conn:
+        conn.execute(f"UPDATE {db_sessions_table_name} SET revoked_at = ? WHERE token_id = ? AND revoked_at IS NULL",
+                     (int(time.time()), parsed[0]))
+
+
+def is_admin(user_email):
+    """True if the user is listed in the ADMIN_EMAILS setting (comma-separated emails)."""
+    admins = get_setting("ADMIN_EMAILS", "")
+    return bool(user_email) and user_email.lower() in {email.strip().lower() for email in admins.split(",")}
@@ -1,8 +1,54 @@
 import streamlit as st
 from datetime import datetime
-from transaction_parser import parse_transaction  # Import the parse_transaction function
+from transaction_parser import (  # Import the parse_transaction function
+    parse_transaction,
+    PARSE_METADATA_KEYS,
+    PARSE_SOURCE_KEY,
+    PARSE_CONFIDENCE_KEY,
+)
 from db_operations import insert_record  # Import the insert_record function
+from write_queue import run_write
 from auth import display_app_banner
+from user_utils import rerun_fragment
+
+
+def render_parsed_details_table(parsed_data):
+    """Render the parsed fields as a 4-column table without headers."""
+    # Prepare the data for a 4-column table
+    table_data = [(key, value) for key, value in parsed_data.items()
+                  if key not in PARSE_METADATA_KEYS]
+    rows = []
+    for i in range(0, len(table_data), 2):
+        row = [
+            table_data[i][0],  # Label for column 1
+            table_data[i][1],  # Value for column 2
+            table_data[i + 1][0] if i + 1 < len(table_data) else "",  # Label for column 3
+            table_data[i + 1][1] if i + 1 < len(table_data) else "",  # Value for column 4
+        ]
+        rows.append(row)
+
+    # Display the table without headers
+    st.write(
+        f"""
+        <style>
+            .no-header-table {{
+                border-collapse: collapse;
+                width: 100%;
+            }}
+            .no-header-table td {{
+                border: 1px solid #ddd;
+                padding: 8px;
+            }}
+        </style>
+        <table class="no-header-table">
+            {"".join(
+            f"<tr><td><b>{row[0]}</b></td><td>{row[1]}</td><td><b>{row[2]}</b></td><td>{row[3]}</td></tr>"
+            for row in rows
+        )}
+        </table>
+        """,
+        unsafe_allow_html=True,
+    )
 
 
 def add_transaction_page(global_user_email):
@@ -15,13 +61,6 @@ def add_transaction_page(global_user_email):
     if "save_enabled" not in st.session_state:
         st.session_state.save_enabled = False  # Disable Save button initially
 
-    # Function to handle reset
-    def reset():
-        st.session_state.transaction_desc = ""  # Clear input text box
-        st.session_state.parsed_data = None  # Clear parsed data
-        st.session_state.save_enabled = False  # Disable Save button
-        st.rerun()  # Force a rerun to refresh the UI
-
     # Title of the app
     # st.title("Add Transaction")
     st.subheader("Add Transaction", divider='gray')
@@ -56,6 +95,19 @@ def add_transaction_page(global_user_email):
         unsafe_allow_html=True,
     )
 
+    parse_and_save_panel(global_user_email)
+
+
+# Parsing, showing and saving a transaction reruns on its own, without rerunning the rest of the app
+@st.fragment
+def parse_and_save_panel(global_user_email):
+    # Function to handle reset
+    def reset():
+        st.session_state.transaction_desc = ""  # Clear input text box
+        st.session_state.parsed_data = None  # Clear parsed data
+        st.session_state.save_enabled = False  # Disable Save button
+        rerun_fragment()  # Force a rerun to refresh the UI
+
     # Placeholder for success/information messages at the top
     message_placeholder = st.empty()
 
@@ -92,9 +144,18 @@ def add_transaction_page(global_user_email):
             message_placeholder.warning("Enter a transaction description to parse.")
             st.session_state.parsed_data = None
         else:
+            # Placeholder the parsed fields are rendered into as they stream in
+            stream_placeholder = st.empty()
             try:
-                # Parse the input using parse_transaction
-                st.session_state.parsed_data = parse_transaction(transaction_input)
+                # Parse the input using parse_transaction, showing each field as soon as it is complete
+                parsed_data = {}
+                for key, value in parse_transaction(transaction_input, stream=True):
+                    parsed_data[key] = value
+                    if key not in PARSE_METADATA_KEYS:
+                        with stream_placeholder.container():
+                            render_parsed_details_table(parsed_data)
+                stream_placeholder.empty()  # The final table is rendered below
+                st.session_state.parsed_data = parsed_data
                 st.session_state.transaction_desc = transaction_input  # Save the input
                 st.session_state.save_enabled = True  # Enable Save button
                 # message_placeholder.success("Transaction parsed successfully!")
@@ -102,45 +163,23 @@ def add_transaction_page(global_user_email):
                 message_placeholder.error(f"Error: {str(e)}")
                 st.warning("Ensure the LLM API key and environment variables are correctly set up.")
                 st.session_state.parsed_data = None
+                stream_placeholder.empty()
 
     # Display the output if parsed data exists
     if st.session_state.parsed_data:
         st.subheader("Parsed Transaction Details")
 
-        # Prepare the data for a 4-column table
-        table_data = list(st.session_state.parsed_data.items())
-        rows = []
-        for i in range(0, len(table_data), 2):
-            row = [
-                table_data[i][0],  # Label for column 1
-                table_data[i][1],  # Value for column 2
-                table_data[i + 1][0] if i + 1 < len(table_data) else "",  # Label for column 3
-                table_data[i + 1][1] if i + 1 < len(table_data) else "",  # Value for column 4
-            ]
-            rows.append(row)
-
-        # Display the table without headers
-        st.write(
-            f"""
-            <style>
-                .no-header-table {{
-                    border-collapse: collapse;
-                    width: 100%;
-                }}
-                .no-header-table td {{
-                    border: 1px solid #ddd;
-                    padding: 8px;
-                }}
-            </style>
-            <table class="no-header-table">
-                {"".join(
-                f"<tr><td><b>{row[0]}</b></td><td>{row[1]}</td><td><b>{row[2]}</b></td><td>{row[3]}</td></tr>"
-                for row in rows
-            )}
-            </table>
-            """,
-            unsafe_allow_html=True,
-        )
+        # Show which path produced the result
+        parse_source = st.session_state.parsed_data.get(PARSE_SOURCE_KEY)
+        if parse_source == "rules":
+            st.caption(f"Parsed locally by rules "
+                       f"(confidence {st.session_state.parsed_data.get(PARSE_CONFIDENCE_KEY):.0%})")
+        elif parse_source == "cache":
+            st.caption("Loaded from the parse cache (no LLM call needed)")
+        elif parse_source == "llm":
+            st.caption("Parsed by the LLM")
+
+        render_parsed_details_table(st.session_state.parsed_data)
 
         # Add Save and Cancel buttons below the table
         col1, col2 = st.columns(2, gap="small")
@@ -157,7 +196,7 @@ def add_transaction_page(global_user_email):
             try:
                 parsed_data_with_email = {**st.session_state.parsed_data, 'user_email': global_user_email}
                 parsed_data_with_audit = {**parsed_data_with_email, 'created_date': datetime.now().strftime("%Y-%m-%d")}
-                save_msg = insert_record(parsed_data_with_audit)  # Save parsed data to the database
+                save_msg = run_write(insert_record, parsed_data_with_audit)  # Save parsed data to the database
                 message_placeholder.success(save_msg)
                 st.session_state.save_enabled = False  # Disable Save button after saving
 
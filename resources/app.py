@@ -1,10 +1,24 @@
 import streamlit as st
-from auth import auth_page, check_login, signup, signin, reset_session_state
+from auth import auth_page, check_login, signup, signin, reset_session_state, restore_session, write_session_cookie
 from home_page import home_page
 from add_transaction_page import add_transaction_page
 from display_transactions_page import display_transactions_page
 from delete_transactions_page import delete_transactions_page
+from import_transactions_page import import_transactions_page
+from metrics_page import metrics_page
 from user_utils import display_user_info
+from db_operations import create_table
+from migrations import MigrationError
+from accounts import is_admin
+from metrics import start_exporters, timed
+
+
+# Create tables and apply schema migrations once per server process
+@st.cache_resource(show_spinner=False)
+def init_database():
+    create_table()
+    start_exporters()
+    return True
 
 
 # Function to display the sidebar menu
@@ -67,6 +81,10 @@ def display_sidebar_menu():
             st.session_state.current_page = "display_transactions"
         if st.sidebar.button("🗑️ Delete Transactions", key="delete_transactions_button"):
             st.session_state.current_page = "delete_transactions"
+        if st.sidebar.button("📥 Import Statement", key="import_transactions_button"):
+            st.session_state.current_page = "import_transactions"
+        if is_admin(st.session_state.user_email) and st.sidebar.button("📈 Metrics", key="metrics_button"):
+            st.session_state.current_page = "metrics"
         if st.sidebar.button("Logout", key="logout_button"):
             reset_session_state()  # Reset session state
             st.session_state.current_page = "auth"  # Redirect to auth page
@@ -89,6 +107,14 @@ def display_sidebar_menu():
 def main():
     # Set the browser title
     st.set_page_config(page_title="Personal Finance", layout="wide")
+    try:
+        init_database()
+    except MigrationError as error:
+        # Nothing was changed; show which rows need fixing instead of failing on every page load
+        st.error("The database could not be upgraded to this version of the app. Fix the rows below, "
+                 "then run `python manage.py migrate` or reload the page.")
+        st.code(str(error), language=None)
+        st.stop()
 
     # Initialize all session state variables
     if "current_page" not in st.session_state:
@@ -108,7 +134,9 @@ def main():
     if "user_name" not in st.session_state:
         st.session_state.user_name = None
 
-    # Handle authentication and redirects
+    # Sign in again from the session cookie after a reload or in a new tab, then handle redirects
+    if not st.session_state.logged_in:
+        restore_session()
     if not st.session_state.logged_in:
         st.session_state.current_page = "auth"  # Force auth page if not logged in
 
@@ -118,25 +146,35 @@ def main():
     # Display the sidebar menu
     display_sidebar_menu()
 
-    # Display the selected page based on session state
-    if st.session_state.current_page == "auth":
-        auth_page()  # Call auth_page to handle authentication
-    elif st.session_state.current_page == "signup":
-        signup()
-    elif st.session_state.current_page == "signin":
-        signin()
-    elif st.session_state.current_page == "home":
-        check_login()
-        home_page()
-    elif st.session_state.current_page == "add_transaction":
-        check_login()
-        add_transaction_page(st.session_state.user_email)
-    elif st.session_state.current_page == "display_transactions":
-        check_login()
-        display_transactions_page(st.session_state.user_email)
-    elif st.session_state.current_page == "delete_transactions":
-        check_login()
-        delete_transactions_page(st.session_state.user_email)
+    # Display the selected page based on session state, timing how long it takes to render
+    with timed("page_render_seconds", page=st.session_state.current_page):
+        if st.session_state.current_page == "auth":
+            auth_page()  # Call auth_page to handle authentication
+        elif st.session_state.current_page == "signup":
+            signup()
+        elif st.session_state.current_page == "signin":
+            signin()
+        elif st.session_state.current_page == "home":
+            check_login()
+            home_page(st.session_state.user_email)
+        elif st.session_state.current_page == "add_transaction":
+            check_login()
+            add_transaction_page(st.session_state.user_email)
+        elif st.session_state.current_page == "display_transactions":
+            check_login()
+            display_transactions_page(st.session_state.user_email)
+        elif st.session_state.current_page == "delete_transactions":
+            check_login()
+            delete_transactions_page(st.session_state.user_email)
+        elif st.session_state.current_page == "import_transactions":
+            check_login()
+            import_transactions_page(st.session_state.user_email)
+        elif st.session_state.current_page == "metrics":
+            check_login()
+            metrics_page(st.session_state.user_email)
+
+    # Set or clear the session cookie after sign-in or logout; last, so the page's elements keep their places
+    write_session_cookie()
 
 
 # Run the app
@@ -1,25 +1,76 @@
+import json
 import streamlit as st
-from datetime import datetime
-import sqlite3
-import bcrypt
-
-db_file_name = st.secrets["api_keys"]["DATABASE_FILE_NAME"]
-db_txn_table_name = st.secrets["api_keys"]["DB_TRANSACTION_TABLE_NAME"]
-db_users_table_name = st.secrets["api_keys"]["DB_USER_TABLE_NAME"]
-
-
-def hash_password(password: str) -> bytes:
-    """Hash a password for storing."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-
-
-def verify_password(stored_password: bytes, provided_password: str) -> bool:
-    """Verify a stored hashed password against one provided by user."""
-    return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password)
+import streamlit.components.v1 as components
+from accounts import (
+    LOGIN_BUSY,
+    LOGIN_OK,
+    LOGIN_UNKNOWN_USER,
+    BcryptBusy,
+    authenticate,
+    create_session,
+    create_user,
+    revoke_session,
+    session_ttl_seconds,
+    validate_session,
+)
+
+# Streamlit forms and session handling for sign up / sign in; the account logic lives in accounts.py
+
+# Cookie holding the session token of accounts.create_session, so that a reload or a new tab stays signed in
+SESSION_COOKIE_NAME = "finance_tracker_session"
+
+
+def session_cookie_attributes(max_age):
+    """
+    Attributes of the session cookie: sent over HTTPS only (browsers treat http://localhost as secure too),
+    never on cross-site requests, and dropped after max_age seconds.
+    """
+    return f"path=/; max-age={max_age}; Secure; SameSite=Strict"
+
+
+def write_session_cookie():
+    """
+    Sets or clears the session cookie when sign-in or logout asked for it (session_state.session_cookie).
+    Streamlit can read cookies (st.context.cookies) but not set them, so a zero-height component sets it
+    from the browser; components run in a same-origin iframe. Being set from script, the cookie can't be
+    HttpOnly; it is always Secure and SameSite=Strict, and the token it holds is signed and revocable.
+    """
+    token = st.session_state.pop("session_cookie", None)
+    if token is None:
+        return
+    cookie = f"{SESSION_COOKIE_NAME}={token}; {session_cookie_attributes(session_ttl_seconds if token else 0)}"
+    components.html(f"""
+        <script>
+            window.parent.document.cookie = {json.dumps(cookie)};
+        </script>
+    """, height=0)
+
+
+def restore_session():
+    """
+    Signs the user in from the session cookie, once per browser session, when it holds a valid token.
+    :return: True if the user was signed in.
+    """
+    if st.session_state.get("session_restore_checked"):
+        return False
+    st.session_state.session_restore_checked = True
+    token = st.context.cookies.get(SESSION_COOKIE_NAME)
+    session = validate_session(token) if token else None
+    if session is None:
+        return False
+    st.session_state.logged_in = True
+    st.session_state.user_email, st.session_state.user_name = session
+    st.session_state.session_token = token
+    st.session_state.current_page = "home"
+    return True
 
 
 def reset_session_state():
-    """Reset session state variables related to sign up and sign in forms."""
+    """Reset session state variables related to sign up and sign in forms, and revoke the session token."""
+    token = st.session_state.pop("session_token", None)
+    if token:
+        revoke_session(token)
+        st.session_state.session_cookie = ""  # Cleared by write_session_cookie on the next run
     keys_to_reset = ['user_name', 'user_email', 'password', 'signup_user_name', 'signup_user_email', 'signup_password',
                      'signin_user_email', 'signin_password']
     for key in keys_to_reset:
@@ -44,25 +95,18 @@ def signup():
 
                 if submit_button:
                     if user_name and user_email and password:
-                        conn = sqlite3.connect(db_file_name)
-                        c = conn.cursor()
-                        hashed = hash_password(password)
-
                         try:
-                            c.execute(f'''INSERT INTO {db_users_table_name} (user_name, user_email, user_encrypted_password, created_by, created_at) 
-                                         VALUES (?, ?, ?, ?, ?)''',
-                                      (user_name, user_email, hashed, 'SYSTEM', datetime.now().strftime("%Y-%m-%d")))
-                            conn.commit()
-                            conn.close()
+                            created = create_user(user_name, user_email, password)
+                        except BcryptBusy:
+                            st.error("Too many sign-ups right now. Try again in a moment.")
+                            return
+                        if created:
                             st.success("Account created successfully!")
                             st.session_state.message = "Account created successfully! Please sign in."
                             st.session_state.current_page = "signin"  # Redirect to sign-in page
-                            # st.session_state.message = "Account created successfully! Please sign in."
                             st.rerun()  # Rerun to reflect the changes
-                        except sqlite3.IntegrityError:
+                        else:
                             st.error("Email already exists. Sign-in or use a different email.")
-                        # finally:
-                            # conn.close()
                     else:
                         st.error("Fill in all required fields.")
 
@@ -82,27 +126,22 @@ def signin():
                 submit_button = st.form_submit_button(label='Sign In')
                 if submit_button:
                     if user_email and password:
-                        conn = sqlite3.connect(db_file_name)
-                        c = conn.cursor()
-                        c.execute(
-                            f"SELECT user_name, user_encrypted_password FROM {db_users_table_name} WHERE user_email = ?",
-                            (user_email,))
-                        result = c.fetchone()
-                        conn.close()
-
-                        if result:
-                            user_name, stored_password = result
-                            if verify_password(stored_password, password):
-                                st.session_state.logged_in = True
-                                st.session_state.user_email = user_email
-                                st.session_state.user_name = user_name
-                                st.success("Logged in successfully!")
-                                st.session_state.current_page = "home"  # Redirect to home page
-                                st.rerun()  # Rerun to reflect the changes
-                            else:
-                                st.error("Incorrect user ID and/or password. Contact administrator.")
-                        else:
+                        status, user_name = authenticate(user_email, password)
+                        if status == LOGIN_OK:
+                            st.session_state.logged_in = True
+                            st.session_state.user_email = user_email
+                            st.session_state.user_name = user_name
+                            st.session_state.session_token = create_session(user_email)
+                            st.session_state.session_cookie = st.session_state.session_token
+                            st.success("Logged in successfully!")
+                            st.session_state.current_page = "home"  # Redirect to home page
+                            st.rerun()  # Rerun to reflect the changes
+                        elif status == LOGIN_UNKNOWN_USER:
                             st.error("User not found. Sign up.")
+                        elif status == LOGIN_BUSY:
+                            st.error("Too many sign-ins right now. Try again in a moment.")
+                        else:
+                            st.error("Incorrect user ID and/or password. Contact administrator.")
                     else:
                         st.error("Enter all required fields.")
 
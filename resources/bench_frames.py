@@ -0,0 +1,86 @@
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import pandas as pd
+
+import db_operations
+
+# Compares the old way of building the transactions table (fetch_transactions_range -> DataFrame -> fillna ->
+# astype(str)) with the typed column path (fetch_transactions_frame, formatting only the visible page).
+# Both include the query. Times are the best of REPEATS runs without tracemalloc, which slows allocation-heavy
+# code unevenly; memory is measured in a separate traced run. Runs against a throwaway database so the real
+# one is not touched. Run from the resources directory:
+#   python bench_frames.py [rows]
+
+BANKS = ("HDFC", "SBI", "ICICI", "Axis", None)
+ACCOUNTS = ("Savings Account", "Credit Card", "Cash", None)
+CATEGORIES = ("Transport", "Groceries", "Leisure", "Utilities", "Health", "Other")
+CURRENCIES = ("INR", "USD", "EUR")
+USER = "bench@example.com"
+REPEATS = 5
+
+
+def populate(rows):
+    today = date.today()
+    with db_operations.get_connection(db_operations.db_file_name), contextlib.redirect_stdout(io.StringIO()):
+        for i in range(rows):
+            db_operations.insert_record({
+                "Transaction Date": (today - timedelta(days=random.randrange(3650))).isoformat(),
+                "Bank Name": random.choice(BANKS),
+                "Account Type": random.choice(ACCOUNTS),
+                "Transaction Amount": round(random.uniform(10, 50000), 2),
+                "Transaction Currency": random.choice(CURRENCIES),
+                "Transaction Category": random.choice(CATEGORIES),
+                "Transaction Description": f"Purchase {i}",
+                "user_email": USER,
+                "created_date": today.isoformat(),
+            })
+
+
+def old_path():
+    df = pd.DataFrame(db_operations.fetch_transactions_range(USER))
+    df = df.fillna("")
+    df.columns = db_operations.selected_col_names
+    return df.astype(str)
+
+
+def typed_path(page_size=10):
+    df = db_operations.fetch_transactions_frame(USER)
+    db_operations.format_transactions_frame(df.head(page_size))
+    return df
+
+
+def measure(name, fn):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    df = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<40} {min(timings) * 1000:>9.1f} ms  frame {df.memory_usage(deep=True).sum() / 2**20:>7.1f} MiB"
+          f"  peak {peak / 2**20:>7.1f} MiB")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    db_operations.db_file_name = os.path.join(tempfile.mkdtemp(), "bench_frames.db")
+    db_operations.create_table()
+    populate(rows)
+
+    print(f"{db_operations.count_transactions(USER)} rows, best of {REPEATS}")
+    measure("tuples -> DataFrame -> astype(str)", old_path)
+    measure("typed columns, format visible page", typed_path)
+
+
+if __name__ == "__main__":
+    main()
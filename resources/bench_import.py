@@ -0,0 +1,79 @@
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import db_operations
+import statement_importer
+import write_queue
+
+# Imports a generated bank statement into a throwaway database and reports the import time and rows/sec,
+# then imports it again to measure the all-duplicates path, and once more with tracemalloc for peak memory.
+# Run from the resources directory:
+#   python bench_import.py [rows] [csv|ofx]
+
+PAYEES = ("Uber trip", "DMart groceries", "Netflix subscription", "Electricity bill", "Cafe Coffee Day",
+          "Apollo Pharmacy", "Shell petrol", "Amazon", "Rent transfer", "Salary")
+USER = "bench@example.com"
+
+
+def write_csv(path, rows):
+    today = date.today()
+    with open(path, "w", newline="") as f:
+        f.write("Date,Narration,Withdrawal Amt.,Deposit Amt.\n")
+        for i in range(rows):
+            day = (today - timedelta(days=random.randrange(730))).strftime("%d/%m/%Y")
+            amount = f"{random.uniform(10, 20000):.2f}"
+            debit, credit = (amount, "") if random.random() < 0.9 else ("", amount)
+            f.write(f'{day},"{random.choice(PAYEES)} #{i}",{debit},{credit}\n')
+
+
+def write_ofx(path, rows):
+    today = date.today()
+    with open(path, "w") as f:
+        f.write("OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><SIGNONMSGSRSV1><SONRS><FI><ORG>HDFC</FI></SONRS></SIGNONMSGSRSV1>"
+                "<BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>INR<BANKACCTFROM><ACCTTYPE>SAVINGS</BANKACCTFROM>"
+                "<BANKTRANLIST>\n")
+        for i in range(rows):
+            day = (today - timedelta(days=random.randrange(730))).strftime("%Y%m%d")
+            f.write(f"<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>{day}120000<TRNAMT>-{random.uniform(10, 20000):.2f}"
+                    f"<FITID>{i}<NAME>{random.choice(PAYEES)} #{i}</STMTTRN>\n")
+        f.write("</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n")
+
+
+def run_import(path, file_type, trace_memory=False):
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        stats = statement_importer.import_statement(f, file_type, USER,
+                                                    defaults={"Transaction Currency": "INR", "Bank Name": "HDFC"})
+    elapsed = time.perf_counter() - started
+    print(f"{stats['rows']} rows: {stats['inserted']} inserted, {stats['duplicates']} duplicates, "
+          f"{stats['skipped']} skipped in {elapsed:.2f} s ({stats['rows'] / elapsed:,.0f} rows/s)")
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"peak Python memory {peak / 2**20:.1f} MiB (timing above includes tracemalloc overhead)")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    file_type = sys.argv[2] if len(sys.argv) > 2 else "csv"
+    workdir = tempfile.mkdtemp()
+    db_operations.db_file_name = write_queue.db_file_name = os.path.join(workdir, "bench_import.db")
+    db_operations.create_table()
+
+    path = os.path.join(workdir, f"statement.{file_type}")
+    (write_ofx if file_type == "ofx" else write_csv)(path, rows)
+    print(f"statement: {os.path.getsize(path) / 2**20:.1f} MiB")
+    run_import(path, file_type)
+    run_import(path, file_type)  # Everything is a duplicate the second time
+    run_import(path, file_type, trace_memory=True)
+
+
+if __name__ == "__main__":
+    main()
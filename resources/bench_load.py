@@ -0,0 +1,236 @@
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+
+from streamlit.testing.v1 import AppTest
+
+# End-to-end load test of the app: N concurrent simulated sessions, each repeatedly going through
+# sign-in, parse, save, display and delete with Streamlit's app-testing API (AppTest), all against one
+# database. AppTest swaps Streamlit's global runtime on every run, so two sessions can't run in the same
+# process: each session is a process of its own. The LLM is the local stand-in of fake_llm.py, so no
+# API calls are made; its latency and error rate are set on the command line.
+#
+# Each flow is a new session: load the app, sign in, open the add page, parse a sentence, save it,
+# open the transactions report, open the delete page and delete the saved row (selecting a row in the
+# data editor can't be simulated, so its id is put into the selection in session state before clicking
+# Delete and Confirm Delete). A step that fails ends its flow.
+#
+# The test runs once per --sessions level and reports p50/p95/p99 per step and the completed flows per
+# second; the throughput ceiling is the highest flows/sec reached. Runs against a throwaway database.
+# Run from the resources directory:
+#   python bench_load.py [--sessions 1,4,16,32] [--flows 5] [--llm-latency 0.5] [--llm-error-rate 0.01]
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+STEPS = ("load", "sign_in", "open_add", "parse", "save", "display", "open_delete", "delete")
+
+# Sentences the rule parser handles on its own, and sentences it is not confident about (sent to the LLM)
+RULE_SENTENCES = ("Spent Rs {amount} on petrol today", "Paid Rs {amount} for groceries at DMart yesterday",
+                  "Paid {amount} for Netflix using my HDFC credit card")
+LLM_SENTENCES = ("Gave {amount} to Ravi for the trip", "Paid {amount} to the plumber at home",
+                 "Transferred {amount} to my landlord via the branch counter")
+
+
+class StepFailed(Exception):
+    pass
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class Results:
+    """Step timings, failures and completed flows of one or more sessions."""
+
+    def __init__(self):
+        self.times = defaultdict(list)
+        self.failures = defaultdict(int)
+        self.errors = []
+        self.flows = 0
+
+    def state(self):
+        # Plain containers only: AppTest replaces __main__, so classes defined here can't be pickled
+        return {"times": dict(self.times), "failures": dict(self.failures), "errors": self.errors,
+                "flows": self.flows}
+
+    def merge(self, state):
+        for step, times in state["times"].items():
+            self.times[step].extend(times)
+        for step, count in state["failures"].items():
+            self.failures[step] += count
+        self.errors.extend(state["errors"])
+        self.flows += state["flows"]
+
+
+def timed_run(at):
+    """Reruns the app after an interaction and returns how long it took."""
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise StepFailed(at.exception[0].message)
+    return elapsed
+
+
+def click(at, label):
+    next(button for button in at.button if button.label == label).click()
+
+
+def sentence(rng, llm_share):
+    template = rng.choice(LLM_SENTENCES if rng.random() < llm_share else RULE_SENTENCES)
+    return template.format(amount=f"{rng.uniform(10, 5000):.2f}")
+
+
+def run_flow(user_email, password, rng, llm_share, results):
+    """One session through the whole flow, recorded in results; a step that fails ends the flow."""
+    import db_operations
+    step = "load"
+    try:
+        at = AppTest.from_file(APP_FILE, default_timeout=120)
+        results.times[step].append(timed_run(at))
+
+        step = "sign_in"
+        at.text_input(key="signin_user_email").input(user_email)
+        at.text_input(key="signin_password").input(password)
+        click(at, "Sign In")
+        results.times[step].append(timed_run(at))
+        if not at.session_state["logged_in"]:
+            raise StepFailed("not signed in")
+
+        step = "open_add"
+        at.sidebar.button(key="add_transaction_button").click()
+        results.times[step].append(timed_run(at))
+
+        step = "parse"
+        at.text_input(key="transaction_input").input(sentence(rng, llm_share))
+        click(at, "Parse This Text")
+        results.times[step].append(timed_run(at))
+        if not at.session_state["parsed_data"]:
+            raise StepFailed(" ".join(e.value for e in at.error))
+
+        step = "save"
+        at.button(key="save_button").click()
+        results.times[step].append(timed_run(at))
+        if not any("saved successfully" in s.value for s in at.success):
+            raise StepFailed(" ".join(e.value for e in at.error))
+
+        step = "display"
+        at.sidebar.button(key="display_transactions_button").click()
+        results.times[step].append(timed_run(at))
+
+        step = "open_delete"
+        at.sidebar.button(key="delete_transactions_button").click()
+        results.times[step].append(timed_run(at))
+
+        step = "delete"
+        (record_id,), = db_operations.fetch_transactions_range(user_email, columns=("id",), limit=1)
+        at.session_state["all_selected_rows"] = {record_id}
+        click(at, "Delete")
+        seconds = timed_run(at)
+        click(at, "Confirm Delete")
+        results.times[step].append(seconds + timed_run(at))  # Both clicks are one step
+        if not any("Deleted 1 records" in i.value for i in at.info):
+            raise StepFailed("row not deleted")
+    except Exception as e:
+        results.failures[step] += 1
+        results.errors.append(f"{step}: {e}")
+        return
+    results.flows += 1
+
+
+def session_process(n, flows, llm_share, password, seed, start_barrier, outcomes):
+    import datagen
+    rng = random.Random(seed * 1000 + n)
+    results = Results()
+    start_barrier.wait()
+    started = time.time()
+    for _ in range(flows):
+        run_flow(datagen.user_email(n), password, rng, llm_share, results)
+    outcomes.put((results.state(), started, time.time()))
+
+
+def run_level(sessions, flows, llm_share, password, seed):
+    """Runs the sessions in parallel and returns their merged Results and the elapsed wall time."""
+    start_barrier = multiprocessing.Barrier(sessions)
+    outcomes = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=session_process,
+                                         args=(n, flows, llm_share, password, seed, start_barrier, outcomes))
+                 for n in range(sessions)]
+    for process in processes:
+        process.start()
+    results = Results()
+    starts, ends = [], []
+    for _ in processes:
+        session_results, started, ended = outcomes.get()
+        results.merge(session_results)
+        starts.append(started)
+        ends.append(ended)
+    for process in processes:
+        process.join()
+    return results, max(ends) - min(starts)
+
+
+def report(sessions, results, elapsed):
+    print(f"\n{sessions} sessions: {results.flows} flows in {elapsed:.1f} s = {results.flows / elapsed:.2f} flows/s, "
+          f"{sum(map(len, results.times.values())) / elapsed:.1f} interactions/s, {len(results.errors)} failed flows")
+    for step in STEPS:
+        times = sorted(t * 1000 for t in results.times[step])
+        if not times:
+            continue
+        print(f"  {step:<12} p50 {statistics.median(times):8.1f} ms  p95 {percentile(times, 0.95):8.1f} ms"
+              f"  p99 {percentile(times, 0.99):8.1f} ms  n {len(times):>5}  failed {results.failures[step]}")
+    for error in sorted(set(results.errors))[:5]:
+        print(f"  e.g. {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test with simulated sessions and a fake LLM")
+    parser.add_argument("--sessions", default="1,4,16", help="Comma-separated concurrent session counts")
+    parser.add_argument("--flows", type=int, default=5, help="Flows each session goes through per level")
+    parser.add_argument("--rows", type=int, default=0, help="Transactions generated for the users up front")
+    parser.add_argument("--llm-share", type=float, default=0.5,
+                        help="Share of sentences the rule parser can't handle, parsed by the fake LLM")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake LLM latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="Fake LLM latency jitter in seconds")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of fake LLM requests failing")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.sessions.split(",")]
+
+    # Settings are read on import, so the throwaway database and the fake LLM are configured first. They
+    # go into the environment so that the session processes get them too.
+    os.environ.update({
+        "DATABASE_FILE_NAME": os.path.join(tempfile.mkdtemp(), "bench_load.db"),
+        "DB_TRANSACTION_TABLE_NAME": "transactions",
+        "DB_USER_TABLE_NAME": "users",
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY_SECONDS": str(args.llm_latency),
+        "FAKE_LLM_LATENCY_JITTER_SECONDS": str(args.llm_jitter),
+        "FAKE_LLM_ERROR_RATE": str(args.llm_error_rate),
+    })
+    import datagen
+    import db_operations
+    users = max(levels)
+    if args.rows:
+        datagen.populate(users, args.rows, seed=args.seed)
+    else:
+        db_operations.create_table()
+        datagen.create_users(users)
+
+    throughput = {}
+    for sessions in levels:
+        results, elapsed = run_level(sessions, args.flows, args.llm_share, datagen.DATAGEN_PASSWORD, args.seed)
+        report(sessions, results, elapsed)
+        throughput[sessions] = results.flows / elapsed
+
+    best = max(throughput, key=throughput.get)
+    print(f"\nThroughput ceiling: {throughput[best]:.2f} flows/s ({throughput[best] * 60:.0f} flows/min), "
+          f"reached with {best} sessions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import os
+import secrets
+import statistics
+import tempfile
+import threading
+import time
+
+# Sign-in throughput benchmark: concurrent clients call accounts.authenticate in a loop for a while, for
+# each combination of bcrypt work factor (--rounds) and bcrypt worker count (--workers). Reports logins/sec,
+# logins/sec per core in use, sign-in latency, sign-ins rejected as busy, and how late a "rerun" probe
+# thread (a 1 ms task every 10 ms, standing in for other sessions' script runs) got while the sign-ins ran.
+# Runs against a throwaway database.
+# Run from the resources directory:
+#   python bench_logins.py [--rounds 10,12] [--workers 1,4] [--clients 16] [--seconds 10]
+
+PROBE_INTERVAL_SECONDS = 0.01
+PROBE_WORK_SECONDS = 0.001
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def probe(stop, delays):
+    """Busy-works PROBE_WORK_SECONDS every PROBE_INTERVAL_SECONDS and records how late each run finished."""
+    while not stop.is_set():
+        due = time.perf_counter() + PROBE_INTERVAL_SECONDS
+        time.sleep(PROBE_INTERVAL_SECONDS)
+        busy_until = time.perf_counter() + PROBE_WORK_SECONDS
+        while time.perf_counter() < busy_until:
+            pass
+        delays.append(time.perf_counter() - due - PROBE_WORK_SECONDS)
+
+
+def client(accounts, users, password, n, deadline, results):
+    import datagen
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        status, _ = accounts.authenticate(datagen.user_email((n + len(results["latencies"])) % users), password)
+        elapsed = time.perf_counter() - started
+        if status == accounts.LOGIN_OK:
+            results["latencies"].append(elapsed)
+        elif status == accounts.LOGIN_BUSY:
+            results["busy"] += 1
+            time.sleep(0.01)
+        else:
+            results["failed"] += 1
+
+
+def run(accounts, users, password, workers, clients, seconds):
+    accounts.shutdown_bcrypt_pool()
+    accounts.bcrypt_workers = workers
+    per_client = [{"latencies": [], "busy": 0, "failed": 0} for _ in range(clients)]
+    stop = threading.Event()
+    delays = []
+    probe_thread = threading.Thread(target=probe, args=(stop, delays))
+    probe_thread.start()
+    started = time.perf_counter()
+    deadline = started + seconds
+    threads = [threading.Thread(target=client, args=(accounts, users, password, n, deadline, per_client[n]))
+               for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    probe_thread.join()
+    results = {"latencies": [t for r in per_client for t in r["latencies"]],
+               "busy": sum(r["busy"] for r in per_client), "failed": sum(r["failed"] for r in per_client)}
+    return results, elapsed, sorted(delays)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sign-in throughput with bcrypt on a worker pool")
+    parser.add_argument("--rounds", default="10,12", help="Comma-separated bcrypt work factors")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Comma-separated bcrypt worker counts")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent sign-in loops")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of each run")
+    args = parser.parse_args()
+
+    # Settings are read on import, so the throwaway database is configured first
+    os.environ.update({
+        "DATABASE_FILE_NAME": os.path.join(tempfile.mkdtemp(), "bench_logins.db"),
+        "DB_TRANSACTION_TABLE_NAME": "transactions",
+        "DB_USER_TABLE_NAME": "users",
+        "SESSION_SECRET": secrets.token_urlsafe(32),
+    })
+    import accounts
+    import datagen
+    import db_operations
+    from db_pool import get_connection
+    db_operations.create_table()
+    datagen.create_users(args.users)
+    cores = os.cpu_count() or 1
+
+    for rounds in (int(r) for r in args.rounds.split(",")):
+        # Every user shares one hash, made at the work factor under test; no rehashing during the runs
+        accounts.bcrypt_rounds = rounds
+        with get_connection(db_operations.db_file_name) as conn:
+            conn.execute(f"UPDATE {accounts.db_users_table_name} SET user_encrypted_password = ?",
+                         (accounts.hash_password(datagen.DATAGEN_PASSWORD, rounds),))
+        for workers in (int(w) for w in args.workers.split(",")):
+            results, elapsed, delays = run(accounts, args.users, datagen.DATAGEN_PASSWORD, workers, args.clients,
+                                           args.seconds)
+            latencies = sorted(t * 1000 for t in results["latencies"])
+            rate = len(latencies) / elapsed
+            if not latencies:
+                print(f"rounds {rounds:>2}  workers {workers:>2}: no successful sign-ins")
+                continue
+            print(f"rounds {rounds:>2}  workers {workers:>2}  {rate:7.1f} logins/s  "
+                  f"{rate / min(workers, cores):7.1f} per core  "
+                  f"latency p50 {statistics.median(latencies):7.1f} ms  p99 {percentile(latencies, 0.99):7.1f} ms  "
+                  f"busy {results['busy']}  failed {results['failed']}  "
+                  f"probe delay p99 {percentile(delays, 0.99) * 1000:5.1f} ms")
+    accounts.shutdown_bcrypt_pool()
+
+
+if __name__ == "__main__":
+    main()
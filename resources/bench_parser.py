@@ -0,0 +1,51 @@
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+# Measures the fixed costs of transaction_parser that do not depend on the LLM response:
+#   - import time of the module in a fresh interpreter
+#   - one-off creation of the shared client and compiled chain
+#   - per-call prompt preparation, rebuilding the template and chain every call (the old behaviour)
+#     versus binding only the date variables of the compiled template
+# No request is sent to the LLM API. Run from the resources directory:
+#   python bench_parser.py
+
+
+def measure_import(runs=5):
+    code = "import time; t = time.perf_counter(); import transaction_parser; print(time.perf_counter() - t)"
+    timings = [float(subprocess.check_output([sys.executable, "-c", code], text=True).strip().splitlines()[-1])
+               for _ in range(runs)]
+    return statistics.median(timings)
+
+
+def main():
+    print(f"import transaction_parser: {measure_import() * 1000:.1f} ms (median of 5 fresh interpreters)")
+
+    import transaction_parser as tp
+    from langchain_core.prompts import PromptTemplate
+
+    started = time.perf_counter()
+    chain = tp._get_chain()
+    print(f"first use (client + compiled chain): {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    descs = "1. Spent Rs 800 on Diesel today."
+    llm = tp.get_llm()
+    runs = 2000
+
+    def rebuild_per_call():
+        rebuilt = PromptTemplate.from_template(tp.BATCH_PROMPT_TEXT) | llm
+        rebuilt.first.format(descs=descs, **tp._prompt_dates())
+
+    def compiled_once():
+        chain.first.format(descs=descs, **tp._prompt_dates())
+
+    for name, fn in (("rebuild template + chain per call", rebuild_per_call),
+                     ("compiled template, dates bound per call", compiled_once)):
+        per_call = timeit.timeit(fn, number=runs) / runs
+        print(f"{name}: {per_call * 1e6:.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
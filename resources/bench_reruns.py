@@ -0,0 +1,205 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import date, timedelta
+
+from tornado.websocket import websocket_connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+# Measures the server-side time of common interactions against a real `streamlit run` server, talking to
+# it over its websocket like a browser would: sign in, then click Next on the transactions report, tick
+# a row on the delete page and parse a sentence on the add page, each --repeat times.
+# The server time of a run is the script execution time Streamlit reports in its page profile message;
+# an interaction that calls st.rerun() is the sum of its runs. Wall time is until the run finished message,
+# and "sent to browser" the size of the messages the interaction produced.
+# Runs against a throwaway database. Run from the resources directory:
+#   python bench_reruns.py [--rows 20000] [--repeat 20] [--app path/to/app.py]
+# Point --app at a checkout of another commit to compare.
+
+USER = "bench@example.com"
+PASSWORD = "bench-password"
+CATEGORIES = ("Transport", "Groceries", "Leisure", "Utilities", "Health", "Other")
+
+
+class BrowserSession:
+    """A minimal Streamlit client: sends reruns with widget states and reads the resulting messages."""
+
+    def __init__(self, url):
+        self.url = url
+        self.ws = None
+        self.page_script_hash = ""
+        self.widgets = {}  # label -> (widget id, fragment id) of the latest element with that label
+        self.values = {}  # widget id -> WidgetState sent with every rerun
+        self.texts = []  # text of the alerts/captions of the latest run
+
+    async def connect(self):
+        self.ws = await websocket_connect(self.url, subprotocols=["streamlit"], max_message_size=2 ** 30)
+
+    def set_value(self, label, **value):
+        widget_id, _ = self.widgets[label]
+        self.values[widget_id] = WidgetState(id=widget_id, **value)
+
+    async def click(self, label):
+        widget_id, fragment_id = self.widgets[label]
+        return await self.rerun(WidgetState(id=widget_id, trigger_value=True), fragment_id)
+
+    async def rerun(self, trigger=None, fragment_id=""):
+        msg = BackMsg()
+        msg.rerun_script.page_script_hash = self.page_script_hash
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.widget_states.widgets.extend(self.values.values())
+        if trigger is not None:
+            msg.rerun_script.widget_states.widgets.append(trigger)
+        started = time.perf_counter()
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+
+        exec_seconds, runs, received = 0.0, 0, 0
+        self.texts = []
+        while True:
+            data = await self.ws.read_message()
+            received += len(data)
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof("type")
+            if kind == "new_session":
+                self.page_script_hash = forward.new_session.page_script_hash
+            elif kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                proto = getattr(element, element.WhichOneof("type"))
+                if getattr(proto, "id", ""):
+                    label = getattr(proto, "label", "") or element.WhichOneof("type")
+                    self.widgets[label] = (proto.id, forward.delta.fragment_id)
+                if element.WhichOneof("type") in ("alert", "markdown"):
+                    self.texts.append(proto.body)
+            elif kind == "page_profile":
+                exec_seconds += forward.page_profile.exec_time / 1e6
+                runs += 1
+            elif kind == "script_finished" and forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return time.perf_counter() - started, exec_seconds, runs, received
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def populate(rows):
+    # Settings are read on import, so the throwaway database is configured first
+    import accounts
+    import db_operations
+    db_operations.create_table()
+    accounts.create_user("Bench", USER, PASSWORD)
+    today = date.today()
+    db_operations.insert_records({
+        "Transaction Date": (today - timedelta(days=random.randrange(730))).strftime("%Y-%m-%d"),
+        "Bank Name": "HDFC",
+        "Account Type": "Savings Account",
+        "Transaction Amount": round(random.uniform(10, 5000), 2),
+        "Transaction Currency": "INR",
+        "Transaction Category": random.choice(CATEGORIES),
+        "Transaction Description": f"bench {i}",
+        "user_email": USER,
+        "created_date": today.strftime("%Y-%m-%d"),
+    } for i in range(rows))
+
+
+def start_server(app, port, env):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.basename(app), "--server.headless", "true",
+         "--server.port", str(port), "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "true",
+         "--global.minCachedMessageSize", str(2 ** 40)],
+        cwd=os.path.dirname(os.path.abspath(app)), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("Streamlit server did not start")
+
+
+def report(name, samples):
+    wall = [s[0] * 1000 for s in samples]
+    server = [s[1] * 1000 for s in samples]
+    runs = statistics.mean(s[2] for s in samples)
+    received = statistics.mean(s[3] for s in samples) / 1024
+    print(f"{name:<28} server p50 {statistics.median(server):7.1f} ms  p95 {statistics.quantiles(server, n=20)[18]:7.1f} ms"
+          f"  wall p50 {statistics.median(wall):7.1f} ms  runs {runs:.1f}  sent to browser {received:.0f} KiB")
+
+
+async def run_interactions(port, repeat):
+    session = BrowserSession(f"ws://127.0.0.1:{port}/_stcore/stream")
+    await session.connect()
+    await session.rerun()
+
+    session.set_value("Email ID", string_value=USER)
+    session.set_value("Password", string_value=PASSWORD)
+    await session.click("Sign In")
+    del session.values[session.widgets["Email ID"][0]], session.values[session.widgets["Password"][0]]
+
+    await session.click("📄 Display Transactions")
+    samples = []
+    for i in range(repeat):
+        samples.append(await session.click("Next" if i % 4 < 2 else "Previous"))
+    report("Display: Next/Previous", samples)
+
+    await session.click("🗑️ Delete Transactions")
+    samples = []
+    widget_id = None
+    for i in range(repeat):
+        # The editor's id changes with the data shown, so only its latest id is sent
+        session.values.pop(widget_id, None)
+        edits = {"edited_rows": {str(i % 10): {"Select": True}}, "added_rows": [], "deleted_rows": []}
+        widget_id, fragment_id = session.widgets["arrow_data_frame"]
+        session.values[widget_id] = WidgetState(id=widget_id, string_value=json.dumps(edits))
+        samples.append(await session.rerun(fragment_id=fragment_id))
+    session.values.pop(widget_id, None)
+    report("Delete: tick a row", samples)
+
+    await session.click("➕ Add Transaction")
+    samples = []
+    for i in range(repeat):
+        session.set_value("text_input", string_value=f"Spent Rs {100 + i} on petrol today")
+        samples.append(await session.click("Parse This Text"))
+    report("Add: parse a sentence", samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server time per interaction against a real Streamlit server")
+    parser.add_argument("--rows", type=int, default=20_000, help="Transactions of the signed-in user")
+    parser.add_argument("--repeat", type=int, default=20, help="Times each interaction is repeated")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    env = {**os.environ, "DATABASE_FILE_NAME": os.path.join(workdir, "bench_reruns.db"),
+           "DB_TRANSACTION_TABLE_NAME": "transactions", "DB_USER_TABLE_NAME": "users",
+           "SESSION_SECRET": secrets.token_urlsafe(32)}
+    os.environ.update(env)
+    populate(args.rows)
+
+    port = free_port()
+    server = start_server(args.app, port, env)
+    try:
+        asyncio.run(run_interactions(port, args.repeat))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
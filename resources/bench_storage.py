@@ -0,0 +1,233 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import datagen
+import db_operations
+import utils
+
+# Benchmark suite for the storage layer: insert_record, every fetch_* function, count_transactions,
+# delete_records and utils.fetch_transactions, run against synthetic databases of several sizes
+# (see datagen.py). Reads are timed for the heaviest user and a typical (median) user.
+# Results go to a JSON file, together with the commit they were measured on; --compare checks them
+# against the file of an earlier run and exits with status 1 when a benchmark got slower.
+# Generated databases are kept in --data-dir and reused by later runs with the same sizes and seed.
+# Run from the resources directory:
+#   python bench_storage.py [--sizes 10000,100000,1000000] [--output bench_storage.json]
+#   python bench_storage.py --compare bench_storage_main.json
+
+TRANSACTIONS_PER_USER = 500  # Users generated per size: size / TRANSACTIONS_PER_USER
+REGRESSION_THRESHOLD = 1.25  # A median this many times the baseline's counts as a regression...
+REGRESSION_MIN_MS = 0.1  # ...if it also grew by at least this much; sub-0.1 ms timings are mostly noise
+
+
+def timed(fn, repeat, max_seconds):
+    """Runs fn once to warm up, then up to `repeat` times (at least 3, within max_seconds). Returns (times, rows)."""
+    result = fn()
+    times = []
+    deadline = time.perf_counter() + max_seconds
+    while len(times) < repeat and (len(times) < 3 or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return times, result
+
+
+def row_count(result):
+    if isinstance(result, tuple):  # fetch_transactions_page returns (records, cursor)
+        result = result[0]
+    if isinstance(result, int):
+        return result
+    return len(result)
+
+
+def summarize(times):
+    ms = sorted(t * 1000 for t in times)
+    return {
+        "runs": len(ms),
+        "min_ms": round(ms[0], 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "mean_ms": round(statistics.mean(ms), 3),
+    }
+
+
+def prepare_database(size, seed, data_dir):
+    """Returns a fresh copy of the generated database for `size` transactions, generating it on first use."""
+    users = max(10, size // TRANSACTIONS_PER_USER)
+    source = os.path.join(data_dir, f"datagen_{size}_{users}_{seed}.db")
+    if not os.path.exists(source):
+        db_operations.db_file_name = source + ".tmp"
+        print(f"Generating {size:,} transactions for {users:,} users...")
+        datagen.populate(users, size, seed=seed)
+        with sqlite3.connect(db_operations.db_file_name) as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        os.replace(db_operations.db_file_name, source)
+
+    # Inserts and deletes change the data, so every run works on its own copy
+    work = os.path.join(tempfile.mkdtemp(), "bench_storage.db")
+    with sqlite3.connect(source) as src, sqlite3.connect(work) as dst:
+        src.backup(dst)
+    db_operations.db_file_name = work
+    return users, work
+
+
+def pick_users():
+    """Returns the heaviest user and the median user by number of transactions."""
+    with db_operations.get_connection(db_operations.db_file_name) as conn:
+        counts = conn.execute(f"""
+            SELECT user_email, COUNT(*) FROM {db_operations.db_txn_table_name} GROUP BY user_email ORDER BY 2 DESC
+        """).fetchall()
+    return {"heavy": counts[0][0], "typical": counts[len(counts) // 2][0]}
+
+
+def read_benchmarks(user):
+    first_page, cursor = db_operations.fetch_transactions_page(user)
+    start, end = db_operations.last_month_range()
+    return {
+        "fetch_transactions_range": lambda: db_operations.fetch_transactions_range(user),
+        "fetch_transactions_range_last_month": lambda: db_operations.fetch_transactions_range(user, start, end),
+        "fetch_transactions_frame": lambda: db_operations.fetch_transactions_frame(user),
+        "fetch_transactions_page_first": lambda: db_operations.fetch_transactions_page(user),
+        "fetch_transactions_page_next": lambda: db_operations.fetch_transactions_page(user, after=cursor),
+        "fetch_all_records": lambda: db_operations.fetch_all_records(user),
+        "fetch_all_records_delete_mode": lambda: db_operations.fetch_all_records(user, delete_mode=True),
+        "fetch_todays_transactions": lambda: db_operations.fetch_todays_transactions(user),
+        "fetch_yesterdays_transactions": lambda: db_operations.fetch_yesterdays_transactions(user),
+        "fetch_last_week_transactions": lambda: db_operations.fetch_last_week_transactions(user),
+        "fetch_this_month_transactions": lambda: db_operations.fetch_this_month_transactions(user),
+        "fetch_last_month_transactions": lambda: db_operations.fetch_last_month_transactions(user),
+        "fetch_monthly_category_summary": lambda: db_operations.fetch_monthly_category_summary(user),
+        "fetch_month_over_month_summary": lambda: db_operations.fetch_month_over_month_summary(user),
+        "fetch_categories": lambda: db_operations.fetch_categories(user),
+        "count_transactions": lambda: db_operations.count_transactions(user),
+    }
+
+
+def run_size(size, args):
+    users, path = prepare_database(size, args.seed, args.data_dir)
+    results = []
+
+    def record(benchmark, user_kind, times, rows):
+        results.append({"size": size, "users": users, "benchmark": benchmark, "user": user_kind, "rows": rows,
+                        **summarize(times)})
+        r = results[-1]
+        print(f"{size:>9,} {benchmark:<38} {user_kind:<8} median {r['median_ms']:>9.2f} ms"
+              f"  p95 {r['p95_ms']:>9.2f} ms  rows {rows:>9,}")
+
+    picked = pick_users()
+    for user_kind, user in picked.items():
+        for benchmark, fn in read_benchmarks(user).items():
+            times, result = timed(fn, args.repeat, args.max_seconds)
+            record(benchmark, user_kind, times, row_count(result))
+    heavy = picked["heavy"]
+
+    times, df = timed(lambda: utils.fetch_transactions(path), args.repeat, args.max_seconds)
+    record("utils.fetch_transactions", "all", times, len(df))
+
+    # Writes: one save per call, as the app does, each in its own transaction
+    records = datagen.generate_records(1, args.writes, seed=args.seed + size)
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):  # insert_record prints on every save
+        for new_record in records:
+            new_record["user_email"] = heavy
+            new_record["Transaction Description"] += " (bench)"
+            started = time.perf_counter()
+            db_operations.insert_record(new_record)
+            times.append(time.perf_counter() - started)
+    record("insert_record", "heavy", times, len(times))
+
+    ids = [row[0] for row in db_operations.fetch_transactions_range(heavy, columns=("id",))]
+    random.Random(args.seed).shuffle(ids)
+    batch = args.delete_batch
+    times = []
+    for n in range(min(args.repeat, len(ids) // batch)):
+        started = time.perf_counter()
+        db_operations.delete_records(heavy, ids[n * batch:(n + 1) * batch])
+        times.append(time.perf_counter() - started)
+    record(f"delete_records_{batch}", "heavy", times, batch)
+    return results
+
+
+def git_revision():
+    repo = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(results, baseline_path):
+    """Prints the change in median of every benchmark against a baseline file. Returns the regressions."""
+    with open(baseline_path) as f:
+        baseline = {(r["size"], r["benchmark"], r["user"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        before = baseline.get((r["size"], r["benchmark"], r["user"]))
+        if before is None or not before["median_ms"]:
+            continue
+        ratio = r["median_ms"] / before["median_ms"]
+        flag = ""
+        if ratio > REGRESSION_THRESHOLD and r["median_ms"] - before["median_ms"] >= REGRESSION_MIN_MS:
+            regressions.append(r)
+            flag = "  REGRESSION"
+        print(f"{r['size']:>9,} {r['benchmark']:<38} {r['user']:<8} {before['median_ms']:>9.2f} -> "
+              f"{r['median_ms']:>9.2f} ms ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage layer benchmark suite")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated numbers of transactions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per benchmark")
+    parser.add_argument("--max-seconds", type=float, default=10, help="Stop repeating a benchmark after this long")
+    parser.add_argument("--writes", type=int, default=200, help="insert_record calls per size")
+    parser.add_argument("--delete-batch", type=int, default=100, help="Record IDs per delete_records call")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "finance_tracker_bench"),
+                        help="Where generated databases are kept between runs")
+    parser.add_argument("--output", default="bench_storage.json", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare against")
+    args = parser.parse_args()
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(",")):
+        results.extend(run_size(size, args))
+
+    commit, dirty = git_revision()
+    with open(args.output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "dirty": dirty,
+            "measured_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "settings": {"seed": args.seed, "repeat": args.repeat, "writes": args.writes,
+                         "delete_batch": args.delete_batch},
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+import db_operations
+import db_pool
+import write_queue
+
+# Concurrency stress test for saving transactions: N threads, one per simulated Streamlit session, each
+# saving records one at a time as fast as it can. Runs every session writing on its own connection
+# (insert_record called directly, as the app did before) and then through the group-commit write queue,
+# and reports sustained inserts/sec, per-save latency and "database is locked" errors.
+# Runs against a throwaway database. Run from the resources directory:
+#   python bench_writes.py [--sessions 32] [--inserts 200] [--busy-timeout 5000] [--window 0]
+
+CATEGORIES = ("Transport", "Groceries", "Leisure", "Utilities", "Health", "Other")
+
+
+def make_record(session, i):
+    return {
+        "Transaction Date": f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+        "Bank Name": "HDFC",
+        "Account Type": "Savings Account",
+        "Transaction Amount": round(random.uniform(10, 5000), 2),
+        "Transaction Currency": "INR",
+        "Transaction Category": random.choice(CATEGORIES),
+        "Transaction Description": f"stress {session}-{i}",
+        "user_email": f"user{session}@example.com",
+        "created_date": "2024-01-01",
+    }
+
+
+def run(mode, sessions, inserts):
+    latencies = []
+    errors = {"locked": 0, "other": 0}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(sessions)
+
+    def session(n):
+        start_barrier.wait()
+        for i in range(inserts):
+            record = make_record(n, i)
+            started = time.perf_counter()
+            try:
+                if mode == "queue":
+                    write_queue.run_write(db_operations.insert_record, record)
+                else:
+                    db_operations.insert_record(record)
+            except sqlite3.OperationalError as e:
+                with lock:
+                    errors["locked" if "locked" in str(e) or "busy" in str(e) else "other"] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # insert_record prints on every save
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    p50, p99 = (statistics.quantiles(latencies, n=100)[i] * 1000 for i in (49, 98))
+    print(f"{mode:>6}: {len(latencies)} saved in {elapsed:.2f} s = {len(latencies) / elapsed:,.0f} inserts/s, "
+          f"latency p50 {p50:.1f} ms p99 {p99:.1f} ms, locked errors {errors['locked']}, "
+          f"other errors {errors['other']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent save stress test")
+    parser.add_argument("--sessions", type=int, default=32, help="Concurrent sessions (threads)")
+    parser.add_argument("--inserts", type=int, default=200, help="Records saved by each session")
+    parser.add_argument("--busy-timeout", type=int, default=5000,
+                        help="SQLite busy_timeout in ms; lower it to surface lock errors sooner")
+    parser.add_argument("--window", type=float, default=write_queue.GROUP_COMMIT_WINDOW_SECONDS * 1000,
+                        help="Group commit window in ms")
+    args = parser.parse_args()
+
+    db_pool.CONNECTION_PRAGMAS = tuple(
+        f"PRAGMA busy_timeout = {args.busy_timeout}" if pragma.startswith("PRAGMA busy_timeout") else pragma
+        for pragma in db_pool.CONNECTION_PRAGMAS)
+    db_operations.db_file_name = write_queue.db_file_name = os.path.join(tempfile.mkdtemp(), "bench_writes.db")
+    db_operations.create_table()
+    write_queue.GROUP_COMMIT_WINDOW_SECONDS = args.window / 1000
+
+    print(f"{args.sessions} sessions x {args.inserts} saves, busy_timeout {args.busy_timeout} ms")
+    run("direct", args.sessions, args.inserts)
+    run("queue", args.sessions, args.inserts)
+    stats = write_queue.get_write_queue().stats()
+    print(f"queue: {stats['groups']} group commits, {stats['requests'] / max(stats['groups'], 1):.1f} saves per commit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import threading
+import tomllib
+
+# Settings for the storage, parsing and auth code, resolved without importing Streamlit so that batch
+# jobs, workers and process pools can use that code headless. Each setting is looked up, in order, in:
+#   1. values passed to configure() (explicit arguments, e.g. from a CLI)
+#   2. environment variables of the same name, e.g. DATABASE_FILE_NAME=/data/finance.db
+#   3. a TOML file: $FINANCE_TRACKER_CONFIG, else .streamlit/secrets.toml in the working directory or
+#      the home directory; keys are read from its [api_keys] table, or from the top level
+#   4. st.secrets, only when the process is already running Streamlit
+# Modules read their settings when they are imported, so configure() must be called before that.
+
+CONFIG_FILE_ENV_VAR = "FINANCE_TRACKER_CONFIG"
+CONFIG_FILE_CANDIDATES = (
+    os.path.join(".streamlit", "secrets.toml"),
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+)
+CONFIG_SECTION = "api_keys"
+
+_overrides = {}
+_file_settings = None
+_lock = threading.Lock()
+_REQUIRED = object()
+
+
+def configure(config_file=None, **settings):
+    """
+    Sets settings explicitly, taking precedence over the environment and the config file.
+
+    :param config_file: TOML file to read instead of the default locations.
+    :param settings: Setting values, e.g. configure(DATABASE_FILE_NAME="/tmp/test.db").
+    """
+    global _file_settings
+    with _lock:
+        if config_file is not None:
+            _file_settings = _read_config_file(config_file)
+        _overrides.update(settings)
+
+
+def config_file_path():
+    """Returns the config file that will be read, or None if there is none."""
+    path = os.environ.get(CONFIG_FILE_ENV_VAR)
+    if path:
+        return path
+    for candidate in CONFIG_FILE_CANDIDATES:
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def _read_config_file(path):
+    with open(path, "rb") as f:
+        data = tomllib.load(f)
+    section = data.get(CONFIG_SECTION, {})
+    return {**{k: v for k, v in data.items() if not isinstance(v, dict)}, **section}
+
+
+def _file_setting(name):
+    global _file_settings
+    if _file_settings is None:
+        with _lock:
+            if _file_settings is None:
+                path = config_file_path()
+                _file_settings = _read_config_file(path) if path else {}
+    return _file_settings.get(name)
+
+
+def _streamlit_secret(name):
+    # Never import Streamlit here; only use it when the app itself has loaded it
+    st = sys.modules.get("streamlit")
+    if st is None:
+        return None
+    try:
+        # Reading st.secrets without a secrets file would show an error in the app
+        if not st.secrets.load_if_toml_exists():
+            return None
+        return st.secrets[CONFIG_SECTION][name]
+    except Exception:
+        return None
+
+
+def get_setting(name, default=_REQUIRED):
+    """
+    Returns the value of a setting, see the top of this module for where it is looked up.
+
+    :raises KeyError: If the setting is not configured anywhere and no default is given.
+    """
+    for lookup in (_overrides.get, os.environ.get, _file_setting, _streamlit_secret):
+        value = lookup(name)
+        if value is not None:
+            return value
+    if default is _REQUIRED:
+        raise KeyError(f"Setting {name} is not configured. Set the {name} environment variable, add it to "
+                       f"[{CONFIG_SECTION}] in .streamlit/secrets.toml or point {CONFIG_FILE_ENV_VAR} "
+                       f"at a config file.")
+    return default
@@ -0,0 +1,149 @@
+import argparse
+import bisect
+import itertools
+import math
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import db_operations
+from accounts import hash_password
+from db_pool import get_connection
+
+# Builds realistic synthetic datasets for benchmarking: thousands of users, millions of transactions.
+# The data is skewed the way real usage is:
+#   - users: transaction counts follow a Zipf law, so a few heavy users own a large share of the rows
+#     (user00000 is the heaviest) while most users have a few hundred;
+#   - dates: recent days are busier than old ones (exponential decay over --days);
+#   - categories, banks, account types and currencies: a few values dominate, see the weights below;
+#   - amounts: log-normal around a typical amount per category.
+# The same seed always produces the same dataset. Every account's password is DATAGEN_PASSWORD.
+# Run from the resources directory:
+#   python datagen.py --db /tmp/big.db [--users 2000] [--transactions 1000000] [--days 1825] [--seed 0]
+
+DATAGEN_PASSWORD = "datagen-password"
+
+# (value, weight) pairs
+CATEGORIES = (("Groceries", 28), ("Transport", 22), ("Leisure", 15), ("Utilities", 10), ("Entertainment", 8),
+              ("Other", 8), ("Health", 6), ("Education", 3))
+BANKS = (("HDFC", 40), ("SBI", 25), ("ICICI", 20), ("Axis", 10), (None, 5))
+ACCOUNT_TYPES = (("Savings Account", 50), ("Credit Card", 35), ("Cash", 15))
+CURRENCIES = (("INR", 97), ("USD", 2), ("EUR", 1))
+
+# Median amount in INR per category; other currencies are scaled down by INR_PER_UNIT
+TYPICAL_AMOUNTS = {"Groceries": 800, "Transport": 300, "Leisure": 1200, "Utilities": 1500, "Entertainment": 400,
+                   "Other": 700, "Health": 1000, "Education": 5000}
+INR_PER_UNIT = {"INR": 1, "USD": 83, "EUR": 90}
+PAYEES = {
+    "Groceries": ("DMart", "Big Bazaar", "Reliance Fresh", "More Supermarket", "Milk delivery"),
+    "Transport": ("Uber", "Ola", "Shell petrol", "Metro card recharge", "FASTag toll"),
+    "Leisure": ("Cafe Coffee Day", "A2B restaurant", "Zomato", "Swiggy", "Hotel booking"),
+    "Utilities": ("Electricity bill", "Airtel broadband", "Jio recharge", "Gas cylinder", "Rent"),
+    "Entertainment": ("Netflix", "Hotstar", "PVR cinemas", "Spotify", "BookMyShow"),
+    "Other": ("Amazon", "Flipkart", "ATM withdrawal", "Gift", "Donation"),
+    "Health": ("Apollo Pharmacy", "Clinic visit", "Gym membership", "Health insurance", "Dentist"),
+    "Education": ("School fees", "Online course", "Books", "Tuition", "Exam fees"),
+}
+
+INSERT_BATCH_SIZE = 50_000
+
+
+def user_email(n):
+    return f"user{n:05d}@example.com"
+
+
+def _sampler(pairs, rng):
+    """Returns a function drawing one value of (value, weight) pairs."""
+    values = [value for value, _ in pairs]
+    cum_weights = list(itertools.accumulate(weight for _, weight in pairs))
+    total = cum_weights[-1]
+    return lambda: values[bisect.bisect(cum_weights, rng.random() * total)]
+
+
+def generate_records(users, transactions, days=1825, skew=1.1, seed=0, today=None):
+    """
+    Yields `transactions` record dicts (as insert_record expects) spread over `users` users.
+
+    :param days: Dates fall within this many days before today.
+    :param skew: Zipf exponent of the transactions per user; 0 spreads them evenly.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    created_date = today.isoformat()
+    user_weights = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(users)))
+    category = _sampler(CATEGORIES, rng)
+    bank = _sampler(BANKS, rng)
+    account_type = _sampler(ACCOUNT_TYPES, rng)
+    currency = _sampler(CURRENCIES, rng)
+    mean_age = days / 3
+
+    for i in range(transactions):
+        user = bisect.bisect(user_weights, rng.random() * user_weights[-1])
+        age = min(int(rng.expovariate(1 / mean_age)), days - 1)
+        name = category()
+        unit = currency()
+        amount = rng.lognormvariate(math.log(TYPICAL_AMOUNTS[name] / INR_PER_UNIT[unit]), 0.8)
+        yield {
+            "Transaction Date": (today - timedelta(days=age)).isoformat(),
+            "Bank Name": bank(),
+            "Account Type": account_type(),
+            "Transaction Amount": round(amount, 2),
+            "Transaction Currency": unit,
+            "Transaction Category": name,
+            "Transaction Description": f"UPI/{i}/{rng.choice(PAYEES[name])}",
+            "user_email": user_email(min(user, users - 1)),
+            "created_date": created_date,
+        }
+
+
+def create_users(users):
+    """Creates the accounts user00000..; they share one password hash, bcrypt being far too slow to run per user."""
+    hashed = hash_password(DATAGEN_PASSWORD)
+    created_at = datetime.now().strftime("%Y-%m-%d")
+    with get_connection(db_operations.db_file_name) as conn:
+        conn.executemany(
+            f"""INSERT OR IGNORE INTO {db_operations.db_users_table_name}
+                (user_name, user_email, user_encrypted_password, created_by, created_at) VALUES (?, ?, ?, ?, ?)""",
+            ((f"User {n}", user_email(n), hashed, "DATAGEN", created_at) for n in range(users)))
+
+
+def populate(users, transactions, days=1825, skew=1.1, seed=0, progress=False):
+    """
+    Creates the schema, the users and their transactions in db_operations.db_file_name.
+
+    :return: Number of transactions inserted.
+    """
+    db_operations.create_table()
+    create_users(users)
+    records = generate_records(users, transactions, days, skew, seed)
+    inserted = 0
+    started = time.perf_counter()
+    while True:
+        batch = list(itertools.islice(records, INSERT_BATCH_SIZE))
+        if not batch:
+            return inserted
+        inserted += db_operations.insert_records(batch)[0]
+        if progress:
+            elapsed = time.perf_counter() - started
+            print(f"{inserted:,} transactions in {elapsed:.1f} s ({inserted / elapsed:,.0f}/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic transactions database")
+    parser.add_argument("--db", help="Database file to fill (default: DATABASE_FILE_NAME)")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=1825, help="Dates fall within this many days before today")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of transactions per user")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.db:
+        db_operations.db_file_name = os.path.abspath(args.db)
+    inserted = populate(args.users, args.transactions, args.days, args.skew, args.seed, progress=True)
+    print(f"Generated {inserted:,} transactions for {args.users:,} users in {db_operations.db_file_name}")
+
+
+if __name__ == "__main__":
+    main()
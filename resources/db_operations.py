@@ -1,24 +1,345 @@
-import sqlite3
+import functools
+import hashlib
+import math
+import re
+import threading
 from datetime import datetime, date, timedelta
-import streamlit as st
+import numpy as np
+import pandas as pd
+from config import get_setting
+from db_pool import call_after_commit, get_connection
+from metrics import timed_function
+from migrations import MigrationError, run_migrations
 
-db_file_name = st.secrets["api_keys"]["DATABASE_FILE_NAME"]
-db_txn_table_name = st.secrets["api_keys"]["DB_TRANSACTION_TABLE_NAME"]
-db_users_table_name= st.secrets["api_keys"]["DB_USER_TABLE_NAME"]
+db_file_name = get_setting("DATABASE_FILE_NAME")
+db_txn_table_name = get_setting("DB_TRANSACTION_TABLE_NAME")
+db_users_table_name= get_setting("DB_USER_TABLE_NAME")
+db_rollup_table_name = f"{db_txn_table_name}_monthly_rollup"
+db_sessions_table_name = f"{db_users_table_name}_sessions"
+# Read-only view presenting the compact transactions table with the original column names and values
+db_txn_view_name = f"{db_txn_table_name}_view"
 
-selected_col_names = ("transaction_date, bank_name, account_type, transaction_amount, transaction_currency, "
-                      "transaction_category, transaction_desc")
+# Lookup tables for the low-cardinality columns: original column -> (lookup table, id column in transactions)
+lookup_tables = {
+    "bank_name": (f"{db_txn_table_name}_banks", "bank_id"),
+    "account_type": (f"{db_txn_table_name}_account_types", "account_type_id"),
+    "transaction_currency": (f"{db_txn_table_name}_currencies", "currency_id"),
+    "transaction_category": (f"{db_txn_table_name}_categories", "category_id"),
+}
+db_currency_table_name = lookup_tables["transaction_currency"][0]
+db_category_table_name = lookup_tables["transaction_category"][0]
 
-selected_col_names_for_delete = ("id, transaction_date, bank_name, account_type, transaction_amount, "
-                                 "transaction_currency, transaction_category, transaction_desc")
+# Amounts are stored as integers in the currency's minor unit; currencies not listed here use cents
+CURRENCY_MINOR_UNITS = {
+    "JPY": 1, "KRW": 1, "VND": 1, "CLP": 1, "ISK": 1, "UGX": 1, "PYG": 1,
+    "KWD": 1000, "BHD": 1000, "OMR": 1000, "JOD": 1000, "TND": 1000, "IQD": 1000, "LYD": 1000,
+}
+DEFAULT_MINOR_UNITS = 100
 
+# Dates are stored as the number of days since 1970-01-01
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
 
+# Columns that may be requested from fetch_transactions_range
+transaction_col_names = ("id", "transaction_date", "bank_name", "account_type", "transaction_amount",
+                         "transaction_currency", "transaction_category", "transaction_desc", "user_email",
+                         "created_date")
+
+selected_col_names = ("transaction_date", "bank_name", "account_type", "transaction_amount", "transaction_currency",
+                      "transaction_category", "transaction_desc")
+
+selected_col_names_for_delete = ("id",) + selected_col_names
+
+# Column of the compact transactions table that each of the columns above is decoded from
+storage_col_names = {
+    "id": "id",
+    "transaction_date": "transaction_day",
+    "bank_name": "bank_id",
+    "account_type": "account_type_id",
+    "transaction_amount": "amount_minor",
+    "transaction_currency": "currency_id",
+    "transaction_category": "category_id",
+    "transaction_desc": "transaction_desc",
+    "user_email": "user_email",
+    "created_date": "created_day",
+}
+
+# Column kinds used to type the DataFrames built by records_to_frame
+date_col_names = ("transaction_date", "created_date")
+amount_col_names = ("transaction_amount",)
+categorical_col_names = ("bank_name", "account_type", "transaction_currency", "transaction_category")
+
+# Largest number of values bound into one "IN (...)" list; longer lists are split into chunks
+SQL_IN_CHUNK_SIZE = 500
+
+# Open-ended day bounds used when a range has no start or end, so every range query shares one statement text
+min_transaction_day = -(2 ** 31)
+max_transaction_day = 2 ** 31
+
+
+@timed_function("db_operation_seconds")
 def create_table():
     """
-    Creates the transactions table if it doesn't already exist.
+    Creates the transactions, users and lookup tables and brings the schema up to date.
+    :return: List of (version, name) of the migrations applied by this call.
+    """
+    with get_connection(db_file_name) as conn:
+        return run_migrations(conn, schema_migrations)
+
+
+class InvalidRecordError(ValueError):
+    """Raised for a transaction record whose date or amount can't be stored without losing it."""
+    def __init__(self, field, value):
+        super().__init__(f"Invalid {field}: {value!r}")
+        self.field = field
+        self.value = value
+
+
+# Date formats accepted for transaction dates besides ISO "YYYY-MM-DD", tried in order. Numeric dates are
+# read day first; a month-first date such as "10/19/2026" is rejected rather than guessed.
+record_date_formats = ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y/%m/%d", "%d %b %Y", "%d %B %Y", "%d-%b-%Y",
+                       "%b %d, %Y", "%B %d, %Y")
+
+# A leading ISO date, as in "2026-10-19" or "2026-10-19 08:30:00"
+_iso_date_pattern = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[T ].*)?$")
+
+# Currency symbols and codes allowed around an amount, and thousands separators in Western
+# (1,200,000) or Indian (12,00,000) grouping
+_amount_currency_pattern = re.compile(r"^(?:rs\.?|inr|usd|eur|gbp|[₹$€£])\s*|\s*(?:inr|usd|eur|gbp)$",
+                                      re.IGNORECASE)
+_grouped_amount_pattern = re.compile(r"^[+-]?\d{1,3}(?:,\d{2,3})+(?:\.\d+)?$")
+
+
+def normalize_date(value, field="Transaction Date"):
+    """
+    Returns a date, datetime or date string (see record_date_formats) as "YYYY-MM-DD".
+    Raises InvalidRecordError for missing or unparseable values.
+    """
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = " ".join(str(value).split()) if value is not None else ""
+    if _iso_date_pattern.match(text):
+        try:
+            return date.fromisoformat(text[:10]).isoformat()
+        except ValueError:
+            raise InvalidRecordError(field, value) from None
+    for date_format in record_date_formats:
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            continue
+    raise InvalidRecordError(field, value)
+
+
+def normalize_amount(value, field="Transaction Amount"):
+    """
+    Returns an amount as a float. Strings may carry a currency symbol or code and thousands separators
+    ("Rs 1,200.50"). Raises InvalidRecordError for missing, non-numeric or non-finite values.
+    """
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        amount = float(value)
+    else:
+        text = _amount_currency_pattern.sub("", str(value).strip()) if value is not None else ""
+        if "," in text:
+            if not _grouped_amount_pattern.match(text):
+                raise InvalidRecordError(field, value)
+            text = text.replace(",", "")
+        try:
+            amount = float(text)
+        except ValueError:
+            raise InvalidRecordError(field, value) from None
+    if not math.isfinite(amount):
+        raise InvalidRecordError(field, value)
+    return amount
+
+
+def normalize_record(record):
+    """
+    Returns a copy of a transaction record with its date as "YYYY-MM-DD" and its amount as a float, and
+    created_date set to today when missing. Raises InvalidRecordError if either can't be read, so a
+    record is never stored with its date or amount lost.
+    """
+    normalized = dict(record)
+    normalized["Transaction Date"] = normalize_date(record.get("Transaction Date"))
+    normalized["Transaction Amount"] = normalize_amount(record.get("Transaction Amount"))
+    created_date = record.get("created_date")
+    normalized["created_date"] = (date.today().isoformat() if created_date in (None, "")
+                                  else normalize_date(created_date, "created_date"))
+    return normalized
+
+
+def to_epoch_day(value):
+    """
+    Converts a date or a date string accepted by normalize_date to the number of days since 1970-01-01.
+    Raises InvalidRecordError for missing or unparseable values.
+    """
+    if not isinstance(value, date):
+        value = date.fromisoformat(normalize_date(value))
+    elif isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+@functools.lru_cache(maxsize=65536)
+def from_epoch_day(day):
+    """Converts a number of days since 1970-01-01 back to a "YYYY-MM-DD" string."""
+    return None if day is None else date.fromordinal(day + EPOCH_ORDINAL).strftime("%Y-%m-%d")
+
+
+def minor_units(currency):
+    """Returns the number of minor units in one unit of the currency (100 for cents)."""
+    return CURRENCY_MINOR_UNITS.get(str(currency).strip().upper(), DEFAULT_MINOR_UNITS)
+
+
+def to_minor_units(amount, currency):
+    """
+    Converts an amount (see normalize_amount) to an integer number of the currency's minor units.
+    Raises InvalidRecordError for amounts that aren't numbers.
+    """
+    return int(round(normalize_amount(amount) * minor_units(currency)))
+
+
+# Lookup ids already known to be committed, keyed by (database file, column, value)
+_lookup_ids = {}
+
+
+def _lookup_id(cursor, column, value):
+    """
+    Returns the id of `value` in the lookup table of `column`, adding the value on first use.
+    The id is cached only once the transaction commits, as the row may have been added earlier in it.
+    """
+    if value is None:
+        return None
+    key = (db_file_name, column, value)
+    if key in _lookup_ids:
+        return _lookup_ids[key]
+
+    table, _ = lookup_tables[column]
+    if column == "transaction_currency":
+        cursor.execute(f"""INSERT INTO {table} (name, minor_per_unit) VALUES (?, ?)
+            ON CONFLICT (name) DO NOTHING""", (value, minor_units(value)))
+    else:
+        cursor.execute(f"INSERT INTO {table} (name) VALUES (?) ON CONFLICT (name) DO NOTHING", (value,))
+    lookup_id = cursor.execute(f"SELECT id FROM {table} WHERE name = ?", (value,)).fetchone()[0]
+
+    def publish():
+        _lookup_ids[key] = lookup_id
+    call_after_commit(db_file_name, publish)
+    return lookup_id
+
+
+class _LookupValues(dict):
+    """
+    Cached id -> value map of one lookup table column. Lookup rows are never changed or deleted, so the
+    table only has to be re-read when an id that is not in the map yet is requested.
+    """
+    def __init__(self, table, value_column):
+        super().__init__({None: None})
+        self.table = table
+        self.value_column = value_column
+
+    def __missing__(self, lookup_id):
+        with get_connection(db_file_name) as conn:
+            rows = conn.execute(f"SELECT id, {self.value_column} FROM {self.table}").fetchall()
+            if conn.in_transaction:
+                # May include lookup rows of a write that could still be rolled back; don't cache them
+                return dict(rows).get(lookup_id)
+        self.update(rows)
+        return dict.get(self, lookup_id)
+
+
+# Cached lookup maps, keyed by (database file, lookup table, value column)
+_lookup_values = {}
+
+
+def _lookup_map(table, value_column="name"):
+    key = (db_file_name, table, value_column)
+    if key not in _lookup_values:
+        _lookup_values[key] = _LookupValues(table, value_column)
+    return _lookup_values[key]
+
+
+def compute_dedup_key(record):
+    """
+    Returns the duplicate-detection fingerprint of a transaction record.
+
+    The date, bank, account type, amount, currency, category, description and user email are
+    canonicalized (trimmed, upper-cased, amount as an integer number of the currency's minor units,
+    missing values as empty strings) and hashed, so two records that differ only in case or whitespace
+    share the same key, while amounts that differ in the third decimal of a 3-decimal currency don't.
+    """
+    def canonical(value):
+        return "" if value is None else " ".join(str(value).split()).upper()
+
+    amount = record.get("Transaction Amount")
+    try:
+        amount = str(to_minor_units(amount, record.get("Transaction Currency")))
+    except InvalidRecordError:
+        amount = canonical(amount)
+
+    parts = (
+        canonical(record.get("Transaction Date"))[:10],
+        canonical(record.get("Bank Name")),
+        canonical(record.get("Account Type")),
+        amount,
+        canonical(record.get("Transaction Currency")),
+        canonical(record.get("Transaction Category")),
+        canonical(record.get("Transaction Description")),
+        canonical(record.get("user_email")),
+    )
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _record_dedup_key(record):
+    """Returns the record's own "dedup_key" (e.g. set by the statement importer) or else compute_dedup_key."""
+    return record.get("dedup_key") or compute_dedup_key(record)
+
+
+def _table_columns(cursor, table):
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+
+
+def _migrate_dedup_key(cursor):
+    """
+    Adds the dedup_key column and its UNIQUE index to an existing transactions table and backfills
+    the keys of rows created before the column existed. Safe to run repeatedly.
+    """
+    if "dedup_key" not in _table_columns(cursor, db_txn_table_name):
+        cursor.execute(f"ALTER TABLE {db_txn_table_name} ADD COLUMN dedup_key TEXT")
+
+    rows = cursor.execute(f"""
+        SELECT id, transaction_date, bank_name, account_type, transaction_amount,
+               transaction_currency, transaction_category, transaction_desc, user_email
+        FROM {db_txn_table_name}
+        WHERE dedup_key IS NULL
+        ORDER BY id
+    """).fetchall()
+    if rows:
+        seen = {key for (key,) in cursor.execute(
+            f"SELECT dedup_key FROM {db_txn_table_name} WHERE dedup_key IS NOT NULL")}
+        updates = []
+        for row in rows:
+            key = compute_dedup_key(dict(zip(
+                ("id", "Transaction Date", "Bank Name", "Account Type", "Transaction Amount",
+                 "Transaction Currency", "Transaction Category", "Transaction Description", "user_email"), row)))
+            # Rows that duplicate an earlier one keep a NULL key so the unique index can still be built
+            if key not in seen:
+                seen.add(key)
+                updates.append((key, row[0]))
+        cursor.executemany(f"UPDATE {db_txn_table_name} SET dedup_key = ? WHERE id = ?", updates)
+
+    cursor.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_{db_txn_table_name}_dedup_key
+        ON {db_txn_table_name} (dedup_key)
+    """)
+
+
+def _migration_baseline(cursor):
+    """
+    Migration 1: the schema as it was before versioning, with text dates and REAL amounts.
+    Existing databases already have it; the dedup_key backfill is the only step that changes them.
     """
-    conn = sqlite3.connect(db_file_name)
-    cursor = conn.cursor()
     cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS {db_txn_table_name} (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -30,7 +351,8 @@ def create_table():
             transaction_category TEXT,
             transaction_desc TEXT,
             user_email TEXT,
-            created_date TEXT
+            created_date TEXT,
+            dedup_key TEXT
         )
     """)
     cursor.execute(f"""
@@ -43,202 +365,932 @@ def create_table():
         created_at TEXT
     );
     """)
-    conn.commit()
-    conn.close()
+    _migrate_dedup_key(cursor)
 
 
-def insert_record(record):
+# Most unconvertible rows listed by name in a migration's error report
+MIGRATION_REPORT_MAX_ROWS = 20
+
+
+def _compact_row(row, lookup_ids):
     """
-    Inserts a record into the transactions table if it does not already exist.
+    Converts a pre-compact transactions row to the values of the compact table, reading its dates and
+    amount with the same parsers as insert_record. Raises InvalidRecordError for a value it can't read;
+    only a missing created_date is kept as NULL.
+    """
+    (row_id, user_email, transaction_date, amount, currency, category, bank, account_type, desc, created_date,
+     dedup_key) = row
+    return (
+        row_id,
+        user_email,
+        to_epoch_day(transaction_date),
+        to_minor_units(amount, currency),
+        lookup_ids["transaction_currency"].get(currency),
+        lookup_ids["transaction_category"].get(category),
+        lookup_ids["bank_name"].get(bank),
+        lookup_ids["account_type"].get(account_type),
+        desc,
+        None if created_date in (None, "") else to_epoch_day(normalize_date(created_date, "created_date")),
+        dedup_key,
+    )
+
+
+def _unreadable_rows_report(table, unreadable):
+    """Formats the (row id, error) pairs of rows a migration can't convert as a MigrationError message."""
+    lines = [f"Can't convert {len(unreadable)} rows of {table}; nothing was changed. "
+             f"Fix or delete these rows and migrate again:"]
+    lines.extend(f"  id {row_id}: {error}" for row_id, error in unreadable[:MIGRATION_REPORT_MAX_ROWS])
+    if len(unreadable) > MIGRATION_REPORT_MAX_ROWS:
+        lines.append(f"  ... and {len(unreadable) - MIGRATION_REPORT_MAX_ROWS} more")
+    return "\n".join(lines)
+
+
+def _migration_compact_storage(cursor):
+    """
+    Migration 2: rewrites the transactions table in a compact form.
+
+    Amounts become integers in the currency's minor unit, dates integer days since 1970-01-01, and
+    bank, account type, currency and category small integer ids into lookup tables. Row ids and
+    dedup keys are kept. The monthly rollup is recreated on the new columns with exact integer totals,
+    and db_txn_view_name presents the rows with the original column names.
+
+    Dates and amounts are read with the same parsers as insert_record; if any row has one that can't be
+    read, the migration stops with a MigrationError listing those rows.
+    """
+    for table, _ in lookup_tables.values():
+        extra = ", minor_per_unit INTEGER NOT NULL" if table == db_currency_table_name else ""
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE{extra}
+            )
+        """)
+
+    if "transaction_day" not in _table_columns(cursor, db_txn_table_name):
+        # The rollup and its triggers are rebuilt below on the new columns
+        cursor.execute(f"DROP TABLE IF EXISTS {db_rollup_table_name}")
+
+        minor_units_case = " ".join(f"WHEN '{code}' THEN {units}" for code, units in CURRENCY_MINOR_UNITS.items())
+        for column, (table, _) in lookup_tables.items():
+            if table == db_currency_table_name:
+                cursor.execute(f"""
+                    INSERT INTO {table} (name, minor_per_unit)
+                    SELECT DISTINCT {column},
+                        CASE upper(trim({column})) {minor_units_case} ELSE {DEFAULT_MINOR_UNITS} END
+                    FROM {db_txn_table_name} WHERE {column} IS NOT NULL
+                    ON CONFLICT (name) DO NOTHING
+                """)
+            else:
+                cursor.execute(f"""
+                    INSERT INTO {table} (name)
+                    SELECT DISTINCT {column} FROM {db_txn_table_name} WHERE {column} IS NOT NULL
+                    ON CONFLICT (name) DO NOTHING
+                """)
+
+        compact_table_name = f"{db_txn_table_name}_compact"
+        cursor.execute(f"DROP TABLE IF EXISTS {compact_table_name}")
+        cursor.execute(f"""
+            CREATE TABLE {compact_table_name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_email TEXT,
+                transaction_day INTEGER,
+                amount_minor INTEGER,
+                currency_id INTEGER,
+                category_id INTEGER,
+                bank_id INTEGER,
+                account_type_id INTEGER,
+                transaction_desc TEXT,
+                created_day INTEGER,
+                dedup_key TEXT
+            )
+        """)
+        lookup_ids = {column: dict(cursor.execute(f"SELECT name, id FROM {table}").fetchall())
+                      for column, (table, _) in lookup_tables.items()}
+        compact_rows, unreadable = [], []
+        for row in cursor.execute(f"""
+            SELECT id, user_email, transaction_date, transaction_amount, transaction_currency,
+                   transaction_category, bank_name, account_type, transaction_desc, created_date, dedup_key
+            FROM {db_txn_table_name}
+            ORDER BY id
+        """).fetchall():
+            try:
+                compact_rows.append(_compact_row(row, lookup_ids))
+            except InvalidRecordError as error:
+                unreadable.append((row[0], error))
+        if unreadable:
+            raise MigrationError(_unreadable_rows_report(db_txn_table_name, unreadable))
+        cursor.executemany(f"""
+            INSERT INTO {compact_table_name}
+                (id, user_email, transaction_day, amount_minor, currency_id, category_id, bank_id,
+                 account_type_id, transaction_desc, created_day, dedup_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, compact_rows)
+        # Keep the AUTOINCREMENT high-water mark so ids of deleted rows are never reused
+        cursor.execute(f"""
+            UPDATE sqlite_sequence
+            SET seq = max(seq, coalesce((SELECT seq FROM sqlite_sequence WHERE name = ?), 0))
+            WHERE name = ?
+        """, (db_txn_table_name, compact_table_name))
+        cursor.execute(f"DROP TABLE {db_txn_table_name}")
+        cursor.execute(f"ALTER TABLE {compact_table_name} RENAME TO {db_txn_table_name}")
+
+    # Serves the per-user date filters and the "newest first" ordering of every fetch
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_{db_txn_table_name}_user_day
+        ON {db_txn_table_name} (user_email, transaction_day DESC, id DESC)
+    """)
+    cursor.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_{db_txn_table_name}_dedup_key
+        ON {db_txn_table_name} (dedup_key)
+    """)
+    cursor.execute(f"""
+        CREATE VIEW IF NOT EXISTS {db_txn_view_name} AS
+        SELECT t.id,
+               date(t.transaction_day * 86400, 'unixepoch') AS transaction_date,
+               bank.name AS bank_name,
+               account.name AS account_type,
+               t.amount_minor * 1.0 / currency.minor_per_unit AS transaction_amount,
+               currency.name AS transaction_currency,
+               category.name AS transaction_category,
+               t.transaction_desc,
+               t.user_email,
+               date(t.created_day * 86400, 'unixepoch') AS created_date,
+               t.dedup_key,
+               t.transaction_day
+        FROM {db_txn_table_name} AS t
+        LEFT JOIN {lookup_tables["bank_name"][0]} AS bank ON bank.id = t.bank_id
+        LEFT JOIN {lookup_tables["account_type"][0]} AS account ON account.id = t.account_type_id
+        LEFT JOIN {db_currency_table_name} AS currency ON currency.id = t.currency_id
+        LEFT JOIN {db_category_table_name} AS category ON category.id = t.category_id
+    """)
+    _create_monthly_rollup(cursor)
+
+
+def _sql_month_start_day(row):
+    """SQL giving the first day (days since 1970-01-01) of the month of the `row` transaction."""
+    return f"CAST(strftime('%s', {row}.transaction_day * 86400, 'unixepoch', 'start of month') AS INTEGER) / 86400"
+
+
+def _sql_month_end_day(row):
+    """SQL giving the first day (days since 1970-01-01) of the month after the `row` transaction."""
+    return (f"CAST(strftime('%s', {row}.transaction_day * 86400, 'unixepoch', 'start of month', '+1 month')"
+            f" AS INTEGER) / 86400")
+
+
+def _rollup_add_sql(row):
+    """SQL adding the `row` (NEW/OLD) transaction to its monthly rollup group."""
+    return f"""
+        INSERT INTO {db_rollup_table_name}
+            (user_email, month, category_id, currency_id, total_minor, txn_count, min_minor, max_minor)
+        VALUES (
+            coalesce({row}.user_email, ''),
+            coalesce(strftime('%Y-%m', {row}.transaction_day * 86400, 'unixepoch'), ''),
+            coalesce({row}.category_id, 0), coalesce({row}.currency_id, 0),
+            coalesce({row}.amount_minor, 0), 1,
+            coalesce({row}.amount_minor, 0), coalesce({row}.amount_minor, 0)
+        )
+        ON CONFLICT (user_email, month, category_id, currency_id) DO UPDATE SET
+            total_minor = total_minor + excluded.total_minor,
+            txn_count = txn_count + 1,
+            min_minor = min(min_minor, excluded.min_minor),
+            max_minor = max(max_minor, excluded.max_minor);
+    """
+
+
+def _rollup_remove_sql(row):
+    """
+    SQL removing the `row` (NEW/OLD) transaction from its monthly rollup group.
+    min/max are only recomputed, from the group's rows via the (user_email, transaction_day) index,
+    when the removed amount was the group's minimum or maximum.
+    """
+    group = f"""user_email = coalesce({row}.user_email, '')
+            AND month = coalesce(strftime('%Y-%m', {row}.transaction_day * 86400, 'unixepoch'), '')
+            AND category_id = coalesce({row}.category_id, 0)
+            AND currency_id = coalesce({row}.currency_id, 0)"""
+    group_rows = f"""FROM {db_txn_table_name}
+                WHERE user_email = {row}.user_email
+                AND transaction_day >= {_sql_month_start_day(row)}
+                AND transaction_day < {_sql_month_end_day(row)}
+                AND coalesce(category_id, 0) = coalesce({row}.category_id, 0)
+                AND coalesce(currency_id, 0) = coalesce({row}.currency_id, 0)"""
+    return f"""
+        UPDATE {db_rollup_table_name} SET
+            total_minor = total_minor - coalesce({row}.amount_minor, 0),
+            txn_count = txn_count - 1,
+            min_minor = CASE WHEN coalesce({row}.amount_minor, 0) <= min_minor
+                THEN (SELECT min(coalesce(amount_minor, 0)) {group_rows}) ELSE min_minor END,
+            max_minor = CASE WHEN coalesce({row}.amount_minor, 0) >= max_minor
+                THEN (SELECT max(coalesce(amount_minor, 0)) {group_rows}) ELSE max_minor END
+        WHERE {group};
+        DELETE FROM {db_rollup_table_name} WHERE {group} AND txn_count <= 0;
+    """
+
+
+def _create_monthly_rollup(cursor):
+    """
+    Creates the per (user, month, category, currency) rollup table and the triggers that keep it
+    up to date in the same transaction as every insert, delete or update of a transaction.
+    Totals are exact integer sums in minor units. The table is filled from the existing
+    transactions when it is first created.
     """
-    conn = sqlite3.connect(db_file_name)
-    cursor = conn.cursor()
+    exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                            (db_rollup_table_name,)).fetchone()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {db_rollup_table_name} (
+            user_email TEXT NOT NULL,
+            month TEXT NOT NULL,
+            category_id INTEGER NOT NULL,
+            currency_id INTEGER NOT NULL,
+            total_minor INTEGER NOT NULL,
+            txn_count INTEGER NOT NULL,
+            min_minor INTEGER,
+            max_minor INTEGER,
+            PRIMARY KEY (user_email, month, category_id, currency_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{db_txn_table_name}_rollup_insert
+        AFTER INSERT ON {db_txn_table_name}
+        BEGIN
+            {_rollup_add_sql("NEW")}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{db_txn_table_name}_rollup_delete
+        AFTER DELETE ON {db_txn_table_name}
+        BEGIN
+            {_rollup_remove_sql("OLD")}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{db_txn_table_name}_rollup_update
+        AFTER UPDATE OF user_email, transaction_day, amount_minor, currency_id, category_id
+        ON {db_txn_table_name}
+        BEGIN
+            {_rollup_remove_sql("OLD")}
+            {_rollup_add_sql("NEW")}
+        END
+    """)
+    if not exists:
+        rebuild_monthly_rollup()
 
-    # Check if the record already exists
+
+def _migration_sessions(cursor):
+    """
+    Migration 3: the sessions table behind the persistent sign-in tokens of accounts.create_session.
+    A token is looked up by its random id, the primary key.
+    """
     cursor.execute(f"""
-        SELECT * FROM {db_txn_table_name}
-        WHERE transaction_date = ? AND coalesce(bank_name,'X') = coalesce(?,'X') 
-        AND coalesce(account_type,'X') = coalesce(?,'X') 
-        AND transaction_amount = ? 
-        AND coalesce(transaction_currency,'X') = coalesce(?,'X') 
-        AND coalesce(transaction_category,'X') = coalesce(?,'X') 
-        AND upper(coalesce(transaction_desc,'X')) = Upper(coalesce(?,'X')) 
-        AND upper(user_email) = Upper(?) 
-    """, (
-        record["Transaction Date"],
-        record["Bank Name"],
-        record["Account Type"],
-        record["Transaction Amount"],
-        record["Transaction Currency"],
-        record["Transaction Category"],
+        CREATE TABLE IF NOT EXISTS {db_sessions_table_name} (
+            token_id TEXT PRIMARY KEY,
+            user_email TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL,
+            revoked_at INTEGER
+        ) WITHOUT ROWID
+    """)
+
+
+def _migration_dedup_key_minor_units(cursor):
+    """
+    Migration 4: recomputes the dedup keys of existing rows, as compute_dedup_key now hashes amounts in
+    minor units instead of rounded to 2 decimals. A row whose new key an earlier row already has keeps its
+    old key, so no row is dropped; rows without a key are left alone.
+    """
+    rows = cursor.execute(f"""
+        SELECT v.id, v.transaction_date, v.bank_name, v.account_type, t.amount_minor, v.transaction_currency,
+               v.transaction_category, v.transaction_desc, v.user_email
+        FROM {db_txn_view_name} AS v
+        JOIN {db_txn_table_name} AS t ON t.id = v.id
+        WHERE v.dedup_key IS NOT NULL
+        ORDER BY v.id
+    """).fetchall()
+    seen = set()
+    updates = []
+    for row_id, transaction_date, bank, account_type, amount_minor, currency, category, desc, user_email in rows:
+        key = compute_dedup_key({
+            "Transaction Date": transaction_date,
+            "Bank Name": bank,
+            "Account Type": account_type,
+            "Transaction Amount": None if amount_minor is None else amount_minor / minor_units(currency),
+            "Transaction Currency": currency,
+            "Transaction Category": category,
+            "Transaction Description": desc,
+            "user_email": user_email,
+        })
+        if key not in seen:
+            seen.add(key)
+            updates.append((key, row_id))
+    cursor.executemany(f"UPDATE {db_txn_table_name} SET dedup_key = ? WHERE id = ?", updates)
+
+
+# Schema migrations applied by create_table, in order; never edit or renumber an applied step
+schema_migrations = (
+    (1, "baseline", _migration_baseline),
+    (2, "compact_storage", _migration_compact_storage),
+    (3, "sessions", _migration_sessions),
+    (4, "dedup_key_minor_units", _migration_dedup_key_minor_units),
+)
+
+
+@timed_function("db_operation_seconds")
+def rebuild_monthly_rollup(signedin_user_email=None):
+    """
+    Recomputes the monthly rollup from the transactions table, for one user or for everyone.
+    :return: Number of rollup rows written.
+    """
+    user_filter = "WHERE user_email = ?" if signedin_user_email else ""
+    params = (signedin_user_email,) if signedin_user_email else ()
+    with get_connection(db_file_name) as conn:
+        conn.execute(f"DELETE FROM {db_rollup_table_name} {user_filter}", params)
+        return conn.execute(f"""
+            INSERT INTO {db_rollup_table_name}
+                (user_email, month, category_id, currency_id, total_minor, txn_count, min_minor, max_minor)
+            SELECT coalesce(user_email, ''),
+                   coalesce(strftime('%Y-%m', transaction_day * 86400, 'unixepoch'), ''),
+                   coalesce(category_id, 0), coalesce(currency_id, 0),
+                   sum(coalesce(amount_minor, 0)), count(*),
+                   min(coalesce(amount_minor, 0)), max(coalesce(amount_minor, 0))
+            FROM {db_txn_table_name}
+            {user_filter}
+            GROUP BY 1, 2, 3, 4
+        """, params).rowcount
+
+
+# Column order of the values built by _storage_values
+_insert_sql = f"""
+    INSERT INTO {db_txn_table_name} (
+        transaction_day, bank_id, account_type_id,
+        amount_minor, currency_id,
+        category_id, transaction_desc,
+        user_email, created_day, dedup_key
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (dedup_key) DO NOTHING
+"""
+
+
+def _storage_values(cursor, record, dedup_key):
+    """Converts a record dict to the values of _insert_sql, adding new lookup values as needed."""
+    return (
+        to_epoch_day(record["Transaction Date"]),
+        _lookup_id(cursor, "bank_name", record["Bank Name"]),
+        _lookup_id(cursor, "account_type", record["Account Type"]),
+        to_minor_units(record["Transaction Amount"], record["Transaction Currency"]),
+        _lookup_id(cursor, "transaction_currency", record["Transaction Currency"]),
+        _lookup_id(cursor, "transaction_category", record["Transaction Category"]),
         record["Transaction Description"],
-        record["user_email"]
-    ))
+        record["user_email"],
+        to_epoch_day(record["created_date"]),
+        dedup_key,
+    )
 
-    existing_record = cursor.fetchone()
 
-    # Insert the record only if it doesn't exist
-    if not existing_record:
-        cursor.execute(f"""
-            INSERT INTO {db_txn_table_name} (
-                transaction_date, bank_name, account_type,
-                transaction_amount, transaction_currency,
-                transaction_category, transaction_desc, 
-                user_email, created_date
-            ) VALUES (?, ?, ?, ?, ?, ?, ?,?,?)
-        """, (
-            record["Transaction Date"],
-            record["Bank Name"],
-            record["Account Type"],
-            record["Transaction Amount"],
-            record["Transaction Currency"],
-            record["Transaction Category"],
-            record["Transaction Description"],
-            record["user_email"],
-            record["created_date"]
-        ))
-        conn.commit()
-        print("Committed")
-        return "Transaction details saved successfully!"
-    else:
-        print("Not inserted. Duplicate record.")
-        return "Transaction details could NOT be saved!. Duplicate record."
-    conn.close()
+# Per-user counters bumped whenever a user's transactions change, see data_version
+_data_versions = {}
+_data_versions_lock = threading.Lock()
+
+
+def data_version(signedin_user_email):
+    """
+    Returns a number that changes every time the user's transactions are inserted or deleted in this
+    process, for keying cached query results (see query_cache.py). Read it before running the query:
+    it is bumped only after the change has been committed.
+    """
+    with _data_versions_lock:
+        return _data_versions.get(signedin_user_email, 0)
+
+
+def _transactions_changed(user_emails):
+    """Bumps the data version of the users once the current transaction commits."""
+    def bump():
+        with _data_versions_lock:
+            for user_email in user_emails:
+                _data_versions[user_email] = _data_versions.get(user_email, 0) + 1
+    call_after_commit(db_file_name, bump)
+
+
+@timed_function("db_operation_seconds")
+def insert_record(record):
+    """
+    Inserts a record into the transactions table if it does not already exist.
+    Raises InvalidRecordError for a record whose date or amount can't be read (see normalize_record).
+    """
+    record = normalize_record(record)
+    with get_connection(db_file_name) as conn:
+        cursor = conn.cursor()
+
+        # Insert the record; the UNIQUE index on dedup_key silently rejects duplicates
+        cursor.execute(_insert_sql, _storage_values(cursor, record, _record_dedup_key(record)))
+
+        if cursor.rowcount:
+            _transactions_changed([record.get("user_email")])
+            print("Committed")
+            return "Transaction details saved successfully!"
+        else:
+            print("Not inserted. Duplicate record.")
+            return "Transaction details could NOT be saved!. Duplicate record."
+
+
+@timed_function("db_operation_seconds")
+def insert_records(records):
+    """
+    Inserts a batch of records with one executemany, skipping records that already exist or that
+    repeat within the batch. A record with a "dedup_key" is matched on that key instead of
+    compute_dedup_key. Existing rows are found with one dedup_key lookup per SQL_IN_CHUNK_SIZE keys.
+    Runs in the caller's transaction when called inside a get_connection block.
+
+    Every record is validated before anything is written: an InvalidRecordError for any of them
+    leaves the table unchanged.
+
+    :param records: Iterable of dicts with the keys insert_record expects.
+    :return: (inserted, duplicates) counts.
+    """
+    batch = {}
+    total = 0
+    for record in map(normalize_record, records):
+        batch.setdefault(_record_dedup_key(record), record)
+        total += 1
 
+    with get_connection(db_file_name) as conn:
+        cursor = conn.cursor()
+        keys = list(batch)
+        for start in range(0, len(keys), SQL_IN_CHUNK_SIZE):
+            chunk = keys[start:start + SQL_IN_CHUNK_SIZE]
+            for (existing_key,) in cursor.execute(f"""
+                SELECT dedup_key FROM {db_txn_table_name} WHERE dedup_key IN ({", ".join("?" * len(chunk))})
+            """, chunk).fetchall():
+                del batch[existing_key]
 
+        inserted = 0
+        if batch:
+            cursor.executemany(_insert_sql, [_storage_values(cursor, record, key) for key, record in batch.items()])
+            inserted = cursor.rowcount
+            _transactions_changed({record.get("user_email") for record in batch.values()})
+    return inserted, total - inserted
+
+
+@timed_function("db_operation_seconds")
 def get_all_table_name():
-    conn = sqlite3.connect(db_file_name)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    result = cursor.fetchall()
-    all_tables = [result[i][0] for i in range(len(result))]
-    return all_tables
-    conn.close()
+    with get_connection(db_file_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        result = cursor.fetchall()
+        all_tables = [result[i][0] for i in range(len(result))]
+        return all_tables
+
+
+def _range_query(signedin_user_email, start_date=None, end_date=None, columns=selected_col_names, order="desc",
+                 limit=None):
+    """
+    Builds the SQL text and bound parameters for fetch_transactions_range.
+    """
+    if order.lower() not in ("asc", "desc"):
+        raise ValueError(f"Invalid sort order: {order}")
+    direction = order.upper()
+
+    query = f"""SELECT {", ".join(_storage_select(columns))} FROM {db_txn_table_name}
+        WHERE user_email = ?
+        AND transaction_day >= ? AND transaction_day <= ?
+        ORDER BY transaction_day {direction}, id {direction}
+        LIMIT ?
+    """
+    params = (signedin_user_email, *_day_bounds(start_date, end_date), -1 if limit is None else limit)
+    return query, params
+
+
+def _storage_select(columns):
+    """
+    Returns the compact-table columns to select for the requested columns. The currency id is appended
+    when amounts are requested, as it is needed to convert them from minor units.
+    """
+    unknown = [col for col in columns if col not in transaction_col_names]
+    if unknown:
+        raise ValueError(f"Unknown transaction columns: {unknown}")
+    select = [storage_col_names[col] for col in columns]
+    if "transaction_amount" in columns:
+        select.append("currency_id")
+    return select
+
+
+def _decode_rows(columns, rows):
+    """
+    Turns rows selected with _storage_select back into tuples of the original column values:
+    lookup ids to names, day numbers to "YYYY-MM-DD" and minor units to amounts.
+    Lookup ids are mapped from cached copies of the small lookup tables rather than joined per row.
+    """
+    if not rows:
+        return []
+
+    # Decoded column by column so the per-value work runs in map() rather than a Python loop per row
+    values = list(zip(*rows))
+    decoded = []
+    for index, col in enumerate(columns):
+        if col in lookup_tables:
+            decoded.append(map(_lookup_map(lookup_tables[col][0]).__getitem__, values[index]))
+        elif col in date_col_names:
+            decoded.append(map(from_epoch_day, values[index]))
+        elif col == "transaction_amount":
+            minor_per_unit = _lookup_map(db_currency_table_name, "minor_per_unit")
+            decoded.append([None if amount is None else amount / (minor_per_unit[currency_id] or DEFAULT_MINOR_UNITS)
+                            for amount, currency_id in zip(values[index], values[-1])])
+        else:
+            decoded.append(values[index])
+    return list(zip(*decoded))
+
+
+def _lookup_categorical(table, lookup_ids):
+    """Returns a Categorical of the names of lookup ids, with the categories sorted as pd.Categorical would."""
+    codes, unique_ids = pd.factorize(np.array(lookup_ids, dtype="float64"))
+    names = _lookup_map(table)
+    values = pd.Categorical.from_codes(codes, [names[int(lookup_id)] for lookup_id in unique_ids])
+    return values.reorder_categories(sorted(values.categories))
+
+
+def _storage_frame(columns, rows):
+    """
+    Builds the typed DataFrame of records_to_frame straight from rows selected with _storage_select.
+    Day numbers, minor units and lookup ids are converted a whole column at a time by numpy, rather than
+    decoded to strings per value by _decode_rows and parsed back.
+    """
+    values = list(zip(*rows)) if rows else [()] * len(_storage_select(columns))
+    data = {}
+    for index, col in enumerate(columns):
+        if col in lookup_tables:
+            data[col] = _lookup_categorical(lookup_tables[col][0], values[index])
+        elif col in date_col_names:
+            data[col] = pd.to_datetime(np.array(values[index], dtype="float64"), unit="D")
+        elif col == "transaction_amount":
+            minor_per_unit = _lookup_map(db_currency_table_name, "minor_per_unit")
+            codes, currency_ids = pd.factorize(np.array(values[-1], dtype="float64"))
+            # A missing currency id (code -1) picks the trailing NaN
+            scale = np.array([minor_per_unit[int(currency_id)] or DEFAULT_MINOR_UNITS for currency_id in currency_ids]
+                             + [np.nan])
+            data[col] = np.array(values[index], dtype="float64") / scale[codes]
+        elif col == "id":
+            data[col] = np.array(values[index], dtype="int64")
+        else:
+            data[col] = np.array(values[index], dtype=object)
+    return pd.DataFrame(data, columns=list(columns))
+
+
+def _day_bounds(start_date=None, end_date=None):
+    """Converts inclusive "YYYY-MM-DD" bounds (None for open-ended) to transaction_day bounds."""
+    return (min_transaction_day if start_date is None else to_epoch_day(start_date),
+            max_transaction_day if end_date is None else to_epoch_day(end_date))
+
+
+@timed_function("db_operation_seconds")
+def fetch_transactions_range(signedin_user_email, start_date=None, end_date=None, columns=selected_col_names,
+                             order="desc", limit=None):
+    """
+    Fetches a user's transactions dated between start_date and end_date (inclusive, "YYYY-MM-DD").
+
+    :param signedin_user_email: Owner of the transactions.
+    :param start_date: First date to include, or None for no lower bound.
+    :param end_date: Last date to include, or None for no upper bound.
+    :param columns: Column names to select, from transaction_col_names.
+    :param order: "desc" (newest first) or "asc".
+    :param limit: Maximum number of rows, or None for all.
+    :return: List of tuples in the order of `columns`.
+    """
+    query, params = _range_query(signedin_user_email, start_date, end_date, columns, order, limit)
+    with get_connection(db_file_name) as conn:
+        return _decode_rows(columns, conn.execute(query, params).fetchall())
+
+
+@timed_function("db_operation_seconds")
+def explain_transactions_range(signedin_user_email, start_date=None, end_date=None, columns=selected_col_names,
+                               order="desc", limit=None):
+    """
+    Returns the EXPLAIN QUERY PLAN details of the fetch_transactions_range statement, e.g. to confirm
+    that it is served by the (user_email, transaction_day) index.
+    """
+    query, params = _range_query(signedin_user_email, start_date, end_date, columns, order, limit)
+    with get_connection(db_file_name) as conn:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()]
+
+
+def today_range():
+    today = date.today().strftime("%Y-%m-%d")
+    return today, today
+
+
+def yesterday_range():
+    yesterday = (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
+    return yesterday, yesterday
+
+
+def last_week_range():
+    # Monday to Sunday of the previous calendar week (Monday=0, Sunday=6)
+    today = date.today()
+    last_monday = today - timedelta(days=7 + today.weekday())
+    return last_monday.strftime("%Y-%m-%d"), (last_monday + timedelta(days=6)).strftime("%Y-%m-%d")
+
+
+def this_month_range():
+    today = date.today()
+    return today.replace(day=1).strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d")
+
+
+def last_month_range():
+    last_month_end = date.today().replace(day=1) - timedelta(days=1)
+    return last_month_end.replace(day=1).strftime("%Y-%m-%d"), last_month_end.strftime("%Y-%m-%d")
+
+
+def _preset_columns(delete_mode):
+    return selected_col_names_for_delete if delete_mode else selected_col_names
+
+
+# Date ranges behind the transaction filters offered on the Display and Delete pages
+transaction_filters = {
+    "All Transactions": lambda: (None, None),
+    "Today's Transactions": today_range,
+    "Yesterday's Transactions": yesterday_range,
+    "Last Week's Transactions": last_week_range,
+    "This Month's Transactions": this_month_range,
+    "Last Month's Transactions": last_month_range,
+}
+
+
+def _transaction_filter(signedin_user_email, start_date=None, end_date=None, categories=None, bank_names=None,
+                        account_types=None, currencies=None):
+    """
+    Builds the WHERE clause and bound parameters selecting a user's transactions dated between start_date
+    and end_date (inclusive). Each of categories, bank_names, account_types and currencies, when given,
+    restricts the rows to those values (a name or a list of names); names are matched in the small
+    lookup tables, so the transactions table is only read through the (user_email, transaction_day) index.
+    """
+    clauses = ["user_email = ?", "transaction_day >= ?", "transaction_day <= ?"]
+    params = [signedin_user_email, *_day_bounds(start_date, end_date)]
+    for column, names in (("transaction_category", categories), ("bank_name", bank_names),
+                          ("account_type", account_types), ("transaction_currency", currencies)):
+        if names is None:
+            continue
+        names = [names] if isinstance(names, str) else list(names)
+        table, id_column = lookup_tables[column]
+        clauses.append(f"{id_column} IN (SELECT id FROM {table} WHERE name IN ({', '.join('?' * len(names))}))")
+        params.extend(names)
+    return " AND ".join(clauses), params
+
+
+@timed_function("db_operation_seconds")
+def count_transactions(signedin_user_email, start_date=None, end_date=None, categories=None, bank_names=None,
+                       account_types=None, currencies=None):
+    """
+    Counts a user's transactions dated between start_date and end_date (inclusive), optionally only
+    those with the given categories, banks, account types or currencies (see _transaction_filter).
+    Without those filters the count is answered from the (user_email, transaction_day) index alone.
+    """
+    where, params = _transaction_filter(signedin_user_email, start_date, end_date, categories, bank_names,
+                                        account_types, currencies)
+    with get_connection(db_file_name) as conn:
+        return conn.execute(f"SELECT count(*) FROM {db_txn_table_name} WHERE {where}", params).fetchone()[0]
+
+
+@timed_function("db_operation_seconds")
+def fetch_transactions_page(signedin_user_email, start_date=None, end_date=None, columns=selected_col_names,
+                            page_size=10, after=None, as_frame=False):
+    """
+    Fetches one page of a user's transactions, newest first, using keyset (seek) pagination.
+
+    Rather than an OFFSET, the page starts right after the (transaction_day, id) position `after`,
+    so the index is entered directly at that position and each page costs O(page_size).
+
+    :param after: Cursor returned for the previous page, or None for the first page.
+    :param as_frame: Return the page as a typed DataFrame (see records_to_frame) instead of tuples.
+    :return: (records, next_cursor) where next_cursor is None on the last page.
+    """
+    select = _storage_select(columns)
+    start_day, end_day = _day_bounds(start_date, end_date)
+    after_day, after_id = after if after else (max_transaction_day, 2 ** 63 - 1)
+    # Folding the cursor day into the upper bound lets the index seek straight to the cursor position;
+    # the id comparison only filters rows that share the cursor's day.
+    upper_day = min(end_day, after_day)
+
+    with get_connection(db_file_name) as conn:
+        rows = conn.execute(f"""SELECT {", ".join(select)}, transaction_day, id FROM {db_txn_table_name}
+            WHERE user_email = ?
+            AND transaction_day >= ? AND transaction_day <= ?
+            AND (transaction_day < ? OR id < ?)
+            ORDER BY transaction_day DESC, id DESC
+            LIMIT ?
+        """, (
+            signedin_user_email,
+            start_day,
+            upper_day,
+            after_day,
+            after_id,
+            page_size + 1,  # One extra row tells whether there is a next page
+        )).fetchall()
+        decode = _storage_frame if as_frame else _decode_rows
+        records = decode(columns, [row[:-2] for row in rows[:page_size]])
+
+    next_cursor = tuple(rows[page_size - 1][-2:]) if len(rows) > page_size else None
+    return records, next_cursor
+
+
+def records_to_frame(records, columns):
+    """
+    Builds a typed, column-oriented DataFrame from transaction rows.
+
+    Amounts become float64, dates datetime64, bank/account/currency/category categoricals and ids int64;
+    other columns stay as Python strings. Each column is converted once from the transposed rows,
+    without an intermediate row-wise frame or a conversion of everything to strings.
+    """
+    values = list(zip(*records)) if records else [()] * len(columns)
+    data = {}
+    for name, col in zip(columns, values):
+        if name in amount_col_names:
+            data[name] = np.array(col, dtype="float64")
+        elif name in date_col_names:
+            data[name] = pd.to_datetime(pd.Series(col, dtype=object), format="%Y-%m-%d", errors="coerce")
+        elif name in categorical_col_names:
+            data[name] = pd.Categorical(col)
+        elif name == "id":
+            data[name] = np.array(col, dtype="int64")
+        else:
+            data[name] = np.array(col, dtype=object)
+    return pd.DataFrame(data, columns=list(columns))
+
+
+def format_transactions_frame(df):
+    """
+    Formats a typed transactions frame as display strings. Call it on the visible rows only.
+    Missing values are shown as empty strings; ids are left as numbers.
+    """
+    formatted = pd.DataFrame(index=df.index)
+    for name in df.columns:
+        col = df[name]
+        if name in date_col_names:
+            formatted[name] = col.dt.strftime("%Y-%m-%d").fillna("")
+        elif name in amount_col_names:
+            formatted[name] = ["" if pd.isna(value) else f"{value:,.2f}" for value in col]
+        elif name == "id":
+            formatted[name] = col
+        else:
+            formatted[name] = ["" if pd.isna(value) else str(value) for value in col]
+    return formatted
+
+
+@timed_function("db_operation_seconds")
+def fetch_transactions_frame(signedin_user_email, start_date=None, end_date=None, columns=selected_col_names,
+                             order="desc", limit=None):
+    """
+    Same as fetch_transactions_range, but returns a typed DataFrame (see records_to_frame).
+    """
+    query, params = _range_query(signedin_user_email, start_date, end_date, columns, order, limit)
+    with get_connection(db_file_name) as conn:
+        return _storage_frame(columns, conn.execute(query, params).fetchall())
 
 
 # Function to fetch all records
+@timed_function("db_operation_seconds")
 def fetch_all_records(signedin_user_email, delete_mode=False):
-    conn = sqlite3.connect(db_file_name)
-    cursor = conn.cursor()
-    sel = selected_col_names_for_delete if delete_mode else selected_col_names
-    cursor.execute(f"""select {sel}
-        from  {db_txn_table_name}
-        where user_email = '{signedin_user_email}'
-        order by transaction_date desc
-    """)
-    records = cursor.fetchall()
-    conn.close()
-    return records
+    return fetch_transactions_range(signedin_user_email, columns=_preset_columns(delete_mode))
 
 
 # Function to fetch today's transactions
-def fetch_todays_transactions(signedin_user_email,delete_mode=False):
-    conn = sqlite3.connect(db_file_name)
-    cursor = conn.cursor()
-    sel = selected_col_names_for_delete if delete_mode else selected_col_names
-    today = datetime.now().strftime("%Y-%m-%d")
-    cursor.execute(f"""SELECT {sel} FROM {db_txn_table_name} 
-        WHERE transaction_date = ?
-        and user_email = '{signedin_user_email}'
-        order by transaction_date desc
-    """, (today,))
-    records = cursor.fetchall()
-    conn.close()
-    return records
+@timed_function("db_operation_seconds")
+def fetch_todays_transactions(signedin_user_email, delete_mode=False):
+    return fetch_transactions_range(signedin_user_email, *today_range(), columns=_preset_columns(delete_mode))
 
 
 # Function to fetch yesterday's transactions
-def fetch_yesterdays_transactions(signedin_user_email,delete_mode=False):
-    conn = sqlite3.connect(db_file_name)
-    cursor = conn.cursor()
-    sel = selected_col_names_for_delete if delete_mode else selected_col_names
-    yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-    cursor.execute(f"""SELECT {sel} FROM {db_txn_table_name} 
-        WHERE transaction_date = ?
-        and user_email = '{signedin_user_email}'
-        order by transaction_date desc
-    """, (yesterday,))
-    records = cursor.fetchall()
-    conn.close()
-    return records
+@timed_function("db_operation_seconds")
+def fetch_yesterdays_transactions(signedin_user_email, delete_mode=False):
+    return fetch_transactions_range(signedin_user_email, *yesterday_range(), columns=_preset_columns(delete_mode))
 
 
 # Function to fetch last week's transactions
-def fetch_last_week_transactions(signedin_user_email,delete_mode=False):
-    conn = sqlite3.connect(db_file_name)
-    cursor = conn.cursor()
-    today = date.today()
-    # Calculate the day of the week (Monday=0, Sunday=6)
-    today_weekday = today.weekday()
-    days_to_subtract = today_weekday
-
-    days_to_subtract = 7 + today_weekday
-    last_monday = today - timedelta(days=days_to_subtract)
-    last_week_start = last_monday.strftime("%Y-%m-%d")
-    last_week_end = (last_monday + timedelta(days=6)).strftime("%Y-%m-%d")
-    sel = selected_col_names_for_delete if delete_mode else selected_col_names
-    cursor.execute(f"""SELECT {sel} FROM {db_txn_table_name} 
-        WHERE transaction_date >= ? AND transaction_date <= ?
-        and user_email = '{signedin_user_email}'
-        order by transaction_date desc
-    """, (last_week_start, last_week_end,))
-    records = cursor.fetchall()
-    conn.close()
-    return records
+@timed_function("db_operation_seconds")
+def fetch_last_week_transactions(signedin_user_email, delete_mode=False):
+    return fetch_transactions_range(signedin_user_email, *last_week_range(), columns=_preset_columns(delete_mode))
 
 
 # Function to fetch this month's transactions
-def fetch_this_month_transactions(signedin_user_email,delete_mode=False):
-    conn = sqlite3.connect(db_file_name)
-    cursor = conn.cursor()
-    this_month_start = datetime.now().replace(day=1).strftime("%Y-%m-%d")
-    today = datetime.now().strftime("%Y-%m-%d")
-    sel = selected_col_names_for_delete if delete_mode else selected_col_names
-    cursor.execute(f"""SELECT {sel} FROM {db_txn_table_name} 
-        WHERE transaction_date >= ? AND transaction_date <= ?
-        and user_email = '{signedin_user_email}'
-        order by transaction_date desc
-    """, (this_month_start, today,))
-    records = cursor.fetchall()
-    conn.close()
-    return records
+@timed_function("db_operation_seconds")
+def fetch_this_month_transactions(signedin_user_email, delete_mode=False):
+    return fetch_transactions_range(signedin_user_email, *this_month_range(), columns=_preset_columns(delete_mode))
 
 
 # Function to fetch last month's transactions
-def fetch_last_month_transactions(signedin_user_email,delete_mode=False):
-    conn = sqlite3.connect(db_file_name)
-    cursor = conn.cursor()
-    last_month_end = datetime.now().replace(day=1) - timedelta(days=1)
-    last_month_start = last_month_end.replace(day=1).strftime("%Y-%m-%d")
-    last_month_end = last_month_end.strftime("%Y-%m-%d")
-    sel = selected_col_names_for_delete if delete_mode else selected_col_names
-    cursor.execute(f"""SELECT {sel} FROM {db_txn_table_name} 
-        WHERE transaction_date BETWEEN ? AND ?
-        and user_email = '{signedin_user_email}'
-        order by transaction_date desc
-        """, (last_month_start, last_month_end))
-    records = cursor.fetchall()
-    conn.close()
-    return records
+@timed_function("db_operation_seconds")
+def fetch_last_month_transactions(signedin_user_email, delete_mode=False):
+    return fetch_transactions_range(signedin_user_email, *last_month_range(), columns=_preset_columns(delete_mode))
+
+
+@timed_function("db_operation_seconds")
+def fetch_monthly_category_summary(signedin_user_email, month=None):
+    """
+    Returns a user's spending per category for a month, read from the monthly rollup.
+
+    :param month: "YYYY-MM", defaults to the current month.
+    :return: List of (category, currency, total, count, min, max) tuples, largest total first.
+    """
+    month = month or date.today().strftime("%Y-%m")
+    with get_connection(db_file_name) as conn:
+        return conn.execute(f"""
+            SELECT coalesce(category.name, ''), coalesce(currency.name, ''),
+                   rollup.total_minor * 1.0 / coalesce(currency.minor_per_unit, {DEFAULT_MINOR_UNITS}),
+                   rollup.txn_count,
+                   rollup.min_minor * 1.0 / coalesce(currency.minor_per_unit, {DEFAULT_MINOR_UNITS}),
+                   rollup.max_minor * 1.0 / coalesce(currency.minor_per_unit, {DEFAULT_MINOR_UNITS})
+            FROM {db_rollup_table_name} AS rollup
+            LEFT JOIN {db_category_table_name} AS category ON category.id = rollup.category_id
+            LEFT JOIN {db_currency_table_name} AS currency ON currency.id = rollup.currency_id
+            WHERE rollup.user_email = ? AND rollup.month = ?
+            ORDER BY rollup.total_minor DESC
+        """, (signedin_user_email, month)).fetchall()
+
+
+@timed_function("db_operation_seconds")
+def fetch_month_over_month_summary(signedin_user_email, month=None):
+    """
+    Compares a user's spending per category in a month with the month before, from the rollup.
+
+    :param month: "YYYY-MM", defaults to the current month.
+    :return: List of (category, currency, this_month_total, previous_month_total) tuples.
+    """
+    this_month = datetime.strptime(month, "%Y-%m").date() if month else date.today().replace(day=1)
+    previous_month = (this_month - timedelta(days=1)).strftime("%Y-%m")
+    this_month = this_month.strftime("%Y-%m")
+    with get_connection(db_file_name) as conn:
+        return conn.execute(f"""
+            SELECT coalesce(category.name, ''), coalesce(currency.name, ''),
+                   totals.this_month_minor * 1.0 / coalesce(currency.minor_per_unit, {DEFAULT_MINOR_UNITS}),
+                   totals.previous_month_minor * 1.0 / coalesce(currency.minor_per_unit, {DEFAULT_MINOR_UNITS})
+            FROM (
+                SELECT category_id, currency_id,
+                       sum(CASE WHEN month = ? THEN total_minor ELSE 0 END) AS this_month_minor,
+                       sum(CASE WHEN month = ? THEN total_minor ELSE 0 END) AS previous_month_minor
+                FROM {db_rollup_table_name}
+                WHERE user_email = ? AND month IN (?, ?)
+                GROUP BY category_id, currency_id
+            ) AS totals
+            LEFT JOIN {db_category_table_name} AS category ON category.id = totals.category_id
+            LEFT JOIN {db_currency_table_name} AS currency ON currency.id = totals.currency_id
+            ORDER BY totals.this_month_minor DESC
+        """, (this_month, previous_month, signedin_user_email, this_month, previous_month)).fetchall()
+
+
+# Function to list the categories a user has transactions in
+@timed_function("db_operation_seconds")
+def fetch_categories(signedin_user_email):
+    """
+    Returns the names of the categories the user has transactions in, sorted by name.
+    Read from the monthly rollup, so it costs one row per month and category rather than per transaction.
+    """
+    with get_connection(db_file_name) as conn:
+        return [name for (name,) in conn.execute(f"""
+            SELECT name FROM {db_category_table_name}
+            WHERE id IN (SELECT category_id FROM {db_rollup_table_name} WHERE user_email = ?)
+            ORDER BY name
+        """, (signedin_user_email,)).fetchall()]
 
 
 # Function to delete records by their IDs
+@timed_function("db_operation_seconds")
 def delete_records(signedin_user_email, record_ids):
     """
-    Deletes records from the database based on their IDs.
-    :param signedin_user_email:
-    :param record_ids: List of record IDs to delete.
+    Deletes the user's records with the given IDs, with one DELETE per SQL_IN_CHUNK_SIZE IDs, all in one
+    transaction (the caller's, when called inside a get_connection block). IDs belonging to other users
+    are ignored. The monthly rollup is updated by the delete trigger.
+
+    :param signedin_user_email: Email of the user the records belong to.
+    :param record_ids: IDs of the records to delete.
+    :return: Number of records deleted.
     """
-    conn = sqlite3.connect(db_file_name)
-    cursor = conn.cursor()
+    ids = list(dict.fromkeys(int(row_id) for row_id in record_ids))
+    deleted = 0
+    with get_connection(db_file_name) as conn:
+        for start in range(0, len(ids), SQL_IN_CHUNK_SIZE):
+            chunk = ids[start:start + SQL_IN_CHUNK_SIZE]
+            # The unary + keeps the planner on the primary key rather than scanning the user's index range
+            deleted += conn.execute(f"""
+                DELETE FROM {db_txn_table_name} WHERE id IN ({", ".join("?" * len(chunk))}) AND +user_email = ?
+            """, (*chunk, signedin_user_email)).rowcount
+        if deleted:
+            _transactions_changed([signedin_user_email])
+    return deleted
 
-    try:
-        # Delete records with the given IDs
-        cursor.executemany(f"DELETE FROM {db_txn_table_name} WHERE id = ? and user_email = '{signedin_user_email}'", [(row_id,) for row_id in record_ids])
-        conn.commit()
-        return True
-    except Exception as e:
-        st.error(f"Error deleting records: {e}")
-        return False
-    finally:
-        conn.close()
+
+# Function to delete every record matching a filter
+@timed_function("db_operation_seconds")
+def delete_transactions_where(signedin_user_email, start_date=None, end_date=None, categories=None,
+                              bank_names=None, account_types=None, currencies=None):
+    """
+    Deletes a user's transactions dated between start_date and end_date (inclusive), optionally only those
+    with the given categories, banks, account types or currencies, e.g. everything last month in "Leisure":
+        delete_transactions_where(email, *last_month_range(), categories=["Leisure"])
+    Runs as a single DELETE statement; the rows are never loaded into Python. Without any filter, all of
+    the user's transactions are deleted. The monthly rollup is updated by the delete trigger.
+
+    :return: Number of records deleted.
+    """
+    where, params = _transaction_filter(signedin_user_email, start_date, end_date, categories, bank_names,
+                                        account_types, currencies)
+    with get_connection(db_file_name) as conn:
+        deleted = conn.execute(f"DELETE FROM {db_txn_table_name} WHERE {where}", params).rowcount
+        if deleted:
+            _transactions_changed([signedin_user_email])
+    return deleted
@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from slow_queries import connect
+
+# Pragmas applied once to every new connection. WAL lets readers and the writer work concurrently,
+# busy_timeout makes SQLite wait for a lock instead of failing straight away.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",   # 16 MB page cache per connection
+    "PRAGMA mmap_size = 134217728",  # 128 MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Maximum number of idle connections kept per database file
+MAX_IDLE_CONNECTIONS = 8
+
+
+class ConnectionPool:
+    """
+    A small pool of long-lived SQLite connections for one database file.
+
+    A connection is checked out by a thread for the duration of a `connection()` block and returned
+    to the pool afterwards. Nested blocks on the same thread reuse the connection already checked out,
+    so helpers can call each other without opening a second connection.
+    """
+
+    def __init__(self, db_path, max_idle=MAX_IDLE_CONNECTIONS):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def _open(self):
+        # Statements slower than SLOW_QUERY_THRESHOLD_MS are logged, see slow_queries.py
+        conn = connect(self.db_path, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            self.misses += 1
+        return self._open()
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Yield a pooled connection. The outermost block commits on success, rolls back on error
+        and always hands the connection back to the pool.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            # Re-entrant use on the same thread
+            yield conn
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        callbacks = self._local.after_commit = []
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.after_commit = None
+            self._release(conn)
+        for callback in callbacks:
+            callback()
+
+    def after_commit(self, callback):
+        """
+        Calls `callback` once the outermost connection() block of this thread has committed, or straight
+        away when the thread has no connection checked out. Nothing is called if the block rolls back.
+        """
+        callbacks = getattr(self._local, "after_commit", None)
+        if callbacks is None:
+            callback()
+        else:
+            callbacks.append(callback)
+
+    @contextmanager
+    def savepoint(self, name):
+        """
+        Runs the block in a SAVEPOINT of this thread's connection() block. If the block raises, its changes
+        and the after_commit callbacks it registered are rolled back, and the error is re-raised.
+        """
+        conn = self._local.conn
+        callbacks = self._local.after_commit
+        mark = len(callbacks)
+        conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            del callbacks[mark:]
+            raise
+        conn.execute(f"RELEASE {name}")
+
+    def close_all(self):
+        """Close every idle connection held by the pool."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        """Return the pool hit/miss counters and the number of idle connections."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "idle": len(self._idle)}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Pools inherited from the parent process after a fork; kept referenced but never used or closed
+_inherited_pools = []
+
+
+def get_pool(db_path):
+    """Return the process-wide pool for the given database file, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+        return pool
+
+
+def _reset_after_fork():
+    """
+    Gives a forked child process (e.g. a multiprocessing worker) its own pools.
+
+    SQLite connections must not be used across a fork, so the child starts with no pools and opens new
+    connections on first use. The inherited connections are not closed either: closing them in the child
+    could release locks or checkpoint the WAL on behalf of the parent, which still uses them.
+    """
+    global _pools_lock
+    _inherited_pools.extend(_pools.values())
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_connection(db_path):
+    """
+    Context manager returning a pooled connection to `db_path`.
+
+    Usage:
+        with get_connection(db_file_name) as conn:
+            conn.execute(...)
+    """
+    return get_pool(db_path).connection()
+
+
+def call_after_commit(db_path, callback):
+    """Calls `callback` after the current transaction on `db_path` commits, see ConnectionPool.after_commit."""
+    get_pool(db_path).after_commit(callback)
+
+
+def savepoint(db_path, name):
+    """Context manager running a block in a SAVEPOINT of the current transaction, see ConnectionPool.savepoint."""
+    return get_pool(db_path).savepoint(name)
+
+
+def pool_stats():
+    """Return hit/miss counters for every pool in this process, keyed by database path."""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {path: pool.stats() for path, pool in pools}
@@ -1,21 +1,39 @@
 import streamlit as st
-import pandas as pd
 from auth import display_app_banner
 from db_operations import (
-    fetch_all_records,
-    fetch_todays_transactions,
-    fetch_yesterdays_transactions,
-    fetch_last_week_transactions,
-    fetch_this_month_transactions,
-    fetch_last_month_transactions,
+    transaction_filters,
+    count_transactions,
+    fetch_categories,
+    fetch_transactions_page,
+    selected_col_names_for_delete,
+    format_transactions_frame,
     delete_records,
+    delete_transactions_where,
 )
+from query_cache import cached_query, invalidate_query
+from user_utils import rerun_fragment
+from write_queue import run_write
+
+
+def fetch_delete_page(global_user_email, start_date, end_date, page_size, after):
+    """Returns (formatted page, next_cursor); the result is cached, so it must not be modified."""
+    df, next_cursor = fetch_transactions_page(global_user_email, start_date, end_date,
+                                              columns=selected_col_names_for_delete, page_size=page_size,
+                                              after=after, as_frame=True)
+    return format_transactions_frame(df), next_cursor
 
 
 def delete_transactions_page(global_user_email):
     display_app_banner()  # Display the app banner
     st.subheader("Delete Transactions", divider='gray')
 
+    delete_transactions_panel(global_user_email)
+
+
+# Everything below the title reruns on its own when used (filters, ticking rows, paging, deleting),
+# without rerunning the rest of the app
+@st.fragment
+def delete_transactions_panel(global_user_email):
     # Initialize session state for messages
     if 'message' not in st.session_state:
         st.session_state.message = None
@@ -26,14 +44,7 @@ def delete_transactions_page(global_user_email):
         st.session_state.message = None
 
     # Define the filter options
-    filter_options = [
-        "All Transactions",
-        "Today's Transactions",
-        "Yesterday's Transactions",
-        "Last Week's Transactions",
-        "This Month's Transactions",
-        "Last Month's Transactions",
-    ]
+    filter_options = list(transaction_filters)
 
     # Use st.radio with a single group and custom CSS for horizontal layout
     st.markdown(
@@ -71,59 +82,65 @@ def delete_transactions_page(global_user_email):
         st.session_state.current_filter_option = filter_option
         st.session_state.all_selected_rows = set()  # Reset selected rows when the filter changes
         st.session_state.pagination_page_delete = 1  # Reset pagination to page 1
-        st.rerun()
-
-    # Fetch records based on the selected filter
-    if filter_option == "All Transactions":
-        records = fetch_all_records(global_user_email, delete_mode=True)
-    elif filter_option == "Today's Transactions":
-        records = fetch_todays_transactions(global_user_email, delete_mode=True)
-    elif filter_option == "Yesterday's Transactions":
-        records = fetch_yesterdays_transactions(global_user_email, delete_mode=True)
-    elif filter_option == "Last Week's Transactions":
-        records = fetch_last_week_transactions(global_user_email, delete_mode=True)
-    elif filter_option == "This Month's Transactions":
-        records = fetch_this_month_transactions(global_user_email, delete_mode=True)
-    elif filter_option == "Last Month's Transactions":
-        records = fetch_last_month_transactions(global_user_email, delete_mode=True)
+        st.session_state.delete_page_cursors = [None]
+        rerun_fragment()
+
+    # Count the matching records; only the visible page is fetched below
+    start_date, end_date = transaction_filters[filter_option]()
+    total_records = cached_query(global_user_email, ("count", start_date, end_date),
+                                 lambda: count_transactions(global_user_email, start_date, end_date))
 
     # Check if records are found
-    if not records:
+    if not total_records:
         # st.session_state.message = "No transactions found for the selected filter."
         st.info("No transactions found for the selected criteria.")
         # st.rerun()
         return
 
-    # Convert records to a DataFrame
-    df = pd.DataFrame(records)
-    df = df.fillna("")
-    df = df.reset_index(drop=True)
-    df.columns = ["ID", "Transaction Date", "Bank Name", "Account Type", "Amount", "Currency", "Category",
-                  "Short Desc."]
-
-    # Adding a 'Select' column for checkboxes
-    df['Select'] = [False] * len(df)
-
     # Pagination setup
     page_size = 10  # Number of rows per page
-    total_pages = (len(df) // page_size) + (1 if len(df) % page_size != 0 else 0)
+    total_pages = (total_records // page_size) + (1 if total_records % page_size != 0 else 0)
 
     # Initialize session state for pagination
     if "pagination_page_delete" not in st.session_state:
         st.session_state.pagination_page_delete = 1  # Start at page 1
+    if "delete_page_cursors" not in st.session_state:
+        st.session_state.delete_page_cursors = [None]  # Keyset cursor at the start of each visited page
+    cursors = st.session_state.delete_page_cursors
+    if st.session_state.pagination_page_delete > len(cursors):
+        st.session_state.pagination_page_delete = 1
 
     # Initialize session state for all selected rows
     if 'all_selected_rows' not in st.session_state:
         st.session_state.all_selected_rows = set()
 
-    # Display the current page of the DataFrame
-    start_idx = (st.session_state.pagination_page_delete - 1) * page_size
-    end_idx = start_idx + page_size
+    # Fetch and format the current page only, or reuse it while the user's data has not changed
+    after = cursors[st.session_state.pagination_page_delete - 1]
+    df, next_cursor = cached_query(
+        global_user_email, ("delete_page", start_date, end_date, page_size, after),
+        lambda: fetch_delete_page(global_user_email, start_date, end_date, page_size, after))
+
+    if df.empty:
+        # A stale cursor (e.g. rows deleted in another session) can land past the end; start over
+        if st.session_state.pagination_page_delete > 1:
+            st.session_state.pagination_page_delete = 1
+            st.session_state.delete_page_cursors = [None]
+            rerun_fragment()
+        # Even the first page is empty, so the cached count is stale; recount on the next run
+        invalidate_query(global_user_email, ("count", start_date, end_date))
+        st.info("No transactions found for the selected criteria.")
+        return
+
+    df = df.set_axis(["ID", "Transaction Date", "Bank Name", "Account Type", "Amount", "Currency", "Category",
+                      "Short Desc."], axis=1)
+
+    # Adding a 'Select' column for checkboxes, ticked for rows selected on an earlier visit
+    df = df.assign(Select=df['ID'].isin(st.session_state.all_selected_rows))
 
     # Display the DataFrame with checkboxes
-    st.caption(f"Page {st.session_state.pagination_page_delete} of {total_pages}, Total Records: {len(df)}, Showing {page_size} Rows per page")
+    st.caption(f"Page {st.session_state.pagination_page_delete} of {total_pages}, Total Records: {total_records}, Showing {page_size} Rows per page")
     edited_df = st.data_editor(
-        df.iloc[start_idx:end_idx],
+        df,
         hide_index=True,
         use_container_width=True,
         column_config={
@@ -135,15 +152,17 @@ def delete_transactions_page(global_user_email):
         }
     )
 
-    # Collect selected IDs from the current page
-    selected_rows = [row['ID'] for idx, row in edited_df.iterrows() if row['Select']]
-    st.session_state.all_selected_rows.update(selected_rows)
+    # Sync the selection of the current page into the selection kept across pages
+    for idx, row in edited_df.iterrows():
+        if row['Select']:
+            st.session_state.all_selected_rows.add(int(row['ID']))
+        else:
+            st.session_state.all_selected_rows.discard(int(row['ID']))
+    selected_rows = st.session_state.all_selected_rows
 
     # Initialize session state for confirmation
     if 'confirm_delete' not in st.session_state:
         st.session_state.confirm_delete = False
-    if 'delete_success' not in st.session_state:
-        st.session_state.delete_success = False
 
     # Layout for buttons (Delete, Previous, Next)
     col_delete, col_empty, col_empty, col_empty, col_empty, col_empty, col_prev, col_next = st.columns(
@@ -156,7 +175,7 @@ def delete_transactions_page(global_user_email):
             st.warning("Are you sure you want to delete the selected records?")
         else:
             st.session_state.message = "Select at least one record to proceed."
-            st.rerun()
+            rerun_fragment()
 
     # Empty column to push 'Previous' and 'Next' to the right
     col_empty.empty()
@@ -166,34 +185,61 @@ def delete_transactions_page(global_user_email):
         col1, col2 = st.columns(2)
         if col1.button("Confirm Delete"):
             # Call the delete_records function
-            if delete_records(global_user_email, list(st.session_state.all_selected_rows)):
-                st.session_state.delete_success = True
-                st.session_state.confirm_delete = False
-                st.session_state.message = f"Deleted {len(st.session_state.all_selected_rows)} records successfully!"
-            else:
+            try:
+                deleted = run_write(delete_records, global_user_email, st.session_state.all_selected_rows)
+            except Exception as e:
+                print(f"Error deleting records: {e}")
                 st.session_state.message = ("Failed to delete records. Please check your database connection or "
                                             "try again.")
                 st.session_state.confirm_delete = False
-            st.rerun()
+            else:
+                st.session_state.confirm_delete = False
+                st.session_state.message = f"Deleted {deleted} records successfully!"
+                st.session_state.all_selected_rows = set()  # Reset selected rows
+                st.session_state.pagination_page_delete = 1
+                st.session_state.delete_page_cursors = [None]
+            rerun_fragment()
         if col2.button("Cancel Delete"):
             st.session_state.all_selected_rows = set()  # Reset selected rows
             st.session_state.confirm_delete = False
-            st.rerun()
-
-    # Display success message if delete was successful
-    if st.session_state.delete_success:
-        st.session_state.message = f"Deleted {len(st.session_state.all_selected_rows)} records successfully!"
-        st.session_state.delete_success = False
-        st.session_state.all_selected_rows = set()  # Reset selected rows
-        st.rerun()
+            rerun_fragment()
 
     # Pagination controls
     if col_prev.button("Previous") and st.session_state.pagination_page_delete > 1:
         st.session_state.pagination_page_delete -= 1  # Decrease page number
-        st.rerun()
-    if col_next.button("Next") and st.session_state.pagination_page_delete < total_pages:
+        rerun_fragment()
+    if col_next.button("Next") and next_cursor is not None:
+        del cursors[st.session_state.pagination_page_delete:]
+        cursors.append(next_cursor)  # Remember where the next page starts
         st.session_state.pagination_page_delete += 1  # Increase page number
-        st.rerun()
+        rerun_fragment()
+
+    # Delete everything matching the filter at once, without paging through and ticking the rows
+    with st.expander("Delete all matching transactions"):
+        categories = st.multiselect("Only these categories (leave empty for all)",
+                                    cached_query(global_user_email, ("categories",),
+                                                 lambda: fetch_categories(global_user_email)),
+                                    key="bulk_delete_categories")
+        matching = cached_query(
+            global_user_email, ("count", start_date, end_date, tuple(categories)),
+            lambda: count_transactions(global_user_email, start_date, end_date, categories=categories or None))
+        st.caption(f"{matching} of the {total_records} transactions in \"{filter_option}\" match.")
+        confirmed = st.checkbox(f"Yes, delete these {matching} transactions", key="bulk_delete_confirm")
+        if st.button("Delete All Matching", disabled=not (matching and confirmed)):
+            try:
+                deleted = run_write(delete_transactions_where, global_user_email, start_date, end_date,
+                                    categories=categories or None)
+            except Exception as e:
+                print(f"Error deleting records: {e}")
+                st.session_state.message = ("Failed to delete records. Please check your database connection or "
+                                            "try again.")
+            else:
+                st.session_state.message = f"Deleted {deleted} records successfully!"
+                st.session_state.all_selected_rows = set()
+                st.session_state.pagination_page_delete = 1
+                st.session_state.delete_page_cursors = [None]
+            del st.session_state.bulk_delete_confirm
+            rerun_fragment()
 
 
 if __name__ == "__main__":
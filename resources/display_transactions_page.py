@@ -1,29 +1,34 @@
 import streamlit as st
-import pandas as pd
 from auth import display_app_banner
 from db_operations import (
-    fetch_all_records,
-    fetch_todays_transactions,
-    fetch_yesterdays_transactions,
-    fetch_last_week_transactions,
-    fetch_this_month_transactions,
-    fetch_last_month_transactions,
+    transaction_filters,
+    count_transactions,
+    fetch_transactions_page,
+    format_transactions_frame,
 )
+from query_cache import cached_query, invalidate_query
+from user_utils import rerun_fragment
+
+
+def fetch_display_page(global_user_email, start_date, end_date, page_size, after):
+    """Returns (formatted page, next_cursor); the result is cached, so it must not be modified."""
+    df, next_cursor = fetch_transactions_page(global_user_email, start_date, end_date, page_size=page_size,
+                                              after=after, as_frame=True)
+    return format_transactions_frame(df), next_cursor
 
 
 def display_transactions_page(global_user_email):
     display_app_banner()  # Display the app banner
     st.subheader("Transactions Report", divider='gray')
 
+    transactions_table(global_user_email)
+
+
+# Filters, table and pagination rerun on their own when used, without rerunning the rest of the app
+@st.fragment
+def transactions_table(global_user_email):
     # Define the filter options
-    filter_options = [
-        "All Transactions",
-        "Today's Transactions",
-        "Yesterday's Transactions",
-        "Last Week's Transactions",
-        "This Month's Transactions",
-        "Last Month's Transactions",
-    ]
+    filter_options = list(transaction_filters)
 
     # Use st.radio with a single group and custom CSS for horizontal layout
     st.markdown(
@@ -52,45 +57,53 @@ def display_transactions_page(global_user_email):
         horizontal=True,  # Streamlit's built-in horizontal layout
     )
 
-    # Fetch records based on the selected filter
-    if filter_option == "All Transactions":
-        records = fetch_all_records(global_user_email)
-    elif filter_option == "Today's Transactions":
-        records = fetch_todays_transactions(global_user_email)
-    elif filter_option == "Yesterday's Transactions":
-        records = fetch_yesterdays_transactions(global_user_email)
-    elif filter_option == "Last Week's Transactions":
-        records = fetch_last_week_transactions(global_user_email)
-    elif filter_option == "This Month's Transactions":
-        records = fetch_this_month_transactions(global_user_email)
-    elif filter_option == "Last Month's Transactions":
-        records = fetch_last_month_transactions(global_user_email)
-
-    if records:
-        # Convert records to a DataFrame
-        df = pd.DataFrame(records)
-        df = df.fillna("")
-        df = df.reset_index(drop=True)
-        df.columns = ["Transaction Date", "Bank Name", "Account Type", "Amount", "Currency", "Category", "Short Desc."]
-
-        # Ensure all columns are of type string to avoid slicing issues
-        df = df.astype(str)
+    # Reset pagination when the filter changes
+    if st.session_state.get("display_filter_applied") != filter_option:
+        st.session_state.display_filter_applied = filter_option
+        st.session_state.pagination_page = 1
+        st.session_state.display_page_cursors = [None]  # Keyset cursor at the start of each visited page
 
+    # Count the matching records; only the visible page is fetched below
+    start_date, end_date = transaction_filters[filter_option]()
+    total_records = cached_query(global_user_email, ("count", start_date, end_date),
+                                 lambda: count_transactions(global_user_email, start_date, end_date))
+
+    if total_records:
         # Pagination
         page_size = 10  # Number of rows per page
-        total_pages = (len(df) // page_size) + (1 if len(df) % page_size != 0 else 0)
+        total_pages = (total_records // page_size) + (1 if total_records % page_size != 0 else 0)
 
         # Initialize session state for pagination
         if "pagination_page" not in st.session_state:
             st.session_state.pagination_page = 1  # Start at page 1
+        cursors = st.session_state.display_page_cursors
+        if st.session_state.pagination_page > len(cursors):
+            st.session_state.pagination_page = 1
+
+        # Fetch and format the current page only, or reuse it while the user's data has not changed
+        after = cursors[st.session_state.pagination_page - 1]
+        df, next_cursor = cached_query(
+            global_user_email, ("display_page", start_date, end_date, page_size, after),
+            lambda: fetch_display_page(global_user_email, start_date, end_date, page_size, after))
+
+        if df.empty:
+            # A stale cursor (e.g. rows deleted in another session) can land past the end; start over
+            if st.session_state.pagination_page > 1:
+                st.session_state.pagination_page = 1
+                st.session_state.display_page_cursors = [None]
+                rerun_fragment()
+            # Even the first page is empty, so the cached count is stale; recount on the next run
+            invalidate_query(global_user_email, ("count", start_date, end_date))
+            st.info("No transactions found for the selected filter.")
+            return
+
+        df = df.set_axis(["Transaction Date", "Bank Name", "Account Type", "Amount", "Currency", "Category",
+                          "Short Desc."], axis=1)
 
-        # Display the current page of the DataFrame
-        start_idx = (st.session_state.pagination_page - 1) * page_size
-        end_idx = start_idx + page_size
-        st.caption(f"Page {st.session_state.pagination_page} of {total_pages}, Total Records: {len(df)}, Showing {page_size} Rows per page")
+        st.caption(f"Page {st.session_state.pagination_page} of {total_pages}, Total Records: {total_records}, Showing {page_size} Rows per page")
         # Make the table wider by using the full container width
         st.dataframe(
-            df.iloc[start_idx:end_idx],
+            df,
             hide_index=True,
             use_container_width=True,  # Expand table to full width
         )
@@ -102,9 +115,13 @@ def display_transactions_page(global_user_email):
         with col2:
             if st.button("Previous") and st.session_state.pagination_page > 1:
                 st.session_state.pagination_page -= 1  # Decrease page number
+                rerun_fragment()
         with col3:
-            if st.button("Next") and st.session_state.pagination_page < total_pages:
+            if st.button("Next") and next_cursor is not None:
+                del cursors[st.session_state.pagination_page:]
+                cursors.append(next_cursor)  # Remember where the next page starts
                 st.session_state.pagination_page += 1  # Increase page number
+                rerun_fragment()
 
         # Display current page, total pages, and total number of records
         # st.caption(f"Page {st.session_state.pagination_page} of {total_pages} | Total Records: {len(df)}")
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from config import get_setting
+from rule_parser import parse_locally
+
+# A local stand-in for the Groq chat model, for load tests and offline development. It answers the
+# transaction prompts of transaction_parser with the JSON the real model is asked for, built from the
+# rule parser's reading of each description, after a simulated latency and with a simulated error rate.
+# Selected with LLM_BACKEND = "fake"; tuned with the settings read in from_settings:
+#   FAKE_LLM_LATENCY_SECONDS         time before the answer (or its first streamed chunk), default 0.5
+#   FAKE_LLM_LATENCY_JITTER_SECONDS  latency varies uniformly by up to this much either way, default 0
+#   FAKE_LLM_ERROR_RATE              share of requests failing with FakeLLMError, default 0
+#   FAKE_LLM_RESPONSE                canned text returned instead of the generated JSON
+
+# Characters per streamed chunk, roughly a few tokens
+STREAM_CHUNK_SIZE = 8
+
+
+class FakeLLMError(RuntimeError):
+    """A simulated failure of the LLM API."""
+
+
+def _numbered_descriptions(prompt):
+    """Returns the (index, description) pairs listed in a transaction_parser prompt."""
+    listed = re.search(r"descriptions:\s*\n(.*?)\n\s*- Transaction Date:", prompt, re.DOTALL)
+    if not listed:
+        return []
+    return [(int(n), desc.strip()) for n, desc in re.findall(r"^\s*(\d+)\.\s+(.*)$", listed.group(1), re.MULTILINE)]
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model answering transaction prompts locally, with configurable latency and error rate."""
+
+    latency: float = 0.5
+    latency_jitter: float = 0.0
+    error_rate: float = 0.0
+    response: Optional[str] = None
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            latency=float(get_setting("FAKE_LLM_LATENCY_SECONDS", 0.5)),
+            latency_jitter=float(get_setting("FAKE_LLM_LATENCY_JITTER_SECONDS", 0)),
+            error_rate=float(get_setting("FAKE_LLM_ERROR_RATE", 0)),
+            response=get_setting("FAKE_LLM_RESPONSE", None),
+        )
+
+    @property
+    def _llm_type(self):
+        return "fake-transaction-parser"
+
+    def _delay(self):
+        return max(0.0, self.latency + random.uniform(-self.latency_jitter, self.latency_jitter))
+
+    def _answer(self, messages):
+        """Returns the text of the answer, or raises FakeLLMError for a simulated failure."""
+        if random.random() < self.error_rate:
+            raise FakeLLMError("Simulated LLM API error")
+        if self.response is not None:
+            return self.response
+        answers = []
+        for index, desc in _numbered_descriptions(messages[-1].content):
+            details, _ = parse_locally(desc)
+            answers.append({"Index": index, **details,
+                            "Transaction Description": (details["Transaction Description"] or desc)[:50]})
+        return json.dumps(answers)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._delay())
+        answer = self._answer(messages)
+        for start in range(0, len(answer), STREAM_CHUNK_SIZE):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=answer[start:start + STREAM_CHUNK_SIZE]))
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._delay())
+        answer = self._answer(messages)
+        for start in range(0, len(answer), STREAM_CHUNK_SIZE):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=answer[start:start + STREAM_CHUNK_SIZE]))
@@ -1,13 +1,45 @@
 import streamlit as st
 import os
+import pandas as pd
+from datetime import date
+from db_operations import fetch_month_over_month_summary
+from query_cache import cached_query
 
 # Image file path
 image_path = os.path.join(os.path.dirname(__file__), "./images/finance_image.jpg")
 
 
-def home_page():
+def display_monthly_summary(global_user_email):
+    """Show this month's spending by category and the change from last month, read from the rollup."""
+    st.subheader("This Month's Spending", divider='gray')
+    rows = cached_query(global_user_email, ("month_over_month", date.today()),
+                        lambda: fetch_month_over_month_summary(global_user_email))
+    if not any(this_month for _, _, this_month, _ in rows):
+        st.info("No transactions recorded this month yet.")
+        return
+
+    df = pd.DataFrame(rows, columns=["Category", "Currency", "This Month", "Last Month"])
+    df["Category"] = df["Category"].replace("", "Uncategorised")
+    df["Change %"] = ((df["This Month"] - df["Last Month"]) / df["Last Month"].where(df["Last Month"] != 0) * 100).round(1)
+
+    # One headline figure per currency
+    totals = df.groupby("Currency", sort=False)[["This Month", "Last Month"]].sum()
+    cols = st.columns(len(totals))
+    for col, (currency, total) in zip(cols, totals.iterrows()):
+        delta = (f"{(total['This Month'] - total['Last Month']) / total['Last Month']:+.1%} vs last month"
+                 if total["Last Month"] else None)
+        col.metric(f"Spent this month ({currency or 'no currency'})", f"{total['This Month']:,.2f}", delta,
+                   delta_color="inverse")
+
+    st.dataframe(df, hide_index=True, use_container_width=True)
+
+
+def home_page(global_user_email=None):
     st.title("Personal Finance")
     if os.path.exists(image_path):
         st.image(image_path, caption="Manage your finances efficiently!", width=400)  # Fixed width
     else:
         st.error(f"Image file not found! {image_path}")
+
+    if global_user_email:
+        display_monthly_summary(global_user_email)
@@ -0,0 +1,80 @@
+import streamlit as st
+from auth import display_app_banner
+from statement_importer import (
+    MAPPABLE_FIELDS,
+    guess_column_mapping,
+    import_statement,
+    read_csv_headers,
+    statement_file_type,
+)
+
+ACCOUNT_TYPE_OPTIONS = ["", "Savings Account", "Current Account", "Credit Card", "Debit Card", "Cash"]
+NOT_MAPPED = "(not in file)"
+
+
+def import_transactions_page(global_user_email):
+    display_app_banner()  # Display the app banner
+    st.subheader("Import Statement", divider='gray')
+
+    uploaded_file = st.file_uploader("Bank statement (CSV, OFX or QFX)", type=["csv", "ofx", "qfx"])
+    if uploaded_file is None:
+        st.caption("Upload a statement exported from your bank to add all of its transactions at once.")
+        return
+    file_type = statement_file_type(uploaded_file.name)
+
+    # Values used for fields the statement does not contain
+    col_bank, col_account, col_currency = st.columns(3)
+    bank_name = col_bank.text_input("Bank Name")
+    account_type = col_account.selectbox("Account Type", ACCOUNT_TYPE_OPTIONS)
+    currency = col_currency.text_input("Currency", value="INR")
+    include_credits = st.checkbox("Also import credits (deposits, refunds) as Income")
+
+    mapping, date_format = None, None
+    if file_type == "csv":
+        headers = read_csv_headers(uploaded_file)
+        guessed = guess_column_mapping(headers)
+        options = [NOT_MAPPED] + headers
+        with st.expander("Column mapping", expanded="Transaction Date" not in guessed):
+            mapping = {}
+            columns = st.columns(3)
+            for i, field in enumerate(MAPPABLE_FIELDS):
+                choice = columns[i % 3].selectbox(
+                    field, options, index=options.index(guessed[field]) if field in guessed else 0,
+                    key=f"import_mapping_{field}")
+                if choice != NOT_MAPPED:
+                    mapping[field] = choice
+            date_format = st.text_input("Date format (e.g. %d/%m/%Y), blank to detect") or None
+
+    if st.button("Import"):
+        if file_type == "csv" and "Transaction Date" not in mapping:
+            st.error("Map a column to Transaction Date first.")
+            return
+        if file_type == "csv" and not {"Transaction Amount", "Debit", "Credit"} & set(mapping):
+            st.error("Map a column to Transaction Amount, or to Debit/Credit, first.")
+            return
+
+        progress_bar = st.progress(0.0, text="Importing...")
+
+        def report(stats):
+            progress_bar.progress(
+                min(stats["bytes"] / uploaded_file.size, 1.0) if uploaded_file.size else 1.0,
+                text=f"{stats['rows']} rows read, {stats['inserted']} imported, {stats['duplicates']} duplicates")
+
+        uploaded_file.seek(0)
+        defaults = {"Bank Name": bank_name or None, "Account Type": account_type or None,
+                    "Transaction Currency": currency or None}
+        try:
+            stats = import_statement(uploaded_file, file_type, global_user_email, mapping=mapping, defaults=defaults,
+                                     date_format=date_format, include_credits=include_credits, progress=report)
+        except Exception as e:
+            progress_bar.empty()
+            st.error(f"Import failed: {e}. Rows imported before the error are kept; importing the file again "
+                     "skips them as duplicates.")
+            return
+
+        progress_bar.progress(1.0, text="Done")
+        skipped_reason = "had no valid date or amount"
+        if not include_credits:
+            skipped_reason = "were credits or " + skipped_reason
+        st.success(f"Imported {stats['inserted']} of {stats['rows']} rows. Skipped {stats['duplicates']} duplicates "
+                   f"and {stats['skipped']} rows that {skipped_reason}.")
@@ -1,57 +1,155 @@
-import json
-from db_operations import create_table, insert_record
-from transaction_parser import parse_transaction
+import argparse
+import statistics
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from dotenv import load_dotenv
-# import os
-# load_dotenv()
-import streamlit as st
+from db_operations import InvalidRecordError, create_table, insert_records, normalize_record
+import transaction_parser
+from statement_importer import batched
+from transaction_parser import parse_transactions, LLM_BATCH_SIZE, PARSE_SOURCE_KEY
 
-db_file_name = st.secrets["api_keys"]["DATABASE_FILE_NAME"]
-db_txn_table_name = st.secrets["api_keys"]["DB_TRANSACTION_TABLE_NAME"]
-db_users_table_name= st.secrets["api_keys"]["DB_USER_TABLE_NAME"]
+# Batch ingest of English transaction notes without the Streamlit UI, e.g. to backfill years of notes:
+#   python main.py --user someone@example.com --input notes.txt
+#   cat notes.txt | python main.py --user someone@example.com
+# One note per line; blank lines and lines starting with # are skipped. Notes that could not be
+# parsed can be written to a file with --failed and fed back in on the next run.
+# Settings (database file, table names, GROQ_API_KEY) come from environment variables or a config file,
+# see config.py; Streamlit does not need to be installed.
 
+# Notes handed to one worker per parse_transactions call
+PARSE_CHUNK_SIZE = 100
+# Parsed records written per transaction
+COMMIT_EVERY = 1000
+
+
+def read_notes(stream):
+    """Yields the non-empty, non-comment lines of a notes file."""
+    for line in stream:
+        note = line.strip()
+        if note and not note.startswith("#"):
+            yield note
+
+
+def parse_chunk(notes, batch_size):
+    """Parses a chunk of notes, returning (notes, results, seconds)."""
+    started = time.perf_counter()
+    results = parse_transactions(notes, batch_size=batch_size, return_exceptions=True)
+    return notes, results, time.perf_counter() - started
+
+
+def is_valid(details):
+    """A parsed note is saved only if it has a readable date and a non-zero amount (see normalize_record)."""
+    if isinstance(details, Exception):
+        return False
+    try:
+        return normalize_record(details)["Transaction Amount"] != 0
+    except InvalidRecordError:
+        return False
+
+
+def ingest(notes, user_email, workers=4, chunk_size=PARSE_CHUNK_SIZE, batch_size=LLM_BATCH_SIZE,
+           commit_every=COMMIT_EVERY, failed_output=None, dry_run=False):
+    """
+    Parses notes with a pool of workers and inserts the results in chunked transactions.
+
+    At most 2 * workers chunks are parsed or waiting at a time, so memory stays flat however long the
+    input is. Results are handled in input order.
+
+    :return: Stats dict with counts, per-source counts and the parse latency of every chunk.
+    """
+    stats = {"notes": 0, "inserted": 0, "duplicates": 0, "failed": 0, "sources": Counter(), "chunk_seconds": []}
+    created_date = datetime.now().strftime("%Y-%m-%d")
+    pending = []
+
+    def flush():
+        if pending and not dry_run:
+            inserted, duplicates = insert_records(pending)
+            stats["inserted"] += inserted
+            stats["duplicates"] += duplicates
+        pending.clear()
+        print(f"... {stats['notes']} notes, {stats['inserted']} inserted, {stats['failed']} failed", file=sys.stderr)
+
+    def handle(chunk_result):
+        chunk_notes, results, seconds = chunk_result
+        stats["chunk_seconds"].append(seconds)
+        for note, details in zip(chunk_notes, results):
+            stats["notes"] += 1
+            if not is_valid(details):
+                stats["failed"] += 1
+                if failed_output:
+                    failed_output.write(note + "\n")
+                continue
+            stats["sources"][details.get(PARSE_SOURCE_KEY)] += 1
+            pending.append({**details, "user_email": user_email, "created_date": created_date})
+            if len(pending) >= commit_every:
+                flush()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+        in_flight = deque()
+        for chunk in batched(notes, chunk_size):
+            in_flight.append(pool.submit(parse_chunk, chunk, batch_size))
+            if len(in_flight) >= 2 * workers:
+                handle(in_flight.popleft().result())
+        while in_flight:
+            handle(in_flight.popleft().result())
+    flush()
+    return stats
+
+
+def print_summary(stats, elapsed):
+    notes = stats["notes"]
+    print(f"Notes: {notes} in {elapsed:.1f} s ({notes / elapsed if elapsed else 0:,.1f} notes/s)")
+    print(f"Inserted: {stats['inserted']}, duplicates: {stats['duplicates']}, failed: {stats['failed']}")
+    print("Parsed by: " + (", ".join(f"{source} {count}" for source, count in stats["sources"].most_common())
+                           or "-"))
+    seconds = stats["chunk_seconds"]
+    if len(seconds) >= 2:
+        p50, p95, p99 = (statistics.quantiles(seconds, n=100)[i] for i in (49, 94, 98))
+        print(f"Chunk parse latency: p50 {p50:.2f} s, p95 {p95:.2f} s, p99 {p99:.2f} s, max {max(seconds):.2f} s")
+    elif seconds:
+        print(f"Chunk parse latency: {seconds[0]:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse English transaction notes and save them for a user")
+    parser.add_argument("--user", required=True, help="Email of the user the transactions belong to")
+    parser.add_argument("--input", help="Notes file, one note per line (default: stdin)")
+    parser.add_argument("--workers", type=int, default=4, help="Chunks parsed concurrently (default: 4)")
+    parser.add_argument("--chunk-size", type=int, default=PARSE_CHUNK_SIZE,
+                        help=f"Notes per worker task (default: {PARSE_CHUNK_SIZE})")
+    parser.add_argument("--batch-size", type=int, default=LLM_BATCH_SIZE,
+                        help=f"Notes per LLM prompt (default: {LLM_BATCH_SIZE})")
+    parser.add_argument("--rpm", type=int, default=transaction_parser.LLM_REQUESTS_PER_MINUTE,
+                        help="LLM requests per minute allowed by your API plan "
+                             f"(default: {transaction_parser.LLM_REQUESTS_PER_MINUTE})")
+    parser.add_argument("--llm-concurrency", type=int, default=transaction_parser.LLM_MAX_CONCURRENCY,
+                        help=f"LLM requests in flight (default: {transaction_parser.LLM_MAX_CONCURRENCY})")
+    parser.add_argument("--commit-every", type=int, default=COMMIT_EVERY,
+                        help=f"Records per transaction (default: {COMMIT_EVERY})")
+    parser.add_argument("--failed", help="Write notes that could not be parsed to this file")
+    parser.add_argument("--dry-run", action="store_true", help="Parse only, do not save anything")
+    args = parser.parse_args()
+
+    # The LLM limits are read when the first batch is sent, so they can still be changed here
+    transaction_parser.LLM_REQUESTS_PER_MINUTE = args.rpm
+    transaction_parser.LLM_MAX_CONCURRENCY = args.llm_concurrency
 
-# Example transaction descriptions
-if __name__ == '__main__':
-    # Create the table if it doesn't exist
     create_table()
+    notes_file = open(args.input, encoding="utf-8") if args.input else sys.stdin
+    failed_output = open(args.failed, "w", encoding="utf-8") if args.failed else None
+    started = time.perf_counter()
+    try:
+        stats = ingest(read_notes(notes_file), args.user, args.workers, args.chunk_size, args.batch_size,
+                       args.commit_every, failed_output, args.dry_run)
+    finally:
+        if args.input:
+            notes_file.close()
+        if failed_output:
+            failed_output.close()
+    print_summary(stats, time.perf_counter() - started)
 
-    # test_sentences = [
-    #     # "on 2024-02-28, I spent Rs 576 at the A2B restaurant and paid using my Citi savings account.",
-    #     # "I paid Rs 1660 to Big Market for RICE & pulses today using my HDFC credit card.",
-    #     # "Rs 8500 was spent on petrol yesterday using my SBI debit card.",
-    #     # "Last month, I transferred Rs 2000 for Booking flight to Miami using my Axis bank account.",
-    #     # "Spent Rs 800 on Diesel today."
-    #     "Today, I spent Rs 5700 at the A2B restaurant and paid using my Citi savings account."
-    # ]
-    input_text=input("Enter your transaction sentence in English sentence:")
-    if len(input_text):
-        test_sentences=[input_text]
-
-        # Process each transaction description
-        for test_sentence in test_sentences:
-            print(f"Processing: {test_sentence}")
-            try:
-                transaction_data = parse_transaction(test_sentence)
-                print(type(transaction_data))
-                # print(json.dumps(transaction_data, indent=4))
-                # print(type(transaction_data))
-
-                y = {"user_email": 'rajkumarpandit@gmail.com', "created_at":datetime.now().strftime("%Y-%m-%d")}
-                # transaction_data=transaction_data.update(y)
-                transaction_data["user_email"]='rajkumarpandit@gmail.com'
-                transaction_data["created_date"] = datetime.now().strftime("%Y-%m-%d")
-                print(json.dumps(transaction_data, indent=4))
-                print(type(transaction_data))
-                insert_record(transaction_data)
-            except Exception as e:
-                print(f"Error: {e}")
-
-        # db_path = db_file_name
-        # from utils import fetch_transactions
-        # try:
-        #     transactions_df = fetch_transactions(db_file_name)
-        #     print(transactions_df)
-        # except RuntimeError as e:
-        #     print(f"Error: {e}")
+
+if __name__ == '__main__':
+    main()
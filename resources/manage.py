@@ -0,0 +1,89 @@
+import argparse
+from db_operations import create_table, rebuild_monthly_rollup, db_file_name, schema_migrations
+from db_pool import get_connection
+from migrations import MigrationError, applied_migrations
+from slow_queries import read_log, slow_query_log_path, worst_offenders
+
+# Maintenance commands for the transactions database. Run from the resources directory, e.g.
+#   python manage.py migrate
+#   python manage.py schema-version
+#   python manage.py rebuild-rollup
+#   python manage.py rebuild-rollup --user someone@example.com
+#   python manage.py slow-queries --top 10
+
+
+def cmd_migrate(args):
+    try:
+        applied = create_table()
+    except MigrationError as error:
+        raise SystemExit(str(error))
+    for version, name in applied:
+        print(f"Applied migration {version}: {name}")
+    if not applied:
+        print("Schema is up to date.")
+
+
+def cmd_schema_version(args):
+    with get_connection(db_file_name) as conn:
+        applied = {row[0]: row for row in applied_migrations(conn)}
+    for version, name, _ in schema_migrations:
+        if version in applied:
+            _, _, applied_at, duration = applied[version]
+            print(f"{version:>3}  {name:<24} applied {applied_at} ({duration:.2f}s)")
+        else:
+            print(f"{version:>3}  {name:<24} pending")
+
+
+def cmd_rebuild_rollup(args):
+    create_table()
+    rows = rebuild_monthly_rollup(args.user)
+    scope = f"user {args.user}" if args.user else "all users"
+    print(f"Rebuilt monthly rollup for {scope}: {rows} rollup rows written.")
+
+
+def cmd_slow_queries(args):
+    path = args.log or slow_query_log_path(db_file_name)
+    offenders = worst_offenders(read_log(path, args.since), args.top)
+    if not offenders:
+        print(f"No slow queries logged in {path}.")
+        return
+    for rank, offender in enumerate(offenders, 1):
+        scans = f"  FULL SCAN of {', '.join(offender['full_scans'])}" if offender["full_scans"] else ""
+        errors = f"  {offender['errors']} failed" if offender["errors"] else ""
+        print(f"{rank:>2}. {offender['calls']:>5} calls  total {offender['total_ms']:>10.1f} ms  "
+              f"p95 {offender['p95_ms']:>8.1f} ms  max {offender['max_ms']:>8.1f} ms  "
+              f"max rows {offender['max_rows']}{scans}{errors}")
+        print(f"    {offender['sql']}")
+        for caller in offender["callers"][:3]:
+            print(f"    from {caller}")
+        for line in offender["plan"] or ():
+            print(f"    | {line}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Personal Finance database maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser("migrate", help="Apply pending schema migrations")
+    migrate.set_defaults(func=cmd_migrate)
+
+    version = subparsers.add_parser("schema-version", help="List schema migrations and whether they are applied")
+    version.set_defaults(func=cmd_schema_version)
+
+    rebuild = subparsers.add_parser("rebuild-rollup", help="Recompute the monthly/category rollup table")
+    rebuild.add_argument("--user", help="Only rebuild this user's rollup rows")
+    rebuild.set_defaults(func=cmd_rebuild_rollup)
+
+    slow = subparsers.add_parser("slow-queries", help="List the statements that took longest in the slow-query log")
+    slow.add_argument("--log", help="Log file to read (default: the one next to the database)")
+    slow.add_argument("--top", type=int, default=10, help="Number of statements to list")
+    slow.add_argument("--since", help="Only entries logged at or after this UTC date/time, e.g. 2026-10-01")
+    slow.set_defaults(func=cmd_slow_queries)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import get_setting
+
+# In-process latency histograms for the hot paths (parsing, database calls, password checks, page
+# renders), exported in the Prometheus text format.
+#
+#   with timed("page_render_seconds", page="home"):
+#       ...
+#
+#   @timed_function("db_operation_seconds")
+#   def fetch_all_records(...):
+#
+# Every histogram has the same fixed buckets, so recording a value is a bisect and three additions under
+# a lock; p50/p99 are estimated from the buckets. Values are kept per process since its start.
+#
+# Exporters, both optional and started by start_exporters():
+#   METRICS_PORT  serve GET /metrics on METRICS_HOST (default 127.0.0.1) at this port
+#   METRICS_FILE  rewrite this file every METRICS_FILE_INTERVAL_SECONDS, e.g. for node_exporter's
+#                 textfile collector
+
+METRIC_PREFIX = "finance_tracker_"
+
+# Bucket upper bounds in seconds: 50 µs to about 3 minutes, each bound sqrt(2) times the previous one
+BUCKET_BOUNDS = tuple(0.00005 * 2 ** (i / 2) for i in range(44))
+
+METRICS_FILE_INTERVAL_SECONDS = 15
+
+METRIC_HELP = {
+    "parse_transaction_seconds": "Time to parse one transaction description, by the path that produced it",
+    "parse_stage_seconds": "Time spent waiting for the LLM, extracting the JSON from its answer and parsing it",
+    "db_operation_seconds": "Duration of db_operations calls, by function",
+    "bcrypt_seconds": "Time spent hashing or checking a password with bcrypt",
+    "bcrypt_queue_seconds": "Time a password hash or check waited for a bcrypt worker",
+    "page_render_seconds": "Time app.main takes to render a page, by page",
+}
+
+_histograms = {}  # (name, ((label, value), ...)) -> Histogram
+_registry_lock = threading.Lock()
+_exporters_started = False
+
+
+class Histogram:
+    """Counts of observed durations in BUCKET_BOUNDS, plus their sum and count."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bucket_counts = [0] * (len(BUCKET_BOUNDS) + 1)  # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        bucket = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self.bucket_counts[bucket] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """Returns (bucket_counts, sum, count) read consistently."""
+        with self._lock:
+            return list(self.bucket_counts), self.sum, self.count
+
+    def quantile(self, q):
+        """Estimates the q-quantile (0..1) in seconds by interpolating within its bucket, or None if empty."""
+        bucket_counts, _, count = self.snapshot()
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for bucket, bucket_count in enumerate(bucket_counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if bucket == len(BUCKET_BOUNDS):
+                    return BUCKET_BOUNDS[-1]
+                lower = BUCKET_BOUNDS[bucket - 1] if bucket else 0.0
+                return lower + (BUCKET_BOUNDS[bucket] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return BUCKET_BOUNDS[-1]
+
+
+def histogram(name, **labels):
+    """Returns the histogram for a metric name and label values, creating it on first use."""
+    key = (name, tuple(sorted(labels.items())))
+    found = _histograms.get(key)
+    if found is None:
+        with _registry_lock:
+            found = _histograms.setdefault(key, Histogram())
+    return found
+
+
+def observe(name, seconds, **labels):
+    histogram(name, **labels).observe(seconds)
+
+
+@contextmanager
+def timed(name, **labels):
+    """Records the time spent in the with block, also when it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def timed_function(name):
+    """Decorator recording the duration of every call in histogram `name`, labelled with the function name."""
+    def decorate(func):
+        calls = histogram(name, function=func.__name__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                calls.observe(time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+def summary():
+    """Returns one dict per histogram (name, labels, count, p50, p99 and mean in seconds), busiest first per name."""
+    with _registry_lock:
+        items = list(_histograms.items())
+    rows = []
+    for (name, labels), hist in items:
+        _, total, count = hist.snapshot()
+        if count:
+            rows.append({"name": name, "labels": dict(labels), "count": count, "p50": hist.quantile(0.5),
+                         "p99": hist.quantile(0.99), "mean": total / count})
+    return sorted(rows, key=lambda row: (row["name"], -row["count"]))
+
+
+def _label_text(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+
+def prometheus_text():
+    """Returns every histogram in the Prometheus text exposition format."""
+    with _registry_lock:
+        items = sorted(_histograms.items())
+    lines = []
+    current_name = None
+    for (name, labels), hist in items:
+        metric = METRIC_PREFIX + name
+        if name != current_name:
+            current_name = name
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {metric} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {metric} histogram")
+        bucket_counts, total, count = hist.snapshot()
+        cumulative = 0
+        for bound, bucket_count in zip((*(f"{b:.6g}" for b in BUCKET_BOUNDS), "+Inf"), bucket_counts):
+            cumulative += bucket_count
+            lines.append(f"{metric}_bucket{_label_text(labels, (('le', bound),))} {cumulative}")
+        lines.append(f"{metric}_sum{_label_text(labels)} {total:.9g}")
+        lines.append(f"{metric}_count{_label_text(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_file(path):
+    """Writes prometheus_text() to path, replacing the file atomically."""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        f.write(prometheus_text())
+    os.replace(temporary, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are not worth a log line each
+
+
+def _write_file_forever(path):
+    while True:
+        time.sleep(METRICS_FILE_INTERVAL_SECONDS)
+        try:
+            write_prometheus_file(path)
+        except OSError as e:
+            print(f"Could not write metrics to {path}: {e}")
+
+
+def start_exporters():
+    """Starts the exporters configured by METRICS_PORT and METRICS_FILE, once per process."""
+    global _exporters_started
+    with _registry_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    port = get_setting("METRICS_PORT", None)
+    if port:
+        try:
+            server = ThreadingHTTPServer((get_setting("METRICS_HOST", "127.0.0.1"), int(port)), _MetricsHandler)
+        except OSError as e:
+            print(f"Could not serve metrics on port {port}: {e}")
+        else:
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    path = get_setting("METRICS_FILE", None)
+    if path:
+        threading.Thread(target=_write_file_forever, args=(path,), name="metrics-file", daemon=True).start()
+
+
+def _reset_after_fork():
+    # A forked child starts with empty histograms instead of a copy of its parent's, and without exporters
+    global _registry_lock, _exporters_started
+    _registry_lock = threading.Lock()
+    _exporters_started = False
+    for hist in _histograms.values():
+        hist._lock = threading.Lock()
+        hist.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,32 @@
+import pandas as pd
+import streamlit as st
+from accounts import is_admin
+from auth import display_app_banner
+from metrics import prometheus_text, summary
+
+
+def metrics_page(global_user_email):
+    """Latency of the hot paths in this server process, for the accounts listed in ADMIN_EMAILS."""
+    display_app_banner()  # Display the app banner
+    st.subheader("Metrics", divider='gray')
+    if not is_admin(global_user_email):
+        st.error("This page is only available to administrators.")
+        return
+
+    rows = summary()
+    if not rows:
+        st.info("Nothing has been measured yet.")
+        return
+
+    df = pd.DataFrame({
+        "Metric": [row["name"] for row in rows],
+        "Labels": [", ".join(f"{key}={value}" for key, value in row["labels"].items()) for row in rows],
+        "Calls": [row["count"] for row in rows],
+        "p50 (ms)": [row["p50"] * 1000 for row in rows],
+        "p99 (ms)": [row["p99"] * 1000 for row in rows],
+        "Mean (ms)": [row["mean"] * 1000 for row in rows],
+    })
+    st.caption("Since this server process started. Percentiles are estimated from histogram buckets.")
+    st.dataframe(df.round(2), hide_index=True, use_container_width=True)
+    st.download_button("Download (Prometheus format)", prometheus_text(), file_name="metrics.prom",
+                       mime="text/plain")
@@ -0,0 +1,80 @@
+import time
+from datetime import datetime
+
+# Versioned schema migrations for the SQLite database.
+# A migration is a (version, name, function) tuple; the function receives a cursor and must be
+# idempotent, so that a database whose schema was created before versioning existed can safely
+# run every step from the start.
+
+schema_version_table_name = "schema_version"
+
+
+class MigrationError(RuntimeError):
+    """
+    Raised by a migration that can't apply without losing data, e.g. rows it can't convert. The message
+    reports what needs fixing; the migration's transaction is rolled back, so nothing has changed.
+    """
+
+
+def ensure_version_table(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema_version_table_name} (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL,
+            duration_seconds REAL NOT NULL
+        )
+    """)
+
+
+def applied_migrations(conn):
+    """Returns the (version, name, applied_at, duration_seconds) rows of the applied migrations."""
+    ensure_version_table(conn)
+    return conn.execute(f"""
+        SELECT version, name, applied_at, duration_seconds FROM {schema_version_table_name} ORDER BY version
+    """).fetchall()
+
+
+def current_version(conn):
+    """Returns the highest applied migration version, or 0 for an unversioned database."""
+    ensure_version_table(conn)
+    return conn.execute(f"SELECT coalesce(max(version), 0) FROM {schema_version_table_name}").fetchone()[0]
+
+
+def run_migrations(conn, migrations):
+    """
+    Applies the migrations that have not been applied yet, in version order.
+
+    Each migration runs in its own IMMEDIATE transaction together with its schema_version row, so it
+    is applied completely or not at all, and when several processes start at once only one applies it.
+
+    :param conn: Connection to the database; any open transaction is committed first.
+    :param migrations: Iterable of (version, name, function) tuples.
+    :return: List of (version, name) applied by this call.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    ensure_version_table(conn)
+    done = {row[0] for row in applied_migrations(conn)}
+
+    applied = []
+    for version, name, migrate in sorted(migrations, key=lambda migration: migration[0]):
+        if version in done:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have applied it while we waited for the write lock
+            if not conn.execute(f"SELECT 1 FROM {schema_version_table_name} WHERE version = ?",
+                                (version,)).fetchone():
+                started = time.perf_counter()
+                migrate(conn.cursor())
+                conn.execute(f"""
+                    INSERT INTO {schema_version_table_name} (version, name, applied_at, duration_seconds)
+                    VALUES (?, ?, ?, ?)
+                """, (version, name, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), time.perf_counter() - started))
+                applied.append((version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from config import get_setting
+from db_pool import get_connection
+from rule_parser import find_date
+
+# Persistent cache of LLM parse results, stored in the transactions database so it survives restarts
+# and is shared by every session. Entries are keyed on the normalized description.
+
+db_file_name = get_setting("DATABASE_FILE_NAME")
+cache_table_name = "parse_cache"
+
+# Entries older than this are not served and are removed by the next eviction sweep
+PARSE_CACHE_TTL_DAYS = 90
+# Maximum number of entries kept; the least recently used ones are evicted first
+PARSE_CACHE_MAX_ENTRIES = 10000
+# Run the eviction sweep once every this many writes
+EVICT_EVERY_N_PUTS = 100
+# Write the pending cache-hit touches once every this many hits, see flush_touches
+FLUSH_TOUCHES_EVERY_N_HITS = 500
+
+_lock = threading.Lock()
+_table_ready = False
+_puts = 0
+_counters = {"hits": 0, "misses": 0, "seconds_saved": 0.0}
+# Cache hits not written yet, as cache key -> (last used time, hits), so that a hit is a read only
+_touches = {}
+_touch_hits = 0
+
+
+def _ensure_table(conn):
+    global _table_ready
+    if _table_ready:
+        return
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {cache_table_name} (
+            cache_key TEXT PRIMARY KEY,
+            normalized_desc TEXT NOT NULL,
+            result TEXT NOT NULL,
+            date_offset_days INTEGER,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hit_count INTEGER NOT NULL DEFAULT 0,
+            parse_seconds REAL NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_{cache_table_name}_last_used
+        ON {cache_table_name} (last_used_at)
+    """)
+    _table_ready = True
+
+
+def normalize_desc(desc):
+    """Lower-cases the description, collapses whitespace and drops trailing punctuation."""
+    return " ".join(desc.lower().split()).rstrip(".!?, ")
+
+
+def _cache_key(normalized):
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def get_cached_parse(desc, today=None):
+    """
+    Returns the cached parse result for the description, or None on a miss.
+
+    Results of descriptions without an explicit date ("today", "yesterday", or no date at all) are
+    stored as an offset from the day they were parsed and re-resolved against `today`, so a cached
+    "today" always means the current day. A hit is not written back right away; its use time and hit
+    count are kept in memory until flush_touches.
+    """
+    global _touch_hits
+    today = today or datetime.now()
+    cache_key = _cache_key(normalize_desc(desc))
+    now = time.time()
+    with get_connection(db_file_name) as conn:
+        _ensure_table(conn)
+        row = conn.execute(f"""
+            SELECT result, date_offset_days, parse_seconds FROM {cache_table_name}
+            WHERE cache_key = ? AND created_at >= ?
+        """, (cache_key, now - PARSE_CACHE_TTL_DAYS * 86400)).fetchone()
+    if row is None:
+        with _lock:
+            _counters["misses"] += 1
+        return None
+
+    result_json, date_offset_days, parse_seconds = row
+    with _lock:
+        _counters["hits"] += 1
+        _counters["seconds_saved"] += parse_seconds
+        _touches[cache_key] = (now, _touches.get(cache_key, (0, 0))[1] + 1)
+        _touch_hits += 1
+        flush = _touch_hits >= FLUSH_TOUCHES_EVERY_N_HITS
+    if flush:
+        flush_touches()
+
+    result = json.loads(result_json)
+    if date_offset_days is not None:
+        result["Transaction Date"] = (today + timedelta(days=date_offset_days)).strftime("%Y-%m-%d")
+    return result
+
+
+def put_cached_parse(desc, result, parse_seconds, today=None):
+    """Stores a parse result together with the time it took to produce."""
+    global _puts
+    today = today or datetime.now()
+    normalized = normalize_desc(desc)
+
+    date_offset_days = None
+    if find_date(normalized, today)[2] != "explicit":
+        try:
+            parsed_date = datetime.strptime(str(result.get("Transaction Date")), "%Y-%m-%d")
+            date_offset_days = (parsed_date.date() - today.date()).days
+        except ValueError:
+            date_offset_days = 0
+
+    now = time.time()
+    with get_connection(db_file_name) as conn:
+        _ensure_table(conn)
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {cache_table_name}
+            (cache_key, normalized_desc, result, date_offset_days, created_at, last_used_at, parse_seconds)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (_cache_key(normalized), normalized, json.dumps(result), date_offset_days, now, now, parse_seconds))
+
+        with _lock:
+            _puts += 1
+            sweep = _puts % EVICT_EVERY_N_PUTS == 0
+        if sweep:
+            evict()
+
+
+def flush_touches():
+    """
+    Writes the last_used_at and hit_count updates of the cache hits since the last flush, in one
+    executemany. Runs before every eviction sweep, so entries are evicted by up-to-date use times.
+    :return: Number of entries updated.
+    """
+    global _touch_hits
+    with _lock:
+        touches = [(used_at, hits, cache_key) for cache_key, (used_at, hits) in _touches.items()]
+        _touches.clear()
+        _touch_hits = 0
+    if not touches:
+        return 0
+    with get_connection(db_file_name) as conn:
+        _ensure_table(conn)
+        conn.executemany(f"""
+            UPDATE {cache_table_name} SET last_used_at = max(last_used_at, ?), hit_count = hit_count + ?
+            WHERE cache_key = ?
+        """, touches)
+    return len(touches)
+
+
+def evict():
+    """Removes expired entries and trims the cache to PARSE_CACHE_MAX_ENTRIES, least recently used first."""
+    flush_touches()
+    with get_connection(db_file_name) as conn:
+        _ensure_table(conn)
+        expired = conn.execute(f"DELETE FROM {cache_table_name} WHERE created_at < ?",
+                               (time.time() - PARSE_CACHE_TTL_DAYS * 86400,)).rowcount
+        trimmed = conn.execute(f"""
+            DELETE FROM {cache_table_name} WHERE cache_key IN (
+                SELECT cache_key FROM {cache_table_name}
+                ORDER BY last_used_at DESC
+                LIMIT -1 OFFSET ?
+            )
+        """, (PARSE_CACHE_MAX_ENTRIES,)).rowcount
+    return expired + trimmed
+
+
+def cache_stats():
+    """Returns hit/miss counters, LLM seconds saved by hits and the number of cached entries."""
+    with get_connection(db_file_name) as conn:
+        _ensure_table(conn)
+        entries = conn.execute(f"SELECT count(*) FROM {cache_table_name}").fetchone()[0]
+    with _lock:
+        return {**_counters, "entries": entries}
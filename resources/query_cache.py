@@ -0,0 +1,116 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+from db_operations import data_version
+
+# In-memory cache of query results for the Streamlit pages, so reruns that only change a widget
+# (a checkbox, the page number going back) do not query SQLite and rebuild DataFrames again.
+#
+# Entries are keyed on (user, key) and remember the user's data_version when they were computed; an entry
+# is only served while that version is current, so the first read after the user inserts or deletes
+# recomputes it. The cache is shared by every session of the process: results of one user are never
+# served to another, and two sessions of the same user share their entries. Total size is bounded by
+# QUERY_CACHE_MAX_BYTES, evicting the least recently used entries first.
+#
+# data_version only sees writes made by this process; writes from other processes (main.py, manage.py)
+# show up once QUERY_CACHE_TTL_SECONDS has passed.
+#
+# Cached values are shared, so callers must not modify them in place.
+
+QUERY_CACHE_MAX_BYTES = 64 * 2 ** 20
+QUERY_CACHE_TTL_SECONDS = 60
+
+
+def estimate_size(value):
+    """Approximate memory used by a cached value, in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """Thread-safe LRU cache of query results with a memory budget, invalidated by data_version."""
+
+    def __init__(self, max_bytes=None, ttl=None):
+        self.max_bytes = max_bytes or QUERY_CACHE_MAX_BYTES
+        self.ttl = ttl or QUERY_CACHE_TTL_SECONDS
+        self._entries = OrderedDict()  # (user, key) -> (version, stored_at, size, value)
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_email, key, compute):
+        """
+        Returns the cached result for (user_email, key), or calls compute() and caches what it returns.
+
+        :param key: Hashable description of the query, e.g. ("page", start_date, end_date, cursor).
+        """
+        version = data_version(user_email)  # Before the query, so a concurrent write is never missed
+        full_key = (user_email, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] == version and now - entry[1] < self.ttl:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return entry[3]
+            self.misses += 1
+
+        value = compute()
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            old = self._entries.pop(full_key, None)
+            if old is not None:
+                self.size -= old[2]
+            self._entries[full_key] = (version, now, size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, _, evicted_size, _) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+        return value
+
+    def invalidate(self, user_email, key):
+        """Drops the cached result for (user_email, key), if any."""
+        with self._lock:
+            entry = self._entries.pop((user_email, key), None)
+            if entry is not None:
+                self.size -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Returns hit/miss/eviction counters, the number of entries and their estimated size in bytes."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self.size}
+
+
+_cache = QueryCache()
+
+
+def cached_query(user_email, key, compute):
+    """Returns compute() for the user through the process-wide query cache, see QueryCache.get."""
+    return _cache.get(user_email, key, compute)
+
+
+def invalidate_query(user_email, key):
+    """Drops one result from the process-wide query cache, e.g. a count found to be stale."""
+    _cache.invalidate(user_email, key)
+
+
+def query_cache_stats():
+    return _cache.stats()
@@ -0,0 +1,254 @@
+import re
+from datetime import datetime, timedelta
+
+# Deterministic, local extractor for simple transaction sentences such as
+# "Spent Rs 800 on Diesel today." It returns the same keys as the LLM parser in
+# transaction_parser plus a confidence score, so that only unclear sentences need
+# an LLM round-trip.
+
+# Relative date words, resolved the same way as the LLM prompt does
+RELATIVE_DAYS = (
+    ("day before yesterday", 2),
+    ("yesterday", 1),
+    ("today", 0),
+    ("last week", 7),
+    ("last month", 30),
+    ("last year", 365),
+)
+
+MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1)}
+
+CURRENCY_ALIASES = {
+    "rs": "INR", "rs.": "INR", "inr": "INR", "₹": "INR", "rupee": "INR", "rupees": "INR",
+    "$": "USD", "usd": "USD", "dollar": "USD", "dollars": "USD",
+    "€": "EUR", "eur": "EUR", "euro": "EUR", "euros": "EUR",
+}
+
+KNOWN_BANKS = {
+    "hdfc": "HDFC", "sbi": "SBI", "state bank": "SBI", "icici": "ICICI", "axis": "Axis", "citi": "Citi",
+    "citibank": "Citi", "kotak": "Kotak", "yes bank": "Yes Bank", "pnb": "PNB", "punjab national": "PNB",
+    "bank of baroda": "Bank of Baroda", "indusind": "IndusInd", "idfc": "IDFC First", "hsbc": "HSBC",
+    "standard chartered": "Standard Chartered", "canara": "Canara", "union bank": "Union Bank",
+    "federal bank": "Federal Bank", "rbl": "RBL", "amex": "American Express", "american express": "American Express",
+}
+
+ACCOUNT_TYPES = {
+    "savings account": "Savings Account", "saving account": "Savings Account", "savings": "Savings Account",
+    "current account": "Current Account", "credit card": "Credit Card", "debit card": "Debit Card",
+    "forex card": "Forex Card", "cash": "Cash",
+}
+
+CATEGORY_KEYWORDS = {
+    "Transport": ("petrol", "diesel", "fuel", "cab", "taxi", "uber", "ola", "metro", "bus", "train", "flight",
+                  "parking", "toll", "auto"),
+    "Groceries": ("grocery", "groceries", "rice", "pulses", "vegetables", "vegetable", "fruits", "milk",
+                  "supermarket", "dmart", "big market", "big bazaar", "provisions"),
+    "Leisure": ("restaurant", "dinner", "lunch", "breakfast", "cafe", "coffee", "vacation", "holiday", "resort",
+                "spa", "shopping", "hotel"),
+    "Education": ("school", "college", "tuition", "course", "books", "book", "fees", "exam", "training", "class",
+                  "classes"),
+    "Utilities": ("electricity", "water bill", "gas", "internet", "broadband", "wifi", "recharge", "phone bill",
+                  "mobile bill", "rent", "maintenance"),
+    "Health": ("doctor", "hospital", "medicine", "medicines", "pharmacy", "clinic", "dental", "dentist",
+               "insurance", "gym"),
+    "Entertainment": ("movie", "movies", "cinema", "netflix", "prime", "hotstar", "spotify", "concert", "game",
+                      "games"),
+}
+
+# One pattern per category matching any of its keywords as a whole word, used by guess_category
+CATEGORY_PATTERNS = [
+    (name, re.compile(r"(?<![a-z])(?:" + "|".join(re.escape(word) for word in words) + r")(?![a-z])"))
+    for name, words in CATEGORY_KEYWORDS.items()
+]
+
+# Phrase introducers for the description, in order of preference
+DESC_PREPOSITIONS = ("for", "on", "at", "to")
+DESC_STOP_WORDS = r"using|with|via|through|from|by|paid|and|on|at|today|yesterday|last|in cash|in|this"
+
+# Highest confidence given to a sentence with a date-like token that could not be read as a date, e.g.
+# "2024-13-45" or a bare "September"; it is below transaction_parser.LOCAL_PARSE_MIN_CONFIDENCE, so such
+# sentences are handed to the LLM rather than dated today
+UNRESOLVED_DATE_MAX_CONFIDENCE = 0.5
+
+MONTH_NAME = (r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?"
+              r"|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)")
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+DMY_DATE = re.compile(r"\b(\d{1,2})[/-](\d{1,2})[/-](\d{4})\b")
+DAY_MONTH_DATE = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + MONTH_NAME + r"\.?,?\s+(\d{4})\b")
+MONTH_DAY_DATE = re.compile(r"\b" + MONTH_NAME + r"\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})\b")
+# Day and month without a year, e.g. "12 May", "5th of October" or "Oct 5"
+DAY_MONTH = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + MONTH_NAME + r"\b")
+MONTH_DAY = re.compile(r"\b" + MONTH_NAME + r"\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b")
+DATE_PATTERNS = ((ISO_DATE, "ymd"), (DMY_DATE, "dmy"), (DAY_MONTH_DATE, "dMy"), (MONTH_DAY_DATE, "Mdy"),
+                 (DAY_MONTH, "dM"), (MONTH_DAY, "Md"))
+# Date-like tokens that can't be resolved to a day: a month on its own ("rent for September") or a
+# numeric day/month without a year ("12/05")
+BARE_MONTH = re.compile(r"\b" + MONTH_NAME + r"\b")
+UNRESOLVED_DATE_PATTERNS = (BARE_MONTH, re.compile(r"\b\d{1,2}/\d{1,2}\b"))
+
+NUMBER = r"(\d[\d,]*(?:\.\d+)?)"
+AMOUNT_PREFIX = re.compile(r"(?<![a-z])(rs\.?|inr|₹|usd|\$|eur|€)\s*" + NUMBER)
+AMOUNT_SUFFIX = re.compile(NUMBER + r"\s*(rupees?|rs\.?|inr|dollars?|usd|euros?|eur)\b")
+BARE_NUMBER = re.compile(r"\b" + NUMBER + r"\b")
+
+
+def _latest_date(month, day, today):
+    """Returns the latest date on the given day and month that is not after `today`."""
+    candidate = datetime(today.year, month, day)
+    return candidate if candidate <= today else candidate.replace(year=today.year - 1)
+
+
+def find_date(text, today):
+    """
+    Returns (date, span, kind) where kind is "explicit", "relative", "default" or "unresolved".
+    A day and month without a year ("12 May") is the latest such date up to `today`. A date-like token
+    that can't be read as a date ("2024-13-45", "31 Feb", a bare "September") gives "unresolved", with
+    `today` as the date and the token's span.
+    """
+    for pattern, order in DATE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        parts = dict(zip(order, match.groups()))
+        try:
+            month = int(parts["m"]) if "m" in parts else MONTHS[parts["M"][:3]]
+            if "y" in parts:
+                return datetime(int(parts["y"]), month, int(parts["d"])), match.span(), "explicit"
+            return _latest_date(month, int(parts["d"]), today), match.span(), "explicit"
+        except ValueError:
+            return today, match.span(), "unresolved"
+
+    for pattern in UNRESOLVED_DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return today, match.span(), "unresolved"
+
+    for phrase, days in RELATIVE_DAYS:
+        match = re.search(r"\b" + phrase + r"\b", text)
+        if match:
+            return today - timedelta(days=days), match.span(), "relative"
+    return today, None, "default"
+
+
+def _find_amounts(text):
+    """Returns a list of (amount, currency, span) for every amount mentioned with a currency."""
+    amounts = []
+    for match in AMOUNT_PREFIX.finditer(text):
+        amounts.append((match.group(2), CURRENCY_ALIASES[match.group(1)], match.span()))
+    for match in AMOUNT_SUFFIX.finditer(text):
+        if not any(start <= match.start() < end for _, _, (start, end) in amounts):
+            amounts.append((match.group(1), CURRENCY_ALIASES[match.group(2)], match.span()))
+    return [(float(value.replace(",", "")), currency, span) for value, currency, span in amounts]
+
+
+def _find_keyword(text, keywords):
+    """Returns (canonical value, keyword) for the longest keyword found in text, or (None, None)."""
+    for keyword in sorted(keywords, key=len, reverse=True):
+        if re.search(r"(?<![a-z])" + re.escape(keyword) + r"(?![a-z])", text):
+            return keywords[keyword], keyword
+    return None, None
+
+
+def _find_description(original, lowered, masked_spans):
+    """Returns the phrase introduced by for/on/at/to, skipping phrases that are dates or amounts."""
+    for preposition in DESC_PREPOSITIONS:
+        for match in re.finditer(
+                r"\b" + preposition + r"\s+(?:the\s+|my\s+|a\s+)?(.+?)(?=\s+(?:" + DESC_STOP_WORDS + r")\b|[.,;!]|$)",
+                lowered):
+            start, end = match.span(1)
+            if any(s < end and start < e for s, e in masked_spans):
+                continue
+            phrase = original[start:end].strip()
+            if phrase and not phrase[0].isdigit():
+                return phrase[:50]
+    return None
+
+
+def guess_category(text):
+    """Returns the first category of CATEGORY_KEYWORDS with a keyword in text, or None."""
+    lowered = text.lower()
+    for name, pattern in CATEGORY_PATTERNS:
+        if pattern.search(lowered):
+            return name
+    return None
+
+
+def parse_locally(desc, today=None):
+    """
+    Extracts transaction details from an English sentence using rules only.
+
+    :param desc: Transaction description, e.g. "Spent Rs 800 on Diesel today."
+    :param today: Date used to resolve relative words; defaults to now.
+    :return: (details, confidence) where details has the same keys as the LLM parser and confidence
+        is between 0 and 1. A confidence of 0 means no amount could be found.
+    """
+    today = today or datetime.now()
+    text = " ".join(desc.split())
+    lowered = text.lower()
+    confidence = 0.0
+
+    txn_date, date_span, date_kind = find_date(lowered, today)
+    if date_kind in ("explicit", "relative"):
+        confidence += 0.15
+    elif date_kind == "default":
+        confidence += 0.1
+
+    amounts = _find_amounts(lowered)
+    currency = None
+    if amounts:
+        amount, currency, amount_span = amounts[0]
+        confidence += 0.4
+        if len({a for a, _, _ in amounts}) > 1:
+            confidence -= 0.3  # Several different amounts; let the LLM decide which one was spent
+    else:
+        # A single bare number outside the date is still taken as the amount, with less confidence
+        numbers = [m for m in BARE_NUMBER.finditer(lowered)
+                   if not (date_span and date_span[0] <= m.start() < date_span[1])]
+        if len(numbers) != 1:
+            amount, amount_span = 0, None
+        else:
+            amount, amount_span = float(numbers[0].group(1).replace(",", "")), numbers[0].span()
+            confidence += 0.3
+
+    bank_name, _ = _find_keyword(lowered, KNOWN_BANKS)
+    if bank_name is None and re.search(r"\bbank\b", lowered):
+        confidence -= 0.2  # A bank is mentioned but not one we know
+    account_type, _ = _find_keyword(lowered, ACCOUNT_TYPES)
+    if account_type is None and re.search(r"\b(account|card)\b", lowered):
+        confidence -= 0.1
+
+    category, keyword = None, None
+    matches = {}
+    for name, words in CATEGORY_KEYWORDS.items():
+        value, word = _find_keyword(lowered, {w: name for w in words})
+        if value:
+            matches[name] = word
+    if matches:
+        category, keyword = next(iter(matches.items()))
+        confidence += 0.25 if len(matches) == 1 else 0.15
+
+    # Dates, amounts and month names ("rent for September") are never the description
+    masked = [span for span in (date_span, amount_span) if span]
+    masked.extend(match.span() for match in BARE_MONTH.finditer(lowered))
+    description = _find_description(text, lowered, masked)
+    if description:
+        confidence += 0.2
+    elif keyword:
+        description = keyword.title()
+        confidence += 0.1
+
+    details = {
+        "Transaction Date": txn_date.strftime("%Y-%m-%d"),
+        "Bank Name": bank_name,
+        "Account Type": account_type,
+        "Transaction Amount": amount,
+        "Transaction Currency": currency,
+        "Transaction Category": category or "Other",
+        "Transaction Description": description,
+    }
+    if not amount:
+        return details, 0.0
+    if date_kind == "unresolved":
+        confidence = min(confidence, UNRESOLVED_DATE_MAX_CONFIDENCE)
+    return details, round(max(0.0, min(confidence, 1.0)), 2)
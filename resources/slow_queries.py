@@ -0,0 +1,356 @@
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from config import get_setting
+
+# Slow-query log. Pooled connections (db_pool) are opened as TimedConnection, whose cursors time every
+# statement: execute/executemany plus the fetches that read its rows, not the caller's time in between.
+# A statement that takes longer than SLOW_QUERY_THRESHOLD_MS is written as one JSON line to a rotating log
+# next to the database, with its normalized SQL, the types of its bound parameters, the rows it returned
+# or changed, where it was called from and its EXPLAIN QUERY PLAN. `python manage.py slow-queries` groups
+# the log by statement and lists the worst offenders, flagging full table scans.
+#
+# Settings, read when a connection is opened:
+#   SLOW_QUERY_THRESHOLD_MS   log statements slower than this, default 100; "off" or a negative value
+#                             disables timing and connections are plain sqlite3 connections again
+#   SLOW_QUERY_LOG_FILE       log file, default <database name>.slow_queries.log next to the database
+#   SLOW_QUERY_LOG_MAX_BYTES  size at which the log is rotated, default 10 MB
+#   SLOW_QUERY_LOG_BACKUPS    rotated files kept, default 3
+
+DEFAULT_THRESHOLD_MS = 100
+DEFAULT_LOG_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_LOG_BACKUPS = 3
+
+# Statements EXPLAIN QUERY PLAN is run for; pragmas, transaction control and DDL have no plan worth logging
+EXPLAINED_STATEMENTS = ("SELECT", "WITH", "INSERT", "REPLACE", "UPDATE", "DELETE")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+
+_logs = {}  # log file path -> SlowQueryLog
+_logs_lock = threading.Lock()
+
+
+def normalize_sql(sql):
+    """Collapses whitespace and replaces literals and placeholder lists, so that one statement reads the same every call."""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = " ".join(sql.split())
+    return _PLACEHOLDER_LIST.sub("?, ...", sql)
+
+
+def parameter_shape(parameters):
+    """Returns the types of bound parameters, runs of one type counted, e.g. ["str", "int x500"]."""
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    runs = []
+    for value in parameters:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return [name if count == 1 else f"{name} x{count}" for name, count in runs]
+
+
+def _caller():
+    """Returns "file:line function" of the innermost frame outside this module and db_pool."""
+    frame = sys._getframe(1)
+    while frame is not None and os.path.basename(frame.f_code.co_filename) in ("slow_queries.py", "db_pool.py",
+                                                                                 "contextlib.py"):
+        frame = frame.f_back
+    if frame is None:
+        return None
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+def _query_plan(conn, sql, parameters):
+    """Returns the EXPLAIN QUERY PLAN lines of a statement, indented by depth, or None if it has none."""
+    if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+        return None
+    try:
+        # The base class execute, so that the EXPLAIN itself is not timed
+        rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+def full_scans(plan):
+    """
+    Returns the tables a query plan reads in full. SQLite's "SCAN table" walks every row, also when it
+    says USING (COVERING) INDEX: that only means it walks the index instead of the table.
+    """
+    scans = []
+    for line in plan or ():
+        match = re.match(r"\s*SCAN (\S+)", line)
+        if match and match.group(1) != "CONSTANT":
+            scans.append(match.group(1))
+    return scans
+
+
+class SlowQueryLog:
+    """Writes the statements slower than a threshold to a rotating JSON-lines file."""
+
+    def __init__(self, path, threshold_ms, max_bytes=DEFAULT_LOG_MAX_BYTES, backups=DEFAULT_LOG_BACKUPS):
+        self.path = path
+        self.threshold = threshold_ms / 1000
+        self._logger = logging.getLogger(f"{__name__}.{path}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        if not self._logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                           delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger.addHandler(handler)
+
+    def record(self, conn, sql, parameters, seconds, rows, error=None):
+        if seconds < self.threshold:
+            return
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "ms": round(seconds * 1000, 3),
+            "rows": rows,
+            "sql": normalize_sql(sql),
+            "params": parameter_shape(parameters),
+            "caller": _caller(),
+            "plan": None if error else _query_plan(conn, sql, parameters),
+        }
+        if error:
+            entry["error"] = error
+        self._logger.info(json.dumps(entry))
+
+
+def slow_query_log_path(db_path):
+    """Returns the slow-query log file for a database, SLOW_QUERY_LOG_FILE if set."""
+    return get_setting("SLOW_QUERY_LOG_FILE", None) or os.path.splitext(db_path)[0] + ".slow_queries.log"
+
+
+def slow_query_log(db_path):
+    """Returns the SlowQueryLog for a database file, or None when slow-query logging is off."""
+    threshold = str(get_setting("SLOW_QUERY_THRESHOLD_MS", DEFAULT_THRESHOLD_MS)).strip().lower()
+    if db_path == ":memory:" or threshold in ("", "off") or float(threshold) < 0:
+        return None
+    path = slow_query_log_path(db_path)
+    with _logs_lock:
+        log = _logs.get(path)
+        if log is None or log.threshold != float(threshold) / 1000:
+            log = _logs[path] = SlowQueryLog(
+                path, float(threshold),
+                max_bytes=int(get_setting("SLOW_QUERY_LOG_MAX_BYTES", DEFAULT_LOG_MAX_BYTES)),
+                backups=int(get_setting("SLOW_QUERY_LOG_BACKUPS", DEFAULT_LOG_BACKUPS)))
+        return log
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Cursor timing each statement from execute until its rows are read: the statement is recorded once
+    its result is exhausted, at the next execute, or when the cursor is closed or garbage collected.
+    """
+
+    _statement = None  # [sql, parameters, seconds so far, rows read]
+
+    def _finish(self, rows=None):
+        sql, parameters, seconds, rows_read = self._statement
+        self._statement = None
+        log = self.connection.slow_query_log
+        if log is not None:
+            log.record(self.connection, sql, parameters, seconds, rows_read if rows is None else rows)
+
+    def _fetched(self, seconds, rows, exhausted):
+        statement = self._statement
+        if statement is not None:
+            statement[2] += seconds
+            statement[3] += rows
+            if exhausted:
+                self._finish()
+
+    def _failed(self, sql, parameters, seconds, error):
+        log = self.connection.slow_query_log
+        if log is not None:
+            log.record(self.connection, sql, parameters, seconds, None, error=f"{type(error).__name__}: {error}")
+
+    def execute(self, sql, parameters=()):
+        if self._statement is not None:
+            self._finish()
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except sqlite3.Error as e:
+            self._failed(sql, parameters, time.perf_counter() - started, e)
+            raise
+        self._statement = [sql, parameters, time.perf_counter() - started, 0]
+        if self.description is None:  # No result rows: the statement has run to completion
+            self._finish(rows=self.rowcount)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        if self._statement is not None:
+            self._finish()
+        if isinstance(seq_of_parameters, (list, tuple)):
+            first = seq_of_parameters[:1]
+        else:
+            first = []
+
+            def remember_first(parameters_iter):
+                for parameters in parameters_iter:
+                    if not first:
+                        first.append(parameters)
+                    yield parameters
+            seq_of_parameters = remember_first(seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        except sqlite3.Error as e:
+            self._failed(sql, first[0] if first else (), time.perf_counter() - started, e)
+            raise
+        self._statement = [sql, first[0] if first else (), time.perf_counter() - started, 0]
+        self._finish(rows=self.rowcount)
+        return self
+
+    def executescript(self, sql_script):
+        if self._statement is not None:
+            self._finish()
+        started = time.perf_counter()
+        super().executescript(sql_script)
+        # A script is several statements, so it gets no query plan
+        self._statement = [sql_script, (), time.perf_counter() - started, 0]
+        self._finish(rows=-1)
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(time.perf_counter() - started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(time.perf_counter() - started, len(rows), len(rows) < (self.arraysize if size is None else size))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(time.perf_counter() - started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(time.perf_counter() - started, 0, True)
+            raise
+        self._fetched(time.perf_counter() - started, 1, False)
+        return row
+
+    def close(self):
+        if self._statement is not None:
+            self._finish()
+        super().close()
+
+    def __del__(self):
+        if self._statement is not None:
+            try:
+                self._finish()
+            except Exception:
+                pass  # The connection may already be closed
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose statements run on TimedCursors and are logged to slow_query_log when slow."""
+
+    slow_query_log = None
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connect(db_path, **kwargs):
+    """sqlite3.connect, returning a TimedConnection when slow-query logging is on for db_path."""
+    log = slow_query_log(db_path)
+    if log is None:
+        return sqlite3.connect(db_path, **kwargs)
+    conn = sqlite3.connect(db_path, factory=TimedConnection, **kwargs)
+    conn.slow_query_log = log
+    return conn
+
+
+def read_log(path, since=None):
+    """Yields the entries of a slow-query log and its rotated files, oldest first; `since` is an ISO date/time."""
+    rotated = sorted(glob.glob(glob.escape(path) + ".[0-9]*"), key=lambda p: int(p.rsplit(".", 1)[1]),
+                     reverse=True)
+    for log_file in [*rotated, path]:
+        if not os.path.exists(log_file):
+            continue
+        with open(log_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # A line cut short by a crash or a concurrent rotation
+                if since is None or entry["time"] >= since:
+                    yield entry
+
+
+def worst_offenders(entries, top=10):
+    """
+    Groups log entries by normalized SQL. Returns up to `top` groups, by total time, as dicts with the
+    statement's calls, total/p95/max ms, max rows, callers, tables scanned in full and its latest plan.
+    """
+    groups = defaultdict(list)
+    for entry in entries:
+        groups[entry["sql"]].append(entry)
+    offenders = []
+    for sql, group in groups.items():
+        times = sorted(entry["ms"] for entry in group)
+        plan = next((entry["plan"] for entry in reversed(group) if entry.get("plan")), None)
+        offenders.append({
+            "sql": sql,
+            "calls": len(group),
+            "total_ms": sum(times),
+            "p95_ms": times[min(len(times) - 1, int(len(times) * 0.95))],
+            "max_ms": times[-1],
+            "max_rows": max((entry["rows"] for entry in group if entry["rows"] is not None), default=None),
+            "callers": sorted({entry["caller"] for entry in group if entry.get("caller")}),
+            "errors": sum(1 for entry in group if entry.get("error")),
+            "full_scans": full_scans(plan),
+            "plan": plan,
+        })
+    offenders.sort(key=lambda offender: offender["total_ms"], reverse=True)
+    return offenders[:top]
+
+
+def _reset_after_fork():
+    global _logs_lock
+    _logs_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,356 @@
+import csv
+import hashlib
+import io
+import itertools
+import re
+from collections import Counter
+from datetime import datetime
+from db_operations import compute_dedup_key, insert_records
+from rule_parser import guess_category
+from write_queue import run_write
+
+# Imports bank statements (CSV or OFX/QFX) into the transactions table.
+# The file is streamed through a generator pipeline: read rows -> map them to transaction records ->
+# batch -> dedup and executemany. Only one batch is held in memory at a time. Each batch is written by
+# the write queue (see write_queue.py) in its own transaction, so a large import holds the write lock for
+# one batch at a time and other sessions' saves go in between. An import that fails part way keeps the
+# batches already written; importing the file again skips those rows as duplicates.
+
+# Imported records are de-duplicated by their content and how many identical rows came before them in
+# the file (see import_dedup_key), so identical rows of one statement are all kept, while the rows an
+# overlapping statement shares with an earlier import are skipped.
+
+# Records per insert_records call; progress is reported after every batch
+IMPORT_BATCH_SIZE = 1000
+
+# Transaction fields a CSV column can be mapped to. Debit/Credit are for statements with separate
+# withdrawal and deposit columns instead of one signed amount.
+MAPPABLE_FIELDS = ("Transaction Date", "Transaction Description", "Transaction Amount", "Debit", "Credit",
+                   "Transaction Currency", "Transaction Category", "Bank Name", "Account Type")
+
+# Header names recognised for each field when guessing a CSV column mapping (compared lower-cased)
+CSV_COLUMN_ALIASES = {
+    "Transaction Date": ("date", "transaction date", "txn date", "tran date", "posting date", "posted date",
+                         "value date", "booking date"),
+    "Transaction Description": ("description", "narration", "details", "particulars", "transaction details",
+                                "memo", "payee", "name", "remarks"),
+    "Transaction Amount": ("amount", "transaction amount", "amt"),
+    "Debit": ("debit", "debit amount", "withdrawal", "withdrawals", "withdrawal amt.", "withdrawal amount",
+              "money out", "paid out", "dr"),
+    "Credit": ("credit", "credit amount", "deposit", "deposits", "deposit amt.", "deposit amount", "money in",
+               "paid in", "cr"),
+    "Transaction Currency": ("currency", "ccy"),
+    "Transaction Category": ("category",),
+    "Bank Name": ("bank", "bank name"),
+    "Account Type": ("account type",),
+}
+
+# Formats considered when no date format is given; see detect_date_format
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%m/%d/%Y", "%d/%m/%y", "%m/%d/%y", "%d %b %Y",
+                "%d-%b-%Y", "%d %b %y", "%d-%b-%y", "%b %d, %Y", "%Y%m%d")
+
+# Rows read ahead to detect the date format of a statement
+DATE_SAMPLE_ROWS = 1000
+
+# OFX account types
+OFX_ACCOUNT_TYPES = {"CHECKING": "Current Account", "SAVINGS": "Savings Account", "MONEYMRKT": "Savings Account",
+                     "CREDITLINE": "Credit Card", "CD": "Savings Account"}
+
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+AMOUNT_NOISE = re.compile(r"[^\d.\-]")
+
+
+class StatementFormatError(ValueError):
+    """Raised when the dates of a statement can't be read with a single date format."""
+
+
+def statement_file_type(file_name):
+    """Returns "ofx" for .ofx/.qfx files and "csv" for everything else."""
+    return "ofx" if file_name.lower().endswith((".ofx", ".qfx")) else "csv"
+
+
+def text_stream(binary_stream, encoding="utf-8-sig"):
+    """Wraps an uploaded/opened binary file for line-by-line decoding without reading it whole."""
+    return io.TextIOWrapper(binary_stream, encoding=encoding, errors="replace", newline="")
+
+
+def guess_column_mapping(headers):
+    """Returns {field: header} for the MAPPABLE_FIELDS recognised in the CSV headers."""
+    by_name = {" ".join(header.lower().split()): header for header in headers if header}
+    mapping = {}
+    for field, aliases in CSV_COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in by_name:
+                mapping[field] = by_name[alias]
+                break
+    return mapping
+
+
+def read_csv_headers(binary_stream):
+    """Reads the header row of a CSV statement and rewinds the stream."""
+    stream = text_stream(binary_stream)
+    try:
+        return next(csv.reader(stream), [])
+    finally:
+        stream.detach()
+        binary_stream.seek(0)
+
+
+def read_csv_rows(stream, mapping=None):
+    """Yields {field: raw value} for every CSV row, using a {field: header} mapping (guessed when None)."""
+    reader = csv.DictReader(stream)
+    mapping = mapping or guess_column_mapping(reader.fieldnames or [])
+    for row in reader:
+        yield {field: row.get(header) for field, header in mapping.items() if header}
+
+
+def _ofx_tokens(stream, chunk_size=65536):
+    """Yields (is_closing, tag, value) for every tag of an OFX file, reading it in chunks."""
+    buffer = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+        # Only scan up to the last complete tag; the rest waits for the next chunk
+        end = len(buffer) if not chunk else buffer.rfind("<")
+        for match in OFX_TAG.finditer(buffer, 0, end):
+            yield match.group(1) == "/", match.group(2).upper(), match.group(3).strip()
+        buffer = buffer[end:]
+        if not chunk:
+            return
+
+
+def read_ofx_rows(stream):
+    """
+    Yields {field: raw value} for every <STMTTRN> of an OFX/QFX statement (SGML 1.x or XML 2.x),
+    with the currency, bank, account type and account id taken from the statement headers. The bank's
+    transaction id (FITID) is yielded as "Transaction Id".
+    """
+    statement = {}
+    transaction = None
+    for closing, tag, value in _ofx_tokens(stream):
+        if tag == "STMTTRN":
+            if closing and transaction is not None:
+                yield {**statement, **transaction}
+            transaction = None if closing else {}
+        elif closing:
+            continue
+        elif transaction is not None:
+            if tag == "DTPOSTED":
+                transaction["Transaction Date"] = value[:8]
+            elif tag == "TRNAMT":
+                transaction["Transaction Amount"] = value
+            elif tag == "NAME" or (tag == "MEMO" and "Transaction Description" not in transaction):
+                transaction["Transaction Description"] = value
+            elif tag == "CURSYM":
+                transaction["Transaction Currency"] = value
+            elif tag == "FITID":
+                transaction["Transaction Id"] = value
+        elif tag == "CURDEF":
+            statement["Transaction Currency"] = value
+        elif tag == "ORG":
+            statement["Bank Name"] = value
+        elif tag == "CCACCTFROM":
+            statement["Account Type"] = "Credit Card"
+        elif tag == "ACCTID":
+            statement["Account Id"] = value
+        elif tag == "ACCTTYPE":
+            statement["Account Type"] = OFX_ACCOUNT_TYPES.get(value.upper(), value.title())
+
+
+def import_dedup_key(record, occurrence, transaction_id=None, account_id=None):
+    """
+    Returns the dedup key of an imported record. Rows with a bank transaction id (OFX FITID, stable across
+    downloads of the same account) are keyed on it. Other rows are keyed on their content (user, date,
+    account, amount, currency and description; not the category, which may be guessed) and `occurrence`,
+    the number of identical rows before it in the file, so two identical coffees on the same day are both
+    kept, and a later statement that repeats them skips both.
+    """
+    if transaction_id:
+        parts = ("fitid", record["user_email"], account_id or "", transaction_id)
+    else:
+        parts = ("row", compute_dedup_key({**record, "Transaction Category": None}), str(occurrence))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def parse_amount(value):
+    """
+    Parses a statement amount such as "1,234.50", "-80", "(80.00)", "80.00 DR" or "₹ 80".
+    Debits ("DR", parentheses, a leading minus) are negative. Returns None for empty or invalid values.
+    """
+    if value is None:
+        return None
+    text = str(value).strip().upper()
+    if not text:
+        return None
+    negative = text.startswith("(") and text.endswith(")") or text.endswith("DR")
+    number = AMOUNT_NOISE.sub("", text.replace(",", ""))
+    try:
+        amount = float(number)
+    except ValueError:
+        return None
+    return -abs(amount) if negative else amount
+
+
+class DateParser:
+    """
+    Parses statement dates with one strptime format, giving "YYYY-MM-DD" or None.
+    Results are memoized, as a statement repeats the same few hundred dates many times.
+    """
+    def __init__(self, date_format):
+        self.date_format = date_format
+        self.parsed = {}
+
+    def parse(self, value):
+        text = (value or "").strip()
+        if text not in self.parsed:
+            self.parsed[text] = self._parse(text)
+        return self.parsed[text]
+
+    def _parse(self, text):
+        try:
+            return datetime.strptime(text, self.date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            return None
+
+
+def detect_date_format(values):
+    """
+    Returns the one format of DATE_FORMATS that reads every one of the (non-empty) sample date values.
+
+    A statement uses a single format throughout, so the format is chosen for the whole file rather
+    than per value. Raises StatementFormatError when no format reads them all, or when several do
+    but read some value differently, e.g. a file whose dates are all like "03/04/2026".
+    """
+    values = {text for text in ((value or "").strip() for value in values) if text}
+    if not values:
+        return DATE_FORMATS[0]
+
+    values = sorted(values)
+    readings = {}
+    unreadable = {}
+    for date_format in DATE_FORMATS:
+        parser = DateParser(date_format)
+        parsed = tuple(parser.parse(value) for value in values)
+        if None in parsed:
+            unreadable[date_format] = [value for value, day in zip(values, parsed) if day is None]
+        else:
+            readings.setdefault(parsed, date_format)
+    if not readings:
+        closest = min(unreadable, key=lambda date_format: len(unreadable[date_format]))
+        raise StatementFormatError(
+            f"No single date format reads every date of the statement; {closest} comes closest but can't read "
+            f"{unreadable[closest][0]!r}; give the date format explicitly")
+    if len(readings) > 1:
+        raise StatementFormatError(
+            f"The statement's dates could be read as any of {', '.join(readings.values())}; "
+            "give the date format explicitly")
+    return next(iter(readings.values()))
+
+
+def to_records(rows, user_email, defaults=None, date_format=None, include_credits=False, stats=None):
+    """
+    Maps raw statement rows to transaction records for insert_records.
+
+    Spending (negative amounts, or the Debit column) is stored as a positive amount. Credits are skipped
+    unless include_credits is set, in which case they are stored with the "Income" category. Rows
+    without a valid date or amount are counted in stats["skipped"]. Without a date_format, the format
+    is detected from the first DATE_SAMPLE_ROWS rows (see detect_date_format).
+
+    Records carry a "dedup_key" from import_dedup_key.
+
+    :param defaults: Values for fields the statement does not have, e.g. {"Bank Name": "HDFC"}.
+    """
+    defaults = defaults or {}
+    stats = stats if stats is not None else {}
+    if date_format is None:
+        rows = iter(rows)
+        sample = list(itertools.islice(rows, DATE_SAMPLE_ROWS))
+        date_format = detect_date_format(row.get("Transaction Date") for row in sample)
+        rows = itertools.chain(sample, rows)
+    dates = DateParser(date_format)
+    created_date = datetime.now().strftime("%Y-%m-%d")
+    occurrences = Counter()
+    for row in rows:
+        stats["rows"] = stats.get("rows", 0) + 1
+        amount = parse_amount(row.get("Transaction Amount"))
+        if amount is None:
+            debit, credit = parse_amount(row.get("Debit")), parse_amount(row.get("Credit"))
+            amount = -abs(debit) if debit else abs(credit) if credit else None
+        txn_date = dates.parse(row.get("Transaction Date"))
+        if amount is None or txn_date is None or (amount > 0 and not include_credits):
+            stats["skipped"] = stats.get("skipped", 0) + 1
+            continue
+
+        description = " ".join((row.get("Transaction Description") or "").split())[:100] or None
+        category = row.get("Transaction Category") or defaults.get("Transaction Category")
+        if not category:
+            category = "Income" if amount > 0 else guess_category(description or "") or "Other"
+        record = {
+            "Transaction Date": txn_date,
+            "Bank Name": row.get("Bank Name") or defaults.get("Bank Name"),
+            "Account Type": row.get("Account Type") or defaults.get("Account Type"),
+            "Transaction Amount": abs(amount),
+            "Transaction Currency": row.get("Transaction Currency") or defaults.get("Transaction Currency"),
+            "Transaction Category": category,
+            "Transaction Description": description,
+            "user_email": user_email,
+            "created_date": created_date,
+        }
+        content_key = None
+        if not row.get("Transaction Id"):
+            content_key = compute_dedup_key({**record, "Transaction Category": None})
+        record["dedup_key"] = import_dedup_key(record, occurrences[content_key], row.get("Transaction Id"),
+                                               row.get("Account Id"))
+        occurrences[content_key] += 1
+        yield record
+
+
+def batched(iterable, size):
+    """Yields lists of up to `size` items from iterable."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_statement(binary_stream, file_type, user_email, mapping=None, defaults=None, date_format=None,
+                     include_credits=False, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """
+    Streams a CSV or OFX statement into the user's transactions, committing every batch separately.
+
+    :param binary_stream: The statement file opened in binary mode (e.g. a Streamlit UploadedFile).
+    :param file_type: "csv" or "ofx", see statement_file_type.
+    :param mapping: {field: CSV header}; guessed from the headers when None. Ignored for OFX.
+    :param defaults: Values for fields missing from the statement (bank, account type, currency, ...).
+    :param date_format: strptime format of the CSV dates; detected when None. OFX dates are always YYYYMMDD.
+    :param include_credits: Also import deposits/refunds, with the "Income" category.
+    :param progress: Called after every batch with the stats dict, including "bytes" read so far.
+    :return: Stats dict with "rows", "inserted", "duplicates" and "skipped" counts.
+    """
+    stats = {"rows": 0, "inserted": 0, "duplicates": 0, "skipped": 0, "bytes": 0}
+    stream = text_stream(binary_stream)
+    if file_type == "ofx":
+        rows = read_ofx_rows(stream)
+        date_format = "%Y%m%d"
+    else:
+        rows = read_csv_rows(stream, mapping)
+
+    records = to_records(rows, user_email, defaults, date_format, include_credits, stats)
+    try:
+        for batch in batched(records, batch_size):
+            inserted, duplicates = run_write(insert_records, batch)
+            stats["inserted"] += inserted
+            stats["duplicates"] += duplicates
+            if progress:
+                try:
+                    stats["bytes"] = binary_stream.tell()
+                except (OSError, ValueError):
+                    pass
+                progress(stats)
+    finally:
+        stream.detach()
+    return stats
@@ -1,52 +1,54 @@
+import asyncio
+import json
 import os
 import re
-import streamlit as st
+import threading
+import time
 from datetime import datetime, timedelta
-#from langchain_core.exceptions import OutputParserException
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_groq import chat_models
-from langchain_core.prompts import PromptTemplate
-#from dotenv import load_dotenv
-
-#load_dotenv()
-groq_key = st.secrets["api_keys"]["GROQ_API_KEY"]
-#os.getenv("GROQ_API_KEY")
-# Initialize ChatGroq LLM
-llm = chat_models.ChatGroq(
-    api_key=groq_key,
-    model_name="llama-3.3-70b-versatile",
-    temperature=0,
-    max_tokens=2048
-)
+from config import get_setting
+from metrics import observe, timed
+from rule_parser import parse_locally
+from parse_cache import get_cached_parse, put_cached_parse
 
+# Sentences the local rule parser handles with at least this confidence skip the LLM
+LOCAL_PARSE_MIN_CONFIDENCE = 0.8
 
-def extract_json(raw_response):
-    try:
-        match = re.search(r'\{.*\}', raw_response, re.DOTALL)
-        if match:
-            return match.group(0)
-        else:
-            raise ValueError("No valid JSON found in the response.")
-    except Exception as e:
-        raise ValueError(f"Error extracting JSON: {str(e)}")
+# Keys added to every parse result to record how it was produced
+PARSE_SOURCE_KEY = "Parse Source"
+PARSE_CONFIDENCE_KEY = "Parse Confidence"
+PARSE_METADATA_KEYS = (PARSE_SOURCE_KEY, PARSE_CONFIDENCE_KEY)
 
+# Descriptions packed into one LLM prompt
+LLM_BATCH_SIZE = 10
+# Batches sent to the LLM at the same time
+LLM_MAX_CONCURRENCY = 4
+# Request budget towards the LLM API, shared by all concurrent batches
+LLM_REQUESTS_PER_MINUTE = 30
 
-def parse_transaction(desc):
-    """
-    Use ChatGroq LLM to parse the financial transaction description and extract details.
-    """
-    current_date = datetime.now()
-    today_date = current_date.strftime("%Y-%m-%d")
+LLM_MODEL_NAME = "llama-3.3-70b-versatile"
+# Idle HTTP connections kept alive towards the LLM API between requests
+LLM_KEEPALIVE_CONNECTIONS = 8
+LLM_KEEPALIVE_SECONDS = 120
+
+# The LLM client, the compiled prompt chain and the event loop that runs LLM requests are created on
+# first use and then shared by every session in the process.
+_llm = None
+_chain_extract = None
+_loop = None
+_semaphore = None
+_limiter = None
+_init_lock = threading.Lock()
 
-    prompt_text = f"""
-    Extract the following details from this transaction description: <<<desc>>>
+BATCH_PROMPT_TEXT = """
+    Extract the following details from each of these numbered transaction descriptions:
+    {descs}
 
-    - Transaction Date: If the description mentions "today", return today's date: {today_date}. 
-        If "yesterday", return today's date minus one: {(current_date - timedelta(days=1)).strftime("%Y-%m-%d")}. 
-        If "last week", return today's date minus seven: {(current_date - timedelta(days=7)).strftime("%Y-%m-%d")}. 
-        If "last month", return today's date minus thirty: {(current_date - timedelta(days=30)).strftime("%Y-%m-%d")}. 
-        If "last year", return today's date minus thirty: {(current_date - timedelta(days=365)).strftime("%Y-%m-%d")}.      
-        If no date is mentioned, return today's date: {today_date}.
+    - Transaction Date: If the description mentions "today", return today's date: {today}. 
+        If "yesterday", return today's date minus one: {yesterday}. 
+        If "last week", return today's date minus seven: {last_week}. 
+        If "last month", return today's date minus thirty: {last_month}. 
+        If "last year", return today's date minus thirty: {last_year}.      
+        If no date is mentioned, return today's date: {today}.
 
     - Bank Name: Extract the bank name, or return null if not mentioned.
     - Account Type: Extract the type of account (e.g., "Savings Account", "Debit Card", "Forex Card", "Cash", 
@@ -60,8 +62,10 @@ def parse_transaction(desc):
     - Transaction desc: Extract the description of the transaction (e.g., "Netflix subscription" or "Petrol") 
         from the sentence. Truncate the text to Keep the length of the text to a maximum of 50 characters.
     
-    Return the details as a JSON object. Ensure that you return only the JSON object without any additional text, 
-    comments, or explanations. The JSON object must have the following keys:
+    Return the details as a JSON array with one JSON object per description, in the same order as the 
+    descriptions. Ensure that you return only the JSON array without any additional text, comments, or 
+    explanations. Each JSON object must have the following keys:
+    - Index (the number of the description)
     - Transaction Date
     - Bank Name
     - Account Type
@@ -70,13 +74,359 @@ def parse_transaction(desc):
     - Transaction Category
     - Transaction Description
     """
-    prompt_extract = PromptTemplate.from_template(prompt_text.replace('<<<desc>>>', '{desc}'))
-    chain_extract = prompt_extract | llm
-    res = chain_extract.invoke(input={"desc": desc})
-    # print(res)
-    #try:
-    raw_json = extract_json(res.content)
-    json_parser = JsonOutputParser()
-    return json_parser.parse(raw_json)
-    #except OutputParserException as e:
-    #    raise OutputParserException(f"Error parsing transaction: {str(e)}")
+
+
+def _create_groq_llm():
+    """ChatGroq client keeping its HTTP connections alive between requests."""
+    import httpx
+    from langchain_groq import chat_models
+
+    limits = httpx.Limits(max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+                          keepalive_expiry=LLM_KEEPALIVE_SECONDS)
+    return chat_models.ChatGroq(
+        api_key=get_setting("GROQ_API_KEY"),
+        model_name=LLM_MODEL_NAME,
+        temperature=0,
+        max_tokens=2048,
+        http_client=httpx.Client(limits=limits),
+        http_async_client=httpx.AsyncClient(limits=limits),
+    )
+
+
+def _create_fake_llm():
+    """Local stand-in answering without any API calls, see fake_llm.py."""
+    from fake_llm import FakeChatModel
+    return FakeChatModel.from_settings()
+
+
+# LLM_BACKEND setting -> function creating the langchain chat model used for parsing
+LLM_BACKENDS = {
+    "groq": _create_groq_llm,
+    "fake": _create_fake_llm,
+}
+DEFAULT_LLM_BACKEND = "groq"
+
+
+def get_llm():
+    """
+    Returns the process-wide chat model, creating it on first use from the LLM_BACKEND setting
+    (one of LLM_BACKENDS, "groq" by default).
+
+    langchain is only imported here, so importing this module stays cheap.
+    """
+    global _llm
+    if _llm is None:
+        with _init_lock:
+            if _llm is None:
+                backend = get_setting("LLM_BACKEND", DEFAULT_LLM_BACKEND)
+                if backend not in LLM_BACKENDS:
+                    raise ValueError(f"Unknown LLM_BACKEND {backend!r}, expected one of {', '.join(LLM_BACKENDS)}.")
+                _llm = LLM_BACKENDS[backend]()
+    return _llm
+
+
+def _get_chain():
+    """Returns the prompt | llm chain, compiled once per process."""
+    global _chain_extract
+    if _chain_extract is None:
+        from langchain_core.prompts import PromptTemplate
+        llm = get_llm()
+        with _init_lock:
+            if _chain_extract is None:
+                _chain_extract = PromptTemplate.from_template(BATCH_PROMPT_TEXT) | llm
+    return _chain_extract
+
+
+def _prompt_dates(current_date=None):
+    """Returns the date variables of the prompt, the only part that changes from call to call."""
+    current_date = current_date or datetime.now()
+    return {
+        "today": current_date.strftime("%Y-%m-%d"),
+        "yesterday": (current_date - timedelta(days=1)).strftime("%Y-%m-%d"),
+        "last_week": (current_date - timedelta(days=7)).strftime("%Y-%m-%d"),
+        "last_month": (current_date - timedelta(days=30)).strftime("%Y-%m-%d"),
+        "last_year": (current_date - timedelta(days=365)).strftime("%Y-%m-%d"),
+    }
+
+
+def _run_on_llm_loop(coro):
+    """
+    Runs a coroutine on the process-wide LLM event loop and waits for its result.
+
+    A single long-lived loop lets the async HTTP client, the concurrency limit and the rate limit be
+    shared by all sessions instead of being rebuilt by asyncio.run() on every call.
+    """
+    global _loop
+    with _init_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+
+def extract_json(raw_response):
+    try:
+        match = re.search(r'\{.*\}', raw_response, re.DOTALL)
+        if match:
+            return match.group(0)
+        else:
+            raise ValueError("No valid JSON found in the response.")
+    except Exception as e:
+        raise ValueError(f"Error extracting JSON: {str(e)}")
+
+
+def extract_json_array(raw_response):
+    match = re.search(r'\[.*\]', raw_response, re.DOTALL)
+    if match:
+        return match.group(0)
+    raise ValueError("No valid JSON array found in the response.")
+
+
+def parse_transaction(desc, stream=False):
+    """
+    Parse the financial transaction description and extract details.
+
+    Simple sentences are handled locally by the rule parser; only those it is not confident about
+    are sent to the LLM, and LLM results are kept in the persistent parse cache for repeated
+    descriptions. The result records the path that produced it under "Parse Source"
+    ("cache", "rules" or "llm") and the rule parser's confidence under "Parse Confidence".
+
+    With stream=True a generator of (key, value) pairs is returned instead, yielding each field as
+    soon as it is complete in the LLM output (see stream_transaction).
+    """
+    if stream:
+        return stream_transaction(desc)
+    started = time.perf_counter()
+    source = "error"
+    try:
+        details = parse_transactions([desc])[0]
+        source = details[PARSE_SOURCE_KEY]
+        return details
+    finally:
+        observe("parse_transaction_seconds", time.perf_counter() - started, source=source)
+
+
+class IncrementalJsonObjectParser:
+    """
+    Parses the first JSON object of a text arriving in chunks and returns its members as they complete.
+
+    Text before the opening brace (a preamble or the "[" of an array) is skipped. A member is complete
+    once the comma after it, or the closing brace of the object, has arrived.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member = []
+
+    def feed(self, chunk):
+        """Consumes a chunk of text and returns the list of (key, value) members completed by it."""
+        completed = []
+        for ch in chunk:
+            if self.done:
+                break
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self._depth = 1
+                continue
+            if self._in_string:
+                self._member.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.extend(self._complete_member())
+                    self.done = True
+                    continue
+            elif ch == "," and self._depth == 1:
+                completed.extend(self._complete_member())
+                continue
+            self._member.append(ch)
+        return completed
+
+    def _complete_member(self):
+        member = "".join(self._member).strip()
+        self._member = []
+        if not member:
+            return []
+        return list(json.loads("{" + member + "}").items())
+
+
+def stream_transaction(desc):
+    """
+    Parse the financial transaction description, yielding (key, value) pairs as fields complete.
+
+    Cache and rule-parser hits yield every field at once. Otherwise the LLM output is streamed and
+    each field is yielded as soon as its JSON member is complete. The "Parse Source" and
+    "Parse Confidence" keys are yielded last.
+
+    The recorded timings leave out the time the caller spends between fields.
+    """
+    started = time.perf_counter()
+    cached = get_cached_parse(desc)
+    if cached is not None:
+        observe("parse_transaction_seconds", time.perf_counter() - started, source="cache")
+        yield from {**cached, PARSE_SOURCE_KEY: "cache", PARSE_CONFIDENCE_KEY: None}.items()
+        return
+
+    details, confidence = parse_locally(desc)
+    if confidence >= LOCAL_PARSE_MIN_CONFIDENCE:
+        observe("parse_transaction_seconds", time.perf_counter() - started, source="rules")
+        yield from {**details, PARSE_SOURCE_KEY: "rules", PARSE_CONFIDENCE_KEY: confidence}.items()
+        return
+
+    # Time spent waiting for chunks and parsing them, excluding the caller's time between yields
+    llm_seconds = parse_seconds = 0.0
+    local_seconds = time.perf_counter() - started
+    parser = IncrementalJsonObjectParser()
+    details = {}
+    chunks = iter(_get_chain().stream(input={"descs": f"1. {desc}", **_prompt_dates()}))
+    try:
+        while not parser.done:
+            waited = time.perf_counter()
+            chunk = next(chunks, None)
+            parsing = time.perf_counter()
+            llm_seconds += parsing - waited
+            if chunk is None:
+                break
+            members = parser.feed(chunk.content)
+            parse_seconds += time.perf_counter() - parsing
+            for key, value in members:
+                if key == "Index":
+                    continue
+                details[key] = value
+                yield key, value
+    finally:
+        # Ends the LLM request when the object is complete before the stream is, on errors, and when
+        # the caller stops iterating early
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+    observe("parse_stage_seconds", llm_seconds, stage="llm", mode="stream")
+    observe("parse_stage_seconds", parse_seconds, stage="parse_json", mode="stream")
+    if not parser.done:
+        observe("parse_transaction_seconds", local_seconds + llm_seconds + parse_seconds, source="error")
+        raise ValueError("Error extracting JSON: the LLM response ended before the JSON object was complete.")
+
+    put_cached_parse(desc, details, llm_seconds + parse_seconds)
+    observe("parse_transaction_seconds", local_seconds + llm_seconds + parse_seconds, source="llm")
+    yield PARSE_SOURCE_KEY, "llm"
+    yield PARSE_CONFIDENCE_KEY, None
+
+
+def parse_transactions(descs, batch_size=LLM_BATCH_SIZE, return_exceptions=False):
+    """
+    Parse many transaction descriptions at once.
+
+    Each description is served from the parse cache or the rule parser when possible. The rest are
+    packed `batch_size` at a time into a single LLM prompt, and the batches are sent concurrently
+    (at most LLM_MAX_CONCURRENCY in flight, LLM_REQUESTS_PER_MINUTE overall).
+
+    :param descs: List of transaction descriptions.
+    :param return_exceptions: If True, a description whose batch failed gets the exception in its
+        result slot instead of the exception being raised.
+    :return: List of parsed details, in the order of `descs`.
+    """
+    results = [None] * len(descs)
+    pending = []
+    for i, desc in enumerate(descs):
+        cached = get_cached_parse(desc)
+        if cached is not None:
+            results[i] = {**cached, PARSE_SOURCE_KEY: "cache", PARSE_CONFIDENCE_KEY: None}
+            continue
+        details, confidence = parse_locally(desc)
+        if confidence >= LOCAL_PARSE_MIN_CONFIDENCE:
+            results[i] = {**details, PARSE_SOURCE_KEY: "rules", PARSE_CONFIDENCE_KEY: confidence}
+            continue
+        pending.append(i)
+
+    if pending:
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        batch_results = _run_on_llm_loop(_parse_batches([[descs[i] for i in batch] for batch in batches]))
+        for batch, (outcome, seconds) in zip(batches, batch_results):
+            if isinstance(outcome, Exception):
+                if not return_exceptions:
+                    raise outcome
+                for i in batch:
+                    results[i] = outcome
+                continue
+            for i, details in zip(batch, outcome):
+                put_cached_parse(descs[i], details, seconds / len(batch))
+                results[i] = {**details, PARSE_SOURCE_KEY: "llm", PARSE_CONFIDENCE_KEY: None}
+    return results
+
+
+class _RateLimiter:
+    """Spaces out LLM requests so that at most `per_minute` start in any minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+
+async def _parse_batches(batches):
+    """Runs the batches concurrently and returns a (details list or exception, seconds) pair per batch."""
+    global _semaphore, _limiter
+    # Created on the LLM loop itself and shared by every call, so the limits hold process-wide
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _limiter = _RateLimiter(LLM_REQUESTS_PER_MINUTE)
+    dates = _prompt_dates()
+
+    async def run(batch):
+        async with _semaphore:
+            await _limiter.wait()
+            started = time.perf_counter()
+            try:
+                return await _parse_batch_with_llm(batch, dates), time.perf_counter() - started
+            except Exception as e:
+                return e, time.perf_counter() - started
+
+    return await asyncio.gather(*(run(batch) for batch in batches))
+
+
+async def _parse_batch_with_llm(batch, dates):
+    """
+    Use ChatGroq LLM to parse a batch of financial transaction descriptions in one request.
+    """
+    from langchain_core.output_parsers import JsonOutputParser
+
+    numbered = "\n".join(f"{n}. {desc}" for n, desc in enumerate(batch, start=1))
+    with timed("parse_stage_seconds", stage="llm", mode="batch"):
+        res = await _get_chain().ainvoke(input={"descs": numbered, **dates})
+    with timed("parse_stage_seconds", stage="extract_json", mode="batch"):
+        extracted = extract_json_array(res.content)
+    with timed("parse_stage_seconds", stage="parse_json", mode="batch"):
+        parsed = JsonOutputParser().parse(extracted)
+
+    # Match objects to descriptions by their Index, falling back to position
+    by_index = {item.get("Index"): item for item in parsed if isinstance(item, dict)}
+    details = []
+    for n in range(1, len(batch) + 1):
+        item = by_index.get(n) or by_index.get(str(n)) or (parsed[n - 1] if n - 1 < len(parsed) else None)
+        if not isinstance(item, dict):
+            raise ValueError(f"The LLM returned no details for description {n} of the batch.")
+        details.append({key: value for key, value in item.items() if key != "Index"})
+    return details
@@ -1,4 +1,5 @@
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 
 def display_user_info():
     """Display user information if logged in."""
@@ -14,4 +15,15 @@ def display_user_info():
             <div style="text-align: right;">
                 <p>Welcome, {capitalized_name}!</p>
             </div>
-            """, unsafe_allow_html=True)
\ No newline at end of file
+            """, unsafe_allow_html=True)
+
+
+def rerun_fragment():
+    """
+    Rerun only the enclosing st.fragment when called during a fragment rerun, otherwise the whole app
+    (Streamlit does not allow a fragment-scoped rerun while the full app is running).
+    """
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
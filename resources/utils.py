@@ -1,14 +1,15 @@
-import sqlite3
 import pandas as pd
 #from dotenv import load_dotenv
 import os
-import streamlit as st
+from config import get_setting
+from db_pool import get_connection
+from db_operations import records_to_frame, transaction_col_names, db_txn_view_name
 
 #load_dotenv()
 #db_file_name = os.getenv("DATABSE_FILE_NAME")
 #db_txn_table_name = os.getenv("DB_TRANSACTION_TABLE_NAME")
-db_file_name = st.secrets["api_keys"]["DATABASE_FILE_NAME"]
-db_txn_table_name = st.secrets["api_keys"]["DB_TRANSACTION_TABLE_NAME"]
+db_file_name = get_setting("DATABASE_FILE_NAME")
+db_txn_table_name = get_setting("DB_TRANSACTION_TABLE_NAME")
 
 def fetch_transactions(db_path: str) -> pd.DataFrame:
     """
@@ -18,18 +19,17 @@ def fetch_transactions(db_path: str) -> pd.DataFrame:
         db_path (str): Path to the SQLite database file.
 
     Returns:
-        pd.DataFrame: A DataFrame containing all transactions.
+        pd.DataFrame: A DataFrame containing all transactions, with typed columns.
     """
-    # Connect to the database
-    conn = sqlite3.connect(db_path)
-
     try:
-        # Fetch data from the transactions table
-        query = f"SELECT * FROM {db_txn_table_name};"
-        df = pd.read_sql_query(query, conn)
+        # Fetch data from the transactions table using a pooled connection
+        with get_connection(db_path) as conn:
+            # The view decodes the compact storage (day numbers, minor units, lookup ids) to the original columns
+            query = f"SELECT {', '.join(transaction_col_names)} FROM {db_txn_view_name};"
+            cursor = conn.execute(query)
+            # Build typed columns (float amounts, datetime dates, categoricals) straight from the rows
+            df = records_to_frame(cursor.fetchall(), transaction_col_names)
     except Exception as e:
         raise RuntimeError(f"Error fetching data: {e}")
-    finally:
-        conn.close()
 
     return df
@@ -0,0 +1,63 @@
+import importlib
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app modules live in resources/ and are imported as top-level modules, as when running from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources"))
+
+import config  # noqa: E402
+
+# Modules read their settings when they are imported, so these are set before any test imports them
+config.configure(
+    DATABASE_FILE_NAME=os.path.join(tempfile.mkdtemp(), "finance_tracker.db"),
+    DB_TRANSACTION_TABLE_NAME="transactions",
+    DB_USER_TABLE_NAME="users",
+    BCRYPT_ROUNDS="4",
+    SESSION_SECRET="test-session-secret",
+    SLOW_QUERY_THRESHOLD_MS="off",
+)
+
+# Modules holding their own copy of DATABASE_FILE_NAME
+DB_FILE_MODULES = ("db_operations", "accounts", "parse_cache", "utils", "write_queue")
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Points every module at a fresh, fully migrated database file and returns its path."""
+    db_path = str(tmp_path / "finance_tracker.db")
+    for name in DB_FILE_MODULES:
+        monkeypatch.setattr(importlib.import_module(name), "db_file_name", db_path)
+    parse_cache = importlib.import_module("parse_cache")
+    monkeypatch.setattr(parse_cache, "_table_ready", False)
+    monkeypatch.setattr(parse_cache, "_touches", {})
+    monkeypatch.setattr(parse_cache, "_touch_hits", 0)
+    importlib.import_module("query_cache")._cache.clear()
+    # The process-wide writer is started on first use with the database file of that moment
+    write_queue = importlib.import_module("write_queue")
+    monkeypatch.setattr(write_queue, "_writer", None)
+
+    db_operations = importlib.import_module("db_operations")
+    db_operations.create_table()
+    yield db_path
+    if write_queue._writer is not None:
+        write_queue._writer.stop()
+
+
+def make_record(**fields):
+    """Returns a transaction record dict as insert_record expects, with `fields` overriding the defaults."""
+    record = {
+        "Transaction Date": "2026-10-01",
+        "Bank Name": "HDFC",
+        "Account Type": "Savings Account",
+        "Transaction Amount": 250.0,
+        "Transaction Currency": "INR",
+        "Transaction Category": "Food",
+        "Transaction Description": "Lunch",
+        "user_email": "someone@example.com",
+        "created_date": "2026-10-01",
+    }
+    record.update(fields)
+    return record
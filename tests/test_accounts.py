@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import accounts
+
+EMAIL = "someone@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+@pytest.fixture
+def user(db):
+    accounts.create_user("Someone", EMAIL, PASSWORD)
+    return EMAIL
+
+
+def test_authenticate(user):
+    assert accounts.authenticate(EMAIL, PASSWORD) == (accounts.LOGIN_OK, "Someone")
+    assert accounts.authenticate(EMAIL, "wrong")[0] == accounts.LOGIN_WRONG_PASSWORD
+    assert accounts.authenticate("nobody@example.com", PASSWORD)[0] == accounts.LOGIN_UNKNOWN_USER
+
+
+def test_session_token_round_trip(user):
+    token = accounts.create_session(EMAIL)
+    assert accounts.validate_session(token) == (EMAIL, "Someone")
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda token: token[:-2] + ("AA" if not token.endswith("AA") else "BB"),  # Signature
+    lambda token: ".".join((token.split(".")[0], str(int(token.split(".")[1]) + 86400), token.split(".")[2])),
+    lambda token: "not-a-token",
+    lambda token: None,
+])
+def test_tampered_tokens_are_rejected(user, tamper):
+    assert accounts.validate_session(tamper(accounts.create_session(EMAIL))) is None
+
+
+def test_signature_is_keyed_with_the_secret(user, monkeypatch):
+    token = accounts.create_session(EMAIL)
+    monkeypatch.setattr(accounts, "_session_secret", b"another secret")
+    assert accounts.validate_session(token) is None
+
+
+def test_revoked_and_expired_tokens_are_rejected(user, monkeypatch):
+    token = accounts.create_session(EMAIL)
+    accounts.revoke_session(token)
+    assert accounts.validate_session(token) is None
+
+    monkeypatch.setattr(accounts, "session_ttl_seconds", 1)
+    token = accounts.create_session(EMAIL)
+    monkeypatch.setattr(time, "time", lambda: int(token.split(".")[1]))
+    assert accounts.validate_session(token) is None
+
+
+@pytest.mark.parametrize("secret", [None, " "])
+def test_accounts_require_a_session_secret(tmp_path, secret):
+    env = {name: value for name, value in os.environ.items()
+           if name not in ("SESSION_SECRET", "FINANCE_TRACKER_CONFIG")}
+    env.update(DATABASE_FILE_NAME=str(tmp_path / "finance_tracker.db"), DB_TRANSACTION_TABLE_NAME="transactions",
+               DB_USER_TABLE_NAME="users")
+    if secret is not None:
+        env["SESSION_SECRET"] = secret
+    result = subprocess.run([sys.executable, "-c", "import accounts"], cwd=os.path.dirname(accounts.__file__),
+                            env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "Setting SESSION_SECRET is" in result.stderr
+
+
+def test_session_cookie_is_always_secure_and_strict():
+    auth = pytest.importorskip("auth")
+    assert auth.session_cookie_attributes(60) == "path=/; max-age=60; Secure; SameSite=Strict"
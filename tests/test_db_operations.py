@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+import db_operations
+from conftest import make_record
+from db_operations import InvalidRecordError
+from db_pool import get_connection
+
+USER = "someone@example.com"
+
+
+def stored(columns=("transaction_date", "transaction_amount")):
+    return db_operations.fetch_transactions_range(USER, columns=columns, order="asc")
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2026-10-19", "2026-10-19"),
+    ("2026-10-19 08:30:00", "2026-10-19"),
+    ("19/10/2026", "2026-10-19"),
+    ("19-10-2026", "2026-10-19"),
+    ("19 Oct 2026", "2026-10-19"),
+    ("October 19, 2026", "2026-10-19"),
+])
+def test_insert_record_normalizes_dates(db, value, expected):
+    db_operations.insert_record(make_record(**{"Transaction Date": value}))
+    assert stored(("transaction_date",)) == [(expected,)]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1,200", 1200.0),
+    ("Rs 1,00,000.50", 100000.5),
+    ("₹ 45", 45.0),
+    (" 99.99 ", 99.99),
+    (7, 7.0),
+])
+def test_insert_record_normalizes_amounts(db, value, expected):
+    db_operations.insert_record(make_record(**{"Transaction Amount": value}))
+    assert stored(("transaction_amount",)) == [(expected,)]
+
+
+@pytest.mark.parametrize("field, value", [
+    ("Transaction Date", None),
+    ("Transaction Date", ""),
+    ("Transaction Date", "2024-13-45"),
+    ("Transaction Date", "10/19/2026"),
+    ("Transaction Date", "yesterday"),
+    ("Transaction Amount", None),
+    ("Transaction Amount", ""),
+    ("Transaction Amount", "1.200,50"),
+    ("Transaction Amount", "12,0"),
+    ("Transaction Amount", "nan"),
+    ("Transaction Amount", "a lot"),
+])
+def test_insert_record_rejects_unreadable_values(db, field, value):
+    with pytest.raises(InvalidRecordError) as error:
+        db_operations.insert_record(make_record(**{field: value}))
+    assert error.value.field == field
+    assert db_operations.count_transactions(USER) == 0
+
+
+def test_insert_record_defaults_missing_created_date(db):
+    db_operations.insert_record(make_record(created_date=None))
+    assert stored(("created_date",))[0][0] is not None
+
+
+def test_insert_records_validates_the_whole_batch_first(db):
+    records = [make_record(**{"Transaction Description": f"Lunch {n}"}) for n in range(3)]
+    records.append(make_record(**{"Transaction Amount": "1,2,3"}))
+    with pytest.raises(InvalidRecordError):
+        db_operations.insert_records(records)
+    assert db_operations.count_transactions(USER) == 0
+
+
+
+def test_rolled_back_lookup_rows_are_not_cached(db):
+    new_bank = {"Bank Name": "NewBank", "Account Type": "Wallet", "Transaction Currency": "JPY",
+                "Transaction Category": "Parking"}
+    with pytest.raises(RuntimeError):
+        with get_connection(db_operations.db_file_name):
+            db_operations.insert_records([make_record(**new_bank, **{"Transaction Description": desc})
+                                          for desc in ("a", "b")])
+            raise RuntimeError("rolled back")
+    assert db_operations.count_transactions(USER) == 0
+
+    db_operations.insert_record(make_record(**new_bank, **{"Transaction Description": "c"}))
+    assert stored(("bank_name", "account_type", "transaction_currency", "transaction_category",
+                   "transaction_desc")) == [("NewBank", "Wallet", "JPY", "Parking", "c")]
+
+
+def test_frames_match_the_decoded_rows(db):
+    db_operations.insert_records([
+        make_record(),
+        make_record(**{"Bank Name": None, "Account Type": None, "Transaction Category": None,
+                       "Transaction Description": None, "created_date": "2026-10-02"}),
+        make_record(**{"Transaction Amount": 1.235, "Transaction Currency": "KWD", "Bank Name": "Axis"}),
+    ])
+    columns = db_operations.transaction_col_names
+    pd.testing.assert_frame_equal(db_operations.fetch_transactions_frame(USER, columns=columns),
+                                  db_operations.records_to_frame(stored(columns)[::-1], columns))
+    page, _ = db_operations.fetch_transactions_page(USER, page_size=2, as_frame=True)
+    assert page["transaction_amount"].tolist() == [1.235, 250.0]
+
+    empty = db_operations.fetch_transactions_frame(USER, "2020-01-01", "2020-01-31", columns=columns)
+    pd.testing.assert_frame_equal(empty, db_operations.records_to_frame([], columns))
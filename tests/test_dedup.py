@@ -0,0 +1,53 @@
+import db_operations
+from conftest import make_record
+from db_pool import get_connection
+
+USER = "someone@example.com"
+
+
+def test_key_ignores_case_whitespace_and_amount_format():
+    record = make_record()
+    same = make_record(**{"Bank Name": " hdfc ", "Transaction Description": "LUNCH", "Transaction Amount": "250"})
+    assert db_operations.compute_dedup_key(record) == db_operations.compute_dedup_key(same)
+
+
+def test_key_keeps_three_decimal_amounts_apart():
+    first = make_record(**{"Transaction Amount": 1.234, "Transaction Currency": "KWD"})
+    second = make_record(**{"Transaction Amount": 1.235, "Transaction Currency": "KWD"})
+    assert db_operations.compute_dedup_key(first) != db_operations.compute_dedup_key(second)
+
+
+def test_key_depends_on_currency():
+    assert (db_operations.compute_dedup_key(make_record(**{"Transaction Currency": "INR"}))
+            != db_operations.compute_dedup_key(make_record(**{"Transaction Currency": "USD"})))
+
+
+def test_insert_record_rejects_a_repeat(db):
+    assert db_operations.insert_record(make_record()) == "Transaction details saved successfully!"
+    assert "Duplicate record" in db_operations.insert_record(make_record(**{"Bank Name": "hdfc"}))
+    assert db_operations.count_transactions(USER) == 1
+
+
+def test_insert_records_skips_existing_and_repeated_records(db):
+    db_operations.insert_record(make_record())
+    batch = [
+        make_record(),
+        make_record(**{"Transaction Amount": 1.234, "Transaction Currency": "KWD"}),
+        make_record(**{"Transaction Amount": 1.235, "Transaction Currency": "KWD"}),
+        make_record(**{"Transaction Amount": "1.235", "Transaction Currency": "kwd"}),
+    ]
+    assert db_operations.insert_records(batch) == (2, 2)
+    assert db_operations.count_transactions(USER) == 3
+
+
+def test_migration_recomputes_stored_keys(db):
+    records = [make_record(), make_record(**{"Transaction Amount": 1.234, "Transaction Currency": "KWD"})]
+    db_operations.insert_records(records)
+    with get_connection(db) as conn:
+        conn.execute(f"UPDATE {db_operations.db_txn_table_name} SET dedup_key = 'old-' || id")
+        db_operations._migration_dedup_key_minor_units(conn.cursor())
+        keys = [key for (key,) in conn.execute(
+            f"SELECT dedup_key FROM {db_operations.db_txn_table_name} ORDER BY id")]
+
+    assert keys == [db_operations.compute_dedup_key(db_operations.normalize_record(r)) for r in records]
+    assert db_operations.insert_records(records) == (0, 2)
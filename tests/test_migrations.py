@@ -0,0 +1,140 @@
+import sqlite3
+
+import pytest
+
+import db_operations
+from db_pool import get_connection
+from migrations import MigrationError, applied_migrations, current_version, run_migrations
+
+USER = "someone@example.com"
+
+
+@pytest.fixture
+def legacy_db(db, monkeypatch, tmp_path):
+    """A database left at migration 1, the text-date / REAL-amount schema of older versions."""
+    db_path = str(tmp_path / "legacy.db")
+    monkeypatch.setattr(db_operations, "db_file_name", db_path)
+    with get_connection(db_path) as conn:
+        run_migrations(conn, db_operations.schema_migrations[:1])
+    return db_path
+
+
+def insert_legacy_rows(db_path, rows):
+    with get_connection(db_path) as conn:
+        conn.executemany(f"""INSERT INTO {db_operations.db_txn_table_name}
+            (transaction_date, bank_name, account_type, transaction_amount, transaction_currency,
+             transaction_category, transaction_desc, user_email, created_date)
+            VALUES (?, 'HDFC', 'Savings Account', ?, ?, 'Food', ?, ?, ?)
+        """, [(day, amount, currency, desc, USER, created) for day, amount, currency, desc, created in rows])
+
+
+def create_notes(cursor):
+    cursor.execute("CREATE TABLE IF NOT EXISTS notes (body TEXT)")
+
+
+def add_note(cursor):
+    cursor.execute("INSERT INTO notes VALUES ('added')")
+
+
+def fail_after_writing(cursor):
+    cursor.execute("INSERT INTO notes VALUES ('partial')")
+    raise RuntimeError("migration failed")
+
+
+def test_runner_applies_pending_migrations_once(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "runner.db"))
+    migrations = [(2, "add_note", add_note), (1, "create_notes", create_notes)]
+    assert current_version(conn) == 0
+    assert run_migrations(conn, migrations) == [(1, "create_notes"), (2, "add_note")]
+    assert run_migrations(conn, migrations) == []
+    assert [row[:2] for row in applied_migrations(conn)] == [(1, "create_notes"), (2, "add_note")]
+    assert conn.execute("SELECT body FROM notes").fetchall() == [("added",)]
+    conn.close()
+
+
+def test_runner_rolls_back_a_failing_migration(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "runner.db"))
+    migrations = [(1, "create_notes", create_notes), (2, "fail_after_writing", fail_after_writing),
+                  (3, "add_note", add_note)]
+    with pytest.raises(RuntimeError, match="migration failed"):
+        run_migrations(conn, migrations)
+
+    # The earlier migration stays applied; the failing one left nothing behind and the later one didn't run
+    assert current_version(conn) == 1
+    assert conn.execute("SELECT count(*) FROM notes").fetchone()[0] == 0
+    assert run_migrations(conn, [migrations[0], migrations[2]]) == [(3, "add_note")]
+    conn.close()
+
+
+def test_all_migrations_apply_to_a_new_database(db):
+    with get_connection(db) as conn:
+        assert current_version(conn) == db_operations.schema_migrations[-1][0]
+    assert db_operations.create_table() == []
+
+
+def test_compact_storage_converts_legacy_rows_like_insert_record(legacy_db):
+    insert_legacy_rows(legacy_db, [
+        ("2026-10-19", 250.5, "INR", "ISO date", "2026-10-19"),
+        ("19/10/2026", "1,200", "INR", "Day-first date, grouped amount", "2026-10-19 10:00:00"),
+        ("2026-10-20", 1.235, "KWD", "Three-decimal currency", None),
+    ])
+    db_operations.create_table()
+
+    rows = db_operations.fetch_transactions_range(
+        USER, columns=("transaction_date", "transaction_amount", "transaction_currency", "transaction_desc",
+                       "created_date"), order="asc")
+    assert rows == [
+        ("2026-10-19", 250.5, "INR", "ISO date", "2026-10-19"),
+        ("2026-10-19", 1200.0, "INR", "Day-first date, grouped amount", "2026-10-19"),
+        ("2026-10-20", 1.235, "KWD", "Three-decimal currency", None),
+    ]
+    assert db_operations.fetch_categories(USER) == ["Food"]
+
+
+def test_compact_storage_stops_on_unreadable_rows(legacy_db):
+    insert_legacy_rows(legacy_db, [
+        ("2026-10-19", 100, "INR", "Fine", "2026-10-19"),
+        ("someday", 100, "INR", "Bad date", "2026-10-19"),
+        ("2026-10-19", "1.200,50", "INR", "Bad amount", "2026-10-19"),
+        (None, 100, "INR", "No date", "2026-10-19"),
+    ])
+    with pytest.raises(MigrationError) as error:
+        db_operations.create_table()
+
+    report = str(error.value)
+    assert "Can't convert 3 rows" in report
+    assert "id 2: Invalid Transaction Date: 'someday'" in report
+    assert "id 3: Invalid Transaction Amount: '1.200,50'" in report
+    assert "id 4: Invalid Transaction Date: None" in report
+
+    # Rolled back: still the legacy schema with every row as it was
+    conn = sqlite3.connect(legacy_db)
+    assert current_version(conn) == 1
+    assert conn.execute(f"SELECT transaction_date, transaction_amount FROM {db_operations.db_txn_table_name}"
+                        " ORDER BY id").fetchall() == [
+        ("2026-10-19", 100), ("someday", 100), ("2026-10-19", "1.200,50"), (None, 100)]
+    conn.close()
+
+
+def test_compact_storage_report_is_capped(legacy_db):
+    insert_legacy_rows(legacy_db, [("n/a", 1, "INR", f"Row {n}", None) for n in range(25)])
+    with pytest.raises(MigrationError) as error:
+        db_operations.create_table()
+    report = str(error.value).splitlines()
+    assert len(report) == 1 + db_operations.MIGRATION_REPORT_MAX_ROWS + 1
+    assert report[-1] == "  ... and 5 more"
+
+
+def test_app_reports_unreadable_rows_instead_of_crashing(legacy_db):
+    AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+    insert_legacy_rows(legacy_db, [("someday", 100, "INR", "Bad date", "2026-10-19")])
+
+    def app():
+        import app
+        app.main()
+
+    at = AppTest.from_function(app)
+    at.run(timeout=10)
+    assert not at.exception
+    assert at.error[0].value.startswith("The database could not be upgraded")
+    assert "id 1: Invalid Transaction Date: 'someday'" in at.code[0].value
@@ -0,0 +1,54 @@
+import db_operations
+from conftest import make_record
+
+USER = "someone@example.com"
+
+
+def insert_days(*days):
+    """Inserts one record per entry of `days`, described by its position, e.g. "Txn 3"."""
+    db_operations.insert_records([make_record(**{"Transaction Date": day, "Transaction Description": f"Txn {n}"})
+                                  for n, day in enumerate(days)])
+
+
+def all_pages(page_size, start_date=None, end_date=None):
+    pages, cursor = [], None
+    while True:
+        page, cursor = db_operations.fetch_transactions_page(USER, start_date, end_date,
+                                                             columns=("transaction_desc",), page_size=page_size,
+                                                             after=cursor)
+        pages.append([desc for (desc,) in page])
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_row_once_newest_first(db):
+    # Several rows share a day, so page boundaries fall between rows of the same day
+    insert_days("2026-10-01", "2026-10-03", "2026-10-03", "2026-10-02", "2026-10-03", "2026-10-01", "2026-10-02")
+    assert all_pages(3) == [["Txn 4", "Txn 2", "Txn 1"], ["Txn 6", "Txn 3", "Txn 5"], ["Txn 0"]]
+    assert all_pages(7) == [["Txn 4", "Txn 2", "Txn 1", "Txn 6", "Txn 3", "Txn 5", "Txn 0"]]
+
+
+def test_last_full_page_has_no_next_cursor(db):
+    insert_days("2026-10-01", "2026-10-02", "2026-10-03", "2026-10-04")
+    assert all_pages(2) == [["Txn 3", "Txn 2"], ["Txn 1", "Txn 0"]]
+    assert db_operations.fetch_transactions_page(USER, page_size=10)[1] is None
+
+
+def test_pages_respect_the_date_range(db):
+    insert_days("2026-09-30", "2026-10-01", "2026-10-15", "2026-10-31", "2026-11-01")
+    assert all_pages(2, "2026-10-01", "2026-10-31") == [["Txn 3", "Txn 2"], ["Txn 1"]]
+
+
+def test_cursor_is_unaffected_by_newer_rows(db):
+    insert_days("2026-10-01", "2026-10-02", "2026-10-03", "2026-10-04")
+    _, cursor = db_operations.fetch_transactions_page(USER, columns=("transaction_desc",), page_size=2)
+    insert_days("2026-10-05", "2026-10-06")
+    page, _ = db_operations.fetch_transactions_page(USER, columns=("transaction_desc",), page_size=2, after=cursor)
+    assert page == [("Txn 1",), ("Txn 0",)]
+
+
+def test_page_as_frame(db):
+    insert_days("2026-10-01", "2026-10-02")
+    frame, cursor = db_operations.fetch_transactions_page(USER, page_size=5, as_frame=True)
+    assert list(frame.columns) == list(db_operations.selected_col_names)
+    assert len(frame) == 2 and cursor is None
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import parse_cache
+from db_pool import get_connection
+
+TODAY = datetime(2026, 10, 18, 9, 30)
+RESULT = {"Transaction Date": "2026-10-18", "Transaction Amount": 800.0, "Transaction Description": "Diesel"}
+
+
+def stored_usage(desc):
+    with get_connection(parse_cache.db_file_name) as conn:
+        return conn.execute(f"SELECT last_used_at, hit_count FROM {parse_cache.cache_table_name}"
+                            " WHERE cache_key = ?",
+                            (parse_cache._cache_key(parse_cache.normalize_desc(desc)),)).fetchone()
+
+
+def test_hit_resolves_relative_dates_against_today(db):
+    parse_cache.put_cached_parse("Spent Rs 800 on Diesel today", RESULT, 1.5, TODAY)
+    cached = parse_cache.get_cached_parse("spent rs 800 on  diesel today", datetime(2026, 10, 20))
+    assert cached == {**RESULT, "Transaction Date": "2026-10-20"}
+    assert parse_cache.get_cached_parse("Spent Rs 900 on Diesel today", TODAY) is None
+
+
+def test_hits_are_written_in_batches(db):
+    parse_cache.put_cached_parse("Spent Rs 800 on Diesel today", RESULT, 1.5, TODAY)
+    created_at, _ = stored_usage("Spent Rs 800 on Diesel today")
+    for _ in range(3):
+        assert parse_cache.get_cached_parse("Spent Rs 800 on Diesel today", TODAY)
+    assert stored_usage("Spent Rs 800 on Diesel today") == (created_at, 0)
+
+    assert parse_cache.flush_touches() == 1
+    last_used_at, hit_count = stored_usage("Spent Rs 800 on Diesel today")
+    assert last_used_at >= created_at and hit_count == 3
+    assert parse_cache.flush_touches() == 0
+
+
+def test_touches_are_flushed_every_n_hits(db, monkeypatch):
+    monkeypatch.setattr(parse_cache, "FLUSH_TOUCHES_EVERY_N_HITS", 2)
+    parse_cache.put_cached_parse("Spent Rs 800 on Diesel today", RESULT, 1.5, TODAY)
+    parse_cache.get_cached_parse("Spent Rs 800 on Diesel today", TODAY)
+    assert stored_usage("Spent Rs 800 on Diesel today")[1] == 0
+    parse_cache.get_cached_parse("Spent Rs 800 on Diesel today", TODAY)
+    assert stored_usage("Spent Rs 800 on Diesel today")[1] == 2
+
+
+def test_eviction_sees_pending_hits(db, monkeypatch):
+    monkeypatch.setattr(parse_cache, "PARSE_CACHE_MAX_ENTRIES", 1)
+    parse_cache.put_cached_parse("Spent Rs 800 on Diesel today", RESULT, 1.5, TODAY)
+    parse_cache.put_cached_parse("Spent Rs 900 on Diesel today", RESULT, 1.5, TODAY)
+    # The older entry was used last, so the newer one is evicted
+    parse_cache.get_cached_parse("Spent Rs 800 on Diesel today", TODAY)
+    assert parse_cache.evict() == 1
+    assert parse_cache.get_cached_parse("Spent Rs 800 on Diesel today", TODAY)
+    assert parse_cache.get_cached_parse("Spent Rs 900 on Diesel today", TODAY) is None
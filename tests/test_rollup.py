@@ -0,0 +1,60 @@
+import db_operations
+from conftest import make_record
+from db_pool import get_connection
+
+USER = "someone@example.com"
+
+
+def rollup_rows():
+    with get_connection(db_operations.db_file_name) as conn:
+        return conn.execute(f"SELECT * FROM {db_operations.db_rollup_table_name} ORDER BY 1, 2, 3, 4").fetchall()
+
+
+def spend(day, amount, category="Food", desc=None):
+    return make_record(**{"Transaction Date": day, "Transaction Amount": amount, "Transaction Category": category,
+                          "Transaction Description": desc or f"{category} {amount} {day}"})
+
+
+def test_inserts_are_rolled_up_with_exact_totals(db):
+    db_operations.insert_records([spend("2026-10-01", 0.1), spend("2026-10-15", 0.2), spend("2026-10-20", 40, "Fuel"),
+                                  spend("2026-09-30", 5)])
+    assert db_operations.fetch_monthly_category_summary(USER, "2026-10") == [
+        ("Fuel", "INR", 40.0, 1, 40.0, 40.0),
+        ("Food", "INR", 0.3, 2, 0.1, 0.2),
+    ]
+    assert sorted(db_operations.fetch_month_over_month_summary(USER, "2026-10")) == [
+        ("Food", "INR", 0.3, 5.0), ("Fuel", "INR", 40.0, 0.0)]
+
+
+def test_deletes_update_totals_and_bounds(db):
+    db_operations.insert_records([spend("2026-10-01", 10), spend("2026-10-02", 20), spend("2026-10-03", 30)])
+    ids = [row_id for (row_id,) in db_operations.fetch_transactions_range(USER, columns=("id",), order="asc")]
+
+    db_operations.delete_records(USER, [ids[2]])
+    assert db_operations.fetch_monthly_category_summary(USER, "2026-10") == [("Food", "INR", 30.0, 2, 10.0, 20.0)]
+    db_operations.delete_records(USER, ids[:2])
+    assert db_operations.fetch_monthly_category_summary(USER, "2026-10") == []
+    assert db_operations.fetch_categories(USER) == []
+
+
+def test_updates_move_amounts_between_groups(db):
+    db_operations.insert_records([spend("2026-10-01", 10), spend("2026-10-02", 20)])
+    with get_connection(db) as conn:
+        conn.execute(f"""UPDATE {db_operations.db_txn_table_name}
+            SET transaction_day = transaction_day - 10 WHERE amount_minor = 2000""")
+    assert db_operations.fetch_monthly_category_summary(USER, "2026-10") == [("Food", "INR", 10.0, 1, 10.0, 10.0)]
+    assert db_operations.fetch_monthly_category_summary(USER, "2026-09") == [("Food", "INR", 20.0, 1, 20.0, 20.0)]
+
+
+def test_triggers_match_a_rebuild(db):
+    records = [spend(f"2026-{month:02d}-{day:02d}", amount, category)
+               for month in (8, 9, 10) for day, amount in ((1, 12.5), (9, 7.25), (20, 100))
+               for category in ("Food", "Fuel")]
+    db_operations.insert_records(records)
+    db_operations.delete_transactions_where(USER, "2026-09-05", "2026-09-25", categories=["Fuel"])
+    maintained = rollup_rows()
+
+    db_operations.rebuild_monthly_rollup(USER)
+    assert rollup_rows() == maintained
+    db_operations.rebuild_monthly_rollup()
+    assert rollup_rows() == maintained
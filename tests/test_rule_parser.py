@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+
+from rule_parser import find_date, parse_locally
+
+# transaction_parser.LOCAL_PARSE_MIN_CONFIDENCE; not imported, as transaction_parser needs langchain
+LOCAL_PARSE_MIN_CONFIDENCE = 0.8
+TODAY = datetime(2026, 10, 18, 9, 30)
+
+
+@pytest.mark.parametrize("desc, expected", [
+    ("Spent Rs 800 on Diesel today.", "2026-10-18"),
+    ("Paid Rs 450 for groceries yesterday", "2026-10-17"),
+    ("Paid Rs 1200 for school fees on 3 March 2025", "2025-03-03"),
+    ("Paid Rs 1200 for school fees on 2025-03-03", "2025-03-03"),
+    ("Paid Rs 1200 for school fees on 03/03/2025", "2025-03-03"),
+    ("Paid Rs 500 at the restaurant on 12 May", "2026-05-12"),
+    ("Paid Rs 500 at the restaurant on 5th October", "2026-10-05"),
+    ("Paid Rs 500 at the restaurant on the 5th of October", "2026-10-05"),
+    ("Paid Rs 500 for dinner on Oct 5", "2026-10-05"),
+    # A day-month still to come this year is last year's
+    ("Paid Rs 500 at the restaurant on 5th November", "2025-11-05"),
+])
+def test_dates(desc, expected):
+    details, confidence = parse_locally(desc, TODAY)
+    assert details["Transaction Date"] == expected
+    assert confidence >= LOCAL_PARSE_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("desc", [
+    "Paid Rs 500 at the restaurant on 2024-13-45",
+    "Paid Rs 500 for dinner on 31 Feb",
+    "Paid Rs 300 for groceries on 12/05",
+    "Paid Rs 2000 rent for September",
+])
+def test_unresolved_dates_go_to_the_llm(desc):
+    details, confidence = parse_locally(desc, TODAY)
+    assert find_date(desc.lower(), TODAY)[2] == "unresolved"
+    assert 0 < confidence < LOCAL_PARSE_MIN_CONFIDENCE
+
+
+def test_month_names_are_not_the_description():
+    details, _ = parse_locally("Paid Rs 2000 rent for September", TODAY)
+    assert details["Transaction Description"] == "Rent"
+    details, _ = parse_locally("Paid Rs 500 on 12 May at the restaurant", TODAY)
+    assert details["Transaction Description"] == "restaurant"
+
+
+def test_words_starting_like_months_are_not_dates():
+    details, confidence = parse_locally("Bought vegetables for Rs 120 at the market", TODAY)
+    assert find_date("bought vegetables for rs 120 at the market", TODAY)[2] == "default"
+    assert details["Transaction Date"] == "2026-10-18"
+    assert confidence >= LOCAL_PARSE_MIN_CONFIDENCE
+
+
+def test_full_sentence():
+    details, confidence = parse_locally("Paid Rs 1,250 with HDFC credit card for movie tickets on 2 Oct", TODAY)
+    assert details == {
+        "Transaction Date": "2026-10-02",
+        "Bank Name": "HDFC",
+        "Account Type": "Credit Card",
+        "Transaction Amount": 1250.0,
+        "Transaction Currency": "INR",
+        "Transaction Category": "Entertainment",
+        "Transaction Description": "movie tickets",
+    }
+    assert confidence >= LOCAL_PARSE_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("desc", [
+    "Parking for 3 hrs 200",
+    "Car service after 2 yrs 4000",
+    "Washed both cars 300",
+])
+def test_words_ending_like_currencies_are_not_amounts(desc):
+    details, confidence = parse_locally(desc, TODAY)
+    assert confidence < LOCAL_PARSE_MIN_CONFIDENCE
+
+
+def test_currency_prefixes_next_to_punctuation_and_digits():
+    assert parse_locally("Parking (rs200)", TODAY)[0]["Transaction Amount"] == 200.0
+    assert parse_locally("Paid ₹1,250 for movie tickets", TODAY)[0]["Transaction Amount"] == 1250.0
+
+
+def test_no_amount_has_no_confidence():
+    assert parse_locally("Went to the cinema yesterday", TODAY)[1] == 0.0
@@ -0,0 +1,137 @@
+import io
+
+import pytest
+
+import db_operations
+import statement_importer
+from conftest import make_record
+from statement_importer import StatementFormatError, detect_date_format, import_statement, to_records
+from write_queue import run_write
+
+USER = "someone@example.com"
+DEFAULTS = {"Bank Name": "HDFC", "Account Type": "Savings Account", "Transaction Currency": "INR"}
+
+
+def csv_file(*rows):
+    lines = ["Date,Narration,Withdrawal Amt.,Deposit Amt."] + [",".join(row) for row in rows]
+    return io.BytesIO("\n".join(lines).encode("utf-8"))
+
+
+def imported_dates():
+    return [day for (day,) in db_operations.fetch_transactions_range(USER, columns=("transaction_date",),
+                                                                       order="asc")]
+
+
+def test_detects_one_format_for_the_whole_file():
+    assert detect_date_format(["13/04/2026", "03/04/2026", ""]) == "%d/%m/%Y"
+    assert detect_date_format(["04/13/2026", "04/03/2026"]) == "%m/%d/%Y"
+    assert detect_date_format(["2026-04-03"]) == "%Y-%m-%d"
+
+
+def test_rejects_ambiguous_and_mixed_files():
+    with pytest.raises(StatementFormatError, match="could be read as any of"):
+        detect_date_format(["03/04/2026", "05/04/2026"])
+    with pytest.raises(StatementFormatError, match="can't read '04/13/2026'"):
+        detect_date_format(["13/04/2026", "04/13/2026"])
+
+
+def test_dates_are_read_with_the_detected_format_throughout():
+    rows = [{"Transaction Date": day, "Transaction Amount": "-10"}
+            for day in ("03/04/2026", "13/04/2026", "03/04/2026")]
+    records = list(to_records(rows, USER))
+    assert [record["Transaction Date"] for record in records] == ["2026-04-03", "2026-04-13", "2026-04-03"]
+
+
+def test_format_is_detected_from_the_first_rows_only(monkeypatch):
+    monkeypatch.setattr(statement_importer, "DATE_SAMPLE_ROWS", 2)
+    rows = [{"Transaction Date": day, "Transaction Amount": "-10"}
+            for day in ("13/04/2026", "03/04/2026", "04/13/2026")]
+    stats = {}
+    records = list(to_records(rows, USER, stats=stats))
+    assert [record["Transaction Date"] for record in records] == ["2026-04-13", "2026-04-03"]
+    assert stats == {"rows": 3, "skipped": 1}
+
+
+def test_import_of_an_ambiguous_file_saves_nothing(db):
+    with pytest.raises(StatementFormatError):
+        import_statement(csv_file(("03/04/2026", "Coffee", "80", ""), ("05/04/2026", "Lunch", "250", "")), "csv",
+                         USER, defaults=DEFAULTS)
+    assert db_operations.count_transactions(USER) == 0
+
+
+def test_import_with_an_explicit_format(db):
+    stats = import_statement(csv_file(("03/04/2026", "Coffee", "80", ""), ("05/04/2026", "Lunch", "250", ""),
+                                      ("Total", "", "330", "")), "csv", USER, defaults=DEFAULTS,
+                             date_format="%m/%d/%Y")
+    assert imported_dates() == ["2026-03-04", "2026-05-04"]
+    assert (stats["inserted"], stats["skipped"]) == (2, 1)
+
+
+def test_saves_go_in_between_the_batches_of_an_import(db):
+    saved = []
+
+    def save_from_another_session(stats):
+        # With the whole import in one transaction this save would wait for its lock and fail
+        record = make_record(**{"Transaction Description": f"Saved after {stats['inserted']} imported"})
+        saved.append(run_write(db_operations.insert_record, record))
+
+    rows = [(f"1{day}/04/2026", "Coffee", "80", "") for day in range(3, 6)]
+    stats = import_statement(csv_file(*rows), "csv", USER, defaults=DEFAULTS, batch_size=1,
+                             progress=save_from_another_session)
+    assert stats["inserted"] == 3
+    assert saved == ["Transaction details saved successfully!"] * 3
+    assert db_operations.count_transactions(USER) == 6
+
+
+def ofx_file(server_time, *transactions):
+    body = "".join(f"<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>{day}120000<TRNAMT>-{amount}<FITID>{fitid}<NAME>{name}"
+                   f"</STMTTRN>" for fitid, day, amount, name in transactions)
+    return io.BytesIO((f"OFXHEADER:100\n<OFX><SIGNONMSGSRSV1><SONRS><DTSERVER>{server_time}</SONRS></SIGNONMSGSRSV1>"
+                       f"<STMTRS><CURDEF>INR<BANKACCTFROM><BANKID>HDFC<ACCTID>001234<ACCTTYPE>SAVINGS"
+                       f"</BANKACCTFROM><BANKTRANLIST>{body}</BANKTRANLIST></STMTRS></OFX>").encode("utf-8"))
+
+
+def test_identical_rows_of_one_statement_are_all_kept(db):
+    rows = [("03/04/2026", "Coffee", "80", "")] * 2 + [("13/04/2026", "Lunch", "250", "")]
+    stats = import_statement(csv_file(*rows), "csv", USER, defaults=DEFAULTS)
+    assert (stats["inserted"], stats["duplicates"]) == (3, 0)
+
+    stats = import_statement(csv_file(*rows), "csv", USER, defaults=DEFAULTS)
+    assert (stats["inserted"], stats["duplicates"]) == (0, 3)
+    assert db_operations.count_transactions(USER) == 3
+
+
+
+def test_overlapping_statements_skip_the_rows_already_imported(db):
+    coffees = [("03/04/2026", "Coffee", "80", "")] * 2
+    import_statement(csv_file(*coffees, ("13/04/2026", "Lunch", "250", "")), "csv", USER, defaults=DEFAULTS)
+
+    # A later download repeats part of the first one, with a third coffee that day
+    later = csv_file(("13/04/2026", "Lunch", "250", ""), *coffees, ("03/04/2026", "Coffee", "80", ""),
+                     ("21/04/2026", "Dinner", "900", ""))
+    stats = import_statement(later, "csv", USER, defaults=DEFAULTS)
+    assert (stats["inserted"], stats["duplicates"]) == (2, 3)
+    assert db_operations.count_transactions(USER) == 5
+
+def test_the_same_statement_imports_for_each_user(db):
+    rows = [("03/04/2026", "Coffee", "80", ""), ("13/04/2026", "Lunch", "250", "")]
+    import_statement(csv_file(*rows), "csv", USER, defaults=DEFAULTS)
+    stats = import_statement(csv_file(*rows), "csv", "someone.else@example.com", defaults=DEFAULTS)
+    assert stats["inserted"] == 2
+
+
+def test_ofx_rows_are_deduplicated_on_fitid(db):
+    first = ofx_file("20260420", ("T1", "20260403", "80.00", "Coffee"), ("T2", "20260403", "80.00", "Coffee"))
+    stats = import_statement(first, "ofx", USER)
+    assert (stats["inserted"], stats["duplicates"]) == (2, 0)
+
+    # A later download of the account overlaps the first one
+    second = ofx_file("20260425", ("T2", "20260403", "80.00", "Coffee"), ("T3", "20260421", "250.00", "Lunch"))
+    stats = import_statement(second, "ofx", USER)
+    assert (stats["inserted"], stats["duplicates"]) == (1, 1)
+    assert db_operations.fetch_transactions_range(
+        USER, columns=("transaction_date", "bank_name", "account_type", "transaction_desc"), order="asc") == [
+        ("2026-04-03", None, "Savings Account", "Coffee"),
+        ("2026-04-03", None, "Savings Account", "Coffee"),
+        ("2026-04-21", None, "Savings Account", "Lunch"),
+    ]
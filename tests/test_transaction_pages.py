@@ -0,0 +1,32 @@
+import pytest
+
+import query_cache
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+USER = "someone@example.com"
+
+
+def display_app():
+    from display_transactions_page import transactions_table
+    transactions_table("someone@example.com")
+
+
+def delete_app():
+    from delete_transactions_page import delete_transactions_panel
+    delete_transactions_panel("someone@example.com")
+
+
+@pytest.mark.parametrize("app, page_key", [(display_app, "pagination_page"),
+                                           (delete_app, "pagination_page_delete")])
+def test_empty_first_page_with_a_stale_count_does_not_rerun(db, app, page_key):
+    # Another process deleted the rows, but this one still has their count cached
+    query_cache.cached_query(USER, ("count", None, None), lambda: 3)
+
+    at = AppTest.from_function(app)
+    at.session_state[page_key] = 1
+    at.run(timeout=10)
+
+    assert not at.exception
+    assert [info.value for info in at.info][-1].startswith("No transactions found")
+    assert query_cache.cached_query(USER, ("count", None, None), lambda: 0) == 0
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import pytest
+
+import transaction_parser
+
+# The rule parser can't tell the amount, so this goes to the LLM
+DESC = "Settled the 2 tabs from the trip, 450 and 900"
+RESPONSE = ('[{"Index": 1, "Transaction Date": "2026-10-18", "Transaction Amount": 1350, '
+            '"Transaction Description": "Trip tabs"}]\nThat is all.')
+
+
+class FakeChain:
+    """
+    Streams RESPONSE a few characters at a time and records whether the stream was closed. Like an HTTP
+    client with its open responses, it keeps a reference to the stream, so dropping it doesn't close it.
+    """
+    def __init__(self):
+        self.closed = False
+        self.sent = 0
+        self.chunks = None
+
+    def stream(self, input):
+        self.chunks = self._chunks()
+        return self.chunks
+
+    def _chunks(self):
+        try:
+            for start in range(0, len(RESPONSE), 8):
+                self.sent = start
+                yield SimpleNamespace(content=RESPONSE[start:start + 8])
+        finally:
+            self.closed = True
+
+
+@pytest.fixture
+def chain(db, monkeypatch):
+    chain = FakeChain()
+    monkeypatch.setattr(transaction_parser, "_get_chain", lambda: chain)
+    return chain
+
+
+def test_stream_is_closed_once_the_object_is_complete(chain):
+    fields = dict(transaction_parser.stream_transaction(DESC))
+    assert fields["Transaction Amount"] == 1350
+    assert fields[transaction_parser.PARSE_SOURCE_KEY] == "llm"
+    assert chain.closed and chain.sent < len(RESPONSE) - 8
+
+
+def test_stream_is_closed_when_the_caller_stops_early(chain):
+    fields = transaction_parser.stream_transaction(DESC)
+    assert next(fields) == ("Transaction Date", "2026-10-18")
+    assert not chain.closed
+    fields.close()
+    assert chain.closed
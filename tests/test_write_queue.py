@@ -0,0 +1,63 @@
+import pytest
+
+import db_operations
+from conftest import make_record
+from db_operations import InvalidRecordError
+from write_queue import WriteQueue
+
+USER = "someone@example.com"
+
+
+@pytest.fixture
+def writer(db):
+    # A window long enough for every request of a test to land in the same group
+    writer = WriteQueue(db, window=0.5)
+    yield writer
+    writer.stop(timeout=5)
+
+
+def insert_then_fail(record):
+    db_operations.insert_record(record)
+    raise RuntimeError("failed after writing")
+
+
+def descriptions():
+    return [desc for (desc,) in db_operations.fetch_transactions_range(USER, columns=("transaction_desc",),
+                                                                       order="asc")]
+
+
+def test_failing_request_is_rolled_back_alone(writer):
+    first = writer.submit(db_operations.insert_record, make_record(**{"Transaction Description": "First"}))
+    failing = writer.submit(insert_then_fail, make_record(**{"Transaction Description": "Failing",
+                                                             "Bank Name": "New Bank"}))
+    last = writer.submit(db_operations.insert_record, make_record(**{"Transaction Description": "Last"}))
+
+    assert first.result(5) == last.result(5) == "Transaction details saved successfully!"
+    with pytest.raises(RuntimeError, match="failed after writing"):
+        failing.result(5)
+    assert writer.stats()["groups"] == 1
+    assert descriptions() == ["First", "Last"]
+
+    # The bank added by the rolled-back request is not left cached with an id that doesn't exist
+    writer.submit(db_operations.insert_record, make_record(**{"Transaction Description": "Again",
+                                                              "Bank Name": "New Bank"})).result(5)
+    assert db_operations.fetch_transactions_range(USER, columns=("bank_name",), limit=1) == [("New Bank",)]
+
+
+def test_invalid_records_raise_to_their_caller(writer):
+    bad = writer.submit(db_operations.insert_record, make_record(**{"Transaction Amount": "lots"}))
+    good = writer.submit(db_operations.insert_records, [make_record()])
+    with pytest.raises(InvalidRecordError):
+        bad.result(5)
+    assert good.result(5) == (1, 0)
+    assert db_operations.count_transactions(USER) == 1
+
+
+def test_stop_applies_queued_requests(db):
+    writer = WriteQueue(db, window=0)
+    futures = [writer.submit(db_operations.insert_record, make_record(**{"Transaction Description": f"Txn {n}"}))
+               for n in range(20)]
+    writer.stop(timeout=5)
+    assert all(future.done() for future in futures)
+    assert writer.stats()["requests"] == 20
+    assert db_operations.count_transactions(USER) == 20